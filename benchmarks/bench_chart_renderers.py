@@ -0,0 +1,109 @@
+"""
+Per-chart render time and PNG size for each chart renderer backend.
+
+Takes real tool results from a database (lookup tables, ranked recommendation
+tables and premium curves for a few customer profiles), then renders each chart
+with every backend in src/tools/chart_renderer.py, with full colour and with
+palette quantization (--colors), bypassing the chart cache. Reports mean and p50
+render time and mean PNG size per (backend, colours, chart).
+
+Usage:
+    python data/generate_mock_data.py
+    python benchmarks/bench_chart_renderers.py --repeat 10 --save-dir /tmp/charts
+
+--save-dir writes one PNG per (backend, colours, chart) for a visual check.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from src.tools.chart_cache import chart_cache
+from src.tools.chart_renderer import CHART_COLORS, RENDERERS, get_chart_renderer
+from src.tools.functions import run_function
+from src.tools.snapshot import snapshot_manager
+
+PROFILES = [
+    {"age": 30, "term": 20, "coverage_amount": 10000000, "income": 1500000},
+    {"age": 45, "term": 15, "coverage_amount": 20000000, "income": 5000000},
+    {"age": 25, "term": 35, "coverage_amount": 5000000, "income": 1000000},
+]
+
+def sample_charts():
+    """
+    [(chart, results, title)] from the tools' results for PROFILES.
+    """
+    charts = []
+    with snapshot_manager.snapshot() as snapshot:
+        for profile in PROFILES:
+            results, _ = run_function(snapshot, "basic_plan_and_premium_lookup", dict(profile), charts=False)
+            if results:
+                charts.append(("plans_table", results, f"Plans Found For - Age = {profile['age']} Yrs, Term = {profile['term']} Yrs"))
+            results, _ = run_function(snapshot, "get_recommended_plans_based_on_priority_factors",
+                                      {**profile, "priority_factors": ["premium", "csr"]}, charts=False)
+            if results:
+                charts.append(("ranked_plans_table", results, f"Top Recommended Plans - Age = {profile['age']} Yrs"))
+            result, _ = run_function(snapshot, "get_premium_curve", {
+                "age": profile["age"], "income": profile["income"],
+                "coverage_amounts": [5000000, 10000000, 20000000, 50000000], "terms": [10, 20, 30],
+            }, charts=False)
+            if isinstance(result, dict) and result.get("plans"):
+                charts.append(("premium_curve", result, f"Premium Curve - Age = {profile['age']} Yrs"))
+    return charts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Renders per sample chart")
+    parser.add_argument("--colors", type=int, default=CHART_COLORS or 256, help="Palette size for the quantized runs")
+    parser.add_argument("--save-dir", default=None, help="Write a sample PNG per backend, colours and chart here")
+    parser.add_argument("--json", default=None, help="Write the results to this file")
+    args = parser.parse_args()
+
+    # Sample results only: no chart is needed (or cached) while collecting them
+    chart_cache.max_bytes = 0
+    charts = sample_charts()
+    if not charts:
+        raise SystemExit("❌ No tool results: generate the database first (python data/generate_mock_data.py)")
+    if args.save_dir:
+        os.makedirs(args.save_dir, exist_ok=True)
+
+    results = []
+    print(f"{'backend':<11} {'colours':>7} {'chart':<19} {'mean ms':>8} {'p50 ms':>8} {'mean KB':>8}")
+    for backend in RENDERERS:
+        renderer = get_chart_renderer(backend)
+        renderer.warm()
+        for colors in (0, args.colors):
+            for chart in ("plans_table", "ranked_plans_table", "premium_curve"):
+                timings, sizes = [], []
+                for name, data, title in charts:
+                    if name != chart:
+                        continue
+                    for _ in range(args.repeat):
+                        start = time.perf_counter()
+                        png = getattr(renderer, chart)(data, title, colors=colors)
+                        timings.append((time.perf_counter() - start) * 1000)
+                        sizes.append(len(png))
+                    if args.save_dir:
+                        with open(os.path.join(args.save_dir, f"{backend}-{colors or 'rgb'}-{chart}.png"), "wb") as f:
+                            f.write(png)
+                if not timings:
+                    continue
+                row = {
+                    "backend": backend, "colors": colors, "chart": chart,
+                    "mean_ms": statistics.mean(timings), "p50_ms": statistics.median(timings),
+                    "mean_bytes": statistics.mean(sizes),
+                }
+                results.append(row)
+                print(f"{backend:<11} {colors or 'full':>7} {chart:<19} {row['mean_ms']:8.1f} {row['p50_ms']:8.1f} "
+                      f"{row['mean_bytes'] / 1024:8.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Import-time budget check for the serving entry points.
+
+Imports each module in a fresh interpreter (`python -X importtime`), takes the
+best of --runs, and fails (exit code 1) when a module cannot be imported, when
+its cumulative import time exceeds its budget, or when the import pulls in one of
+the modules that must stay deferred until first use (pandas, matplotlib, the
+openai SDK). Run it in CI or before a release so a stray top-level import cannot
+quietly add seconds to every new worker and Streamlit session.
+
+whatsapp_webhook is imported with placeholder credentials; nothing is sent.
+
+Usage:
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --budget-ms 500 --runs 5
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# (module, budget in ms); --budget-ms overrides them all
+MODULES = [
+    ("src.tools.functions", 300),
+    ("src.chat.chatbot_core", 350),
+    ("whatsapp_webhook", 600),
+]
+
+DEFERRED_MODULES = ("pandas", "matplotlib", "openai")
+
+PLACEHOLDER_ENV = {
+    name: "offline" for name in (
+        "WHATSAPP_TOKEN", "WHATSAPP_VERIFY_TOKEN", "WHATSAPP_PHONE_NUMBER_ID", "WHATSAPP_API_VERSION",
+        "LLM_AZURE_ENDPOINT", "LLM_AZURE_OPENAI_KEY", "LLM_AZURE_MODEL_NAME", "STT_AZURE_MODEL_NAME",
+    )
+}
+
+PROBE = """
+import sys
+import {module}
+print("LOADED " + " ".join(name for name in {deferred!r} if name in sys.modules))
+"""
+
+
+def measure(module):
+    """
+    (cumulative import time in ms, deferred modules that got imported) for one fresh import.
+    """
+    env = {**PLACEHOLDER_ENV, **os.environ}
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, deferred=DEFERRED_MODULES)],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "import failed")
+    cumulative_us = None
+    for line in completed.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            cumulative_us = int(parts[1])
+    loaded = next(line for line in completed.stdout.splitlines() if line.startswith("LOADED")).split()[1:]
+    return cumulative_us / 1000, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh imports per module; the best one counts")
+    parser.add_argument("--budget-ms", type=float, default=None, help="One budget for every module")
+    args = parser.parse_args()
+
+    failures = []
+    for module, budget in MODULES:
+        budget = args.budget_ms if args.budget_ms is not None else budget
+        try:
+            samples = [measure(module) for _ in range(args.runs)]
+        except RuntimeError as e:
+            # A module that no longer imports fails the check, it is not merely slow
+            print(f"❌ {module:<24} import failed: {str(e)}")
+            failures.append(module)
+            continue
+        best = min(ms for ms, _ in samples)
+        loaded = sorted(set(name for _, names in samples for name in names))
+        ok = best <= budget and not loaded
+        print(f"{'✅' if ok else '❌'} {module:<24} {best:8.1f} ms  (budget {budget:.0f} ms)"
+              + (f"  imports {', '.join(loaded)} eagerly" if loaded else ""))
+        if not ok:
+            failures.append(module)
+
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Concurrent chart rendering: inline (in the request threads) vs the render pool.
+
+Takes real lookup results from a database, then has --threads threads (standing in
+for concurrent conversations) render --charts charts each, first inline
+(TIA_RENDER_WORKERS=0: one chart at a time under a lock, as pyplot requires) and
+then through render pools of each size in --workers. Reports wall time, charts per
+second and per-chart latency, and checks that every PNG is byte-identical to the
+same chart rendered alone (a figure shared between threads would not be).
+
+Usage:
+    python data/generate_mock_data.py
+    python benchmarks/bench_render_pool.py --threads 4 --charts 5 --workers 1,2,4
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from src.tools.chart_cache import chart_cache
+from src.tools.chart_renderer import CHART_RENDERER
+from src.tools.functions import run_function
+from src.tools.render_pool import RenderPool
+from src.tools.snapshot import snapshot_manager
+
+def sample_tables(count):
+    """
+    [(results, title)] of `count` lookup tables for different ages.
+    """
+    tables = []
+    with snapshot_manager.snapshot() as snapshot:
+        for age in range(25, 25 + count):
+            results, _ = run_function(snapshot, "basic_plan_and_premium_lookup",
+                                      {"age": age, "term": 20, "coverage_amount": 10000000, "income": 1500000}, charts=False)
+            if results:
+                tables.append((results, f"Plans Found For - Age = {age} Yrs, Term = 20 Yrs"))
+    return tables
+
+def run(pool, tables, threads, charts):
+    """
+    Render `charts` tables per thread from `threads` threads: (wall s, latencies ms, PNGs by table).
+    """
+    latencies, images = [], {}
+    lock = threading.Lock()
+    def conversation(n):
+        for i in range(charts):
+            index = (n + i) % len(tables)
+            start = time.perf_counter()
+            png = pool.render("plans_table", *tables[index])
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                images.setdefault(index, []).append(png)
+    workers = [threading.Thread(target=conversation, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start, latencies, images
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=4, help="Concurrent conversations")
+    parser.add_argument("--charts", type=int, default=5, help="Charts per conversation")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated render pool sizes to compare with inline")
+    parser.add_argument("--backend", default=CHART_RENDERER, help="Chart renderer backend")
+    args = parser.parse_args()
+
+    chart_cache.max_bytes = 0
+    tables = sample_tables(args.threads)
+    if not tables:
+        raise SystemExit("❌ No tool results: generate the database first (python data/generate_mock_data.py)")
+
+    inline = RenderPool(workers=0, backend=args.backend)
+    expected = [inline.render("plans_table", *table) for table in tables]
+    print(f"{args.threads} threads x {args.charts} charts, {args.backend} backend, {os.cpu_count()} CPUs")
+    print(f"{'mode':<10} {'wall s':>7} {'charts/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'identical':>10}")
+    failed = False
+    for workers in [0] + [int(n) for n in args.workers.split(",")]:
+        pool = RenderPool(workers=workers, queue_size=args.threads * args.charts, backend=args.backend)
+        if workers:
+            # Start and warm the workers before timing
+            pool.render("plans_table", *tables[0])
+        try:
+            wall, latencies, images = run(pool, tables, args.threads, args.charts)
+        finally:
+            pool.close()
+        identical = all(png == expected[index] for index, pngs in images.items() for png in pngs)
+        failed |= not identical
+        latencies.sort()
+        print(f"{'inline' if not workers else f'pool x{workers}':<10} {wall:7.2f} {len(latencies) / wall:9.1f} "
+              f"{statistics.median(latencies):8.1f} {latencies[int(0.95 * (len(latencies) - 1))]:8.1f} "
+              f"{'✅' if identical else '❌':>9}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Before/after benchmark for the premium band lookup.
+
+Compares the original full-scan eligibility query over `premiums` with the
+R*Tree-backed query used by `basic_plan_and_premium_lookup`, on random
+customer profiles, and checks that both return the same rows.
+
+Usage:
+    python data/generate_mock_data.py
+    python benchmarks/bench_rtree_lookup.py --scale 10
+
+--scale N copies the plan catalogue N times into a temporary database so the
+rate table grows N-fold (each copy is a new set of plans with the same bands).
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+FULL_SCAN_SQL = """
+SELECT
+    i.name AS insurer_name,
+    t.plan_name,
+    p.annual_premium
+FROM premiums p
+JOIN term_plans t ON p.plan_id = t.plan_id
+JOIN insurers i ON t.insurer_id = i.insurer_id
+WHERE p.age_min <= ?
+  AND p.age_max > ?
+  AND p.term_min <= ?
+  AND p.term_max > ?
+  AND p.coverage_min <= ?
+  AND p.coverage_max > ?
+  AND p.required_min_income <= ?
+  AND t.min_age <= ?
+  AND t.max_age > ?
+  AND t.min_term <= ?
+  AND t.max_term > ?
+  AND t.min_cover <= ?
+  AND t.max_cover > ?
+"""
+
+RTREE_SQL = """
+SELECT
+    i.name AS insurer_name,
+    t.plan_name,
+    p.annual_premium
+FROM premiums_rtree r
+JOIN premiums p ON p.premium_id = r.premium_id
+JOIN term_plans t ON p.plan_id = t.plan_id
+JOIN insurers i ON t.insurer_id = i.insurer_id
+WHERE r.age_min <= ?
+  AND r.age_max > ?
+  AND r.term_min <= ?
+  AND r.term_max > ?
+  AND r.coverage_min <= ?
+  AND r.coverage_max > ?
+  AND p.required_min_income <= ?
+  AND t.min_age <= ?
+  AND t.max_age > ?
+  AND t.min_term <= ?
+  AND t.max_term > ?
+  AND t.min_cover <= ?
+  AND t.max_cover > ?
+"""
+
+
+def scale_database(src_path, dst_path, scale):
+    """Copy the database and replicate its plans (and their premiums) `scale` times."""
+    shutil.copyfile(src_path, dst_path)
+    conn = sqlite3.connect(dst_path)
+    plan_offset = conn.execute("SELECT MAX(plan_id) FROM term_plans").fetchone()[0]
+    premium_offset = conn.execute("SELECT MAX(premium_id) FROM premiums").fetchone()[0]
+    for copy in range(1, scale):
+        conn.execute("""
+            INSERT INTO term_plans
+            SELECT plan_id + ?, insurer_id, plan_name || ' #' || ?, min_cover, max_cover,
+                   min_term, max_term, min_age, max_age, free_riders, paid_riders, plan_link
+            FROM term_plans WHERE plan_id <= ?
+        """, (copy * plan_offset, copy, plan_offset))
+        conn.execute("""
+            INSERT INTO premiums
+            SELECT premium_id + ?, plan_id + ?, age_min, age_max, term_min, term_max,
+                   coverage_min, coverage_max, required_min_income, annual_premium
+            FROM premiums WHERE premium_id <= ?
+        """, (copy * premium_offset, copy * plan_offset, premium_offset))
+    conn.execute("DELETE FROM premiums_rtree")
+    conn.execute("""
+        INSERT INTO premiums_rtree
+        SELECT premium_id, age_min, age_max, term_min, term_max, coverage_min, coverage_max
+        FROM premiums
+    """)
+    conn.commit()
+    conn.close()
+
+
+def random_profiles(count, seed=7):
+    rng = random.Random(seed)
+    profiles = []
+    for _ in range(count):
+        age = rng.randint(18, 75)
+        term = rng.randint(5, 55)
+        coverage = rng.choice([2500000, 5000000, 10000000, 20000000, 50000000, 100000000])
+        income = rng.choice([500000, 1000000, 2500000, 5000000, 10000000])
+        profiles.append((age, term, coverage, income))
+    return profiles
+
+
+def time_query(conn, sql, profiles):
+    timings = []
+    results = []
+    for age, term, coverage, income in profiles:
+        params = (age, age, term, term, coverage, coverage, income,
+                  age, age, term, term, coverage, coverage)
+        start = time.perf_counter()
+        rows = conn.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+        results.append(sorted(rows))
+    return timings, results
+
+
+def summarize(label, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(f"{label:<10} mean={statistics.mean(timings):8.3f} ms  "
+          f"p50={statistics.median(timings):8.3f} ms  p95={p95:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="data/term_insurance.db", help="Database built by data/generate_mock_data.py")
+    parser.add_argument("--scale", type=int, default=1, help="Replicate the plan catalogue this many times")
+    parser.add_argument("--queries", type=int, default=200, help="Number of random profiles to look up")
+    args = parser.parse_args()
+
+    tmp_dir = None
+    db_path = args.db
+    if args.scale > 1:
+        tmp_dir = tempfile.mkdtemp(prefix="tia-bench-")
+        db_path = os.path.join(tmp_dir, "term_insurance.db")
+        scale_database(args.db, db_path, args.scale)
+
+    try:
+        conn = sqlite3.connect(db_path)
+        row_count = conn.execute("SELECT COUNT(*) FROM premiums").fetchone()[0]
+        print(f"premiums rows: {row_count:,}  profiles: {args.queries}")
+
+        profiles = random_profiles(args.queries)
+        before, before_rows = time_query(conn, FULL_SCAN_SQL, profiles)
+        after, after_rows = time_query(conn, RTREE_SQL, profiles)
+        conn.close()
+
+        summarize("full scan", before)
+        summarize("r*tree", after)
+        print(f"speedup    {statistics.mean(before) / statistics.mean(after):.1f}x")
+        if before_rows != after_rows:
+            raise SystemExit("❌ R*Tree results differ from the full-scan query")
+        print("✅ Both queries returned identical rows.")
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Benchmark of every tool in FUNCTION_MAP across database sizes.
+
+Builds synthetic databases with data/generate_mock_data.py (the demo catalogue
+and/or catalogues grown to a target number of premium rows), then calls each tool
+on seeded random arguments through run_function(), bypassing the result cache,
+and splits every call into:
+
+    sql      executing the statements and fetching their rows
+    convert  Python-side work on the rows: dict(row) conversion, ranking, shaping
+    render   chart rendering (in the render pool unless TIA_RENDER_WORKERS=0)
+
+SQL and render times come from the SQL profiler (src/tools/profiling.py), which is
+enabled for the run; convert is the remainder of the call. Reports mean/p50/p95/p99
+latency per phase and throughput per tool, and with --json writes the results
+(with the commit they were measured on) for comparison with --compare. Runs fully
+offline: no LLM or WhatsApp credentials are needed.
+
+Usage:
+    python benchmarks/bench_tools.py --sizes demo,1000000 --json bench.json
+    python benchmarks/bench_tools.py --sizes demo,1000000 --compare bench.json
+
+--db-dir keeps the generated databases there and reuses them on later runs, so
+two commits are measured on identical data.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, REPO_ROOT)
+from src.tools.chart_cache import chart_cache
+from src.tools.functions import FUNCTION_MAP, run_function
+from src.tools.profiling import profiler
+from src.tools.snapshot import SNAPSHOT_DB, Snapshot
+
+PHASES = ("total", "sql", "convert", "render")
+
+SEARCH_QUERIES = ["critical illness", "waiver of premium", "accidental death", "terminal illness", "return of premium", "cancer"]
+PRIORITY_ORDERS = [["premium"], ["csr", "premium"], ["asr", "complaints"], ["complaints", "csr", "premium"]]
+
+
+def build_database(size, db_dir, compact, insurers, plans_per_insurer, seed):
+    """
+    Generate (or reuse, in db_dir) the database for one size; "demo" is the default catalogue.
+    """
+    name = f"{size}{'-compact' if compact else ''}"
+    if size != "demo":
+        name += f"-{insurers}x{plans_per_insurer}"
+    out_dir = os.path.join(db_dir, name)
+    if os.path.exists(os.path.join(out_dir, SNAPSHOT_DB)):
+        return out_dir
+
+    command = [sys.executable, os.path.join(REPO_ROOT, "data", "generate_mock_data.py"),
+               "--out-dir", out_dir, "--no-csv", "--seed", str(seed)]
+    if compact:
+        command.append("--compact")
+    if size != "demo":
+        command += ["--target-rows", str(size), "--insurers", str(insurers), "--plans-per-insurer", str(plans_per_insurer)]
+    os.makedirs(out_dir, exist_ok=True)
+    print(f"Generating {name} ...")
+    start = time.perf_counter()
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+    print(f"  done in {time.perf_counter() - start:.1f}s")
+    return out_dir
+
+
+def premium_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        table = "premium_rates" if conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'premium_rates'").fetchone() else "premiums"
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def make_workload(db_path, calls, seed):
+    """
+    Seeded random arguments for every tool: {tool: [args, ...]}.
+    """
+    conn = sqlite3.connect(db_path)
+    insurer_names = [row[0] for row in conn.execute("SELECT name FROM insurers ORDER BY insurer_id")]
+    plan_names = [row[0] for row in conn.execute("SELECT plan_name FROM term_plans ORDER BY plan_id")]
+    conn.close()
+
+    rng = random.Random(seed)
+    def profile():
+        return {
+            "age": rng.randint(18, 65),
+            "term": rng.choice([10, 15, 20, 25, 30, 35, 40]),
+            "coverage_amount": rng.choice([5000000, 10000000, 20000000, 50000000]),
+            "income": rng.choice([1000000, 2500000, 5000000, 10000000]),
+        }
+
+    workload = {name: [] for name in FUNCTION_MAP}
+    for _ in range(calls):
+        workload["basic_plan_and_premium_lookup"].append(profile())
+        workload["get_recommended_plans_based_on_priority_factors"].append(
+            {**profile(), "priority_factors": rng.choice(PRIORITY_ORDERS)})
+        workload["list_insurers_and_metrics"].append({})
+        workload["get_insurer_details"].append({"insurer_name": rng.choice(insurer_names)})
+        workload["get_plan_details"].append({"plan_name": rng.choice(plan_names)})
+        curve = profile()
+        workload["get_premium_curve"].append({
+            "age": curve["age"], "income": curve["income"], "include_chart": True,
+            "coverage_amounts": [5000000, 10000000, 20000000, 50000000],
+            "terms": sorted(rng.sample([10, 15, 20, 25, 30], 2)),
+        })
+        workload["search_plan_features"].append({"query": rng.choice(SEARCH_QUERIES)})
+    return {name: args for name, args in workload.items() if name in FUNCTION_MAP}
+
+
+def percentile(sorted_values, q):
+    """
+    Nearest-rank percentile of an ascending list.
+    """
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))]
+
+
+def summarize(timings):
+    values = sorted(timings)
+    return {
+        "mean_ms": statistics.mean(values),
+        "p50_ms": percentile(values, 0.50),
+        "p95_ms": percentile(values, 0.95),
+        "p99_ms": percentile(values, 0.99),
+    }
+
+
+def bench_tool(snapshot, name, workload, warmup):
+    for args in workload[:warmup]:
+        run_tool(snapshot, name, args)
+    timings = {phase: [] for phase in PHASES}
+    errors = 0
+    for args in workload:
+        phases, ok = run_tool(snapshot, name, args)
+        errors += not ok
+        for phase, value in phases.items():
+            timings[phase].append(value)
+    return {
+        "calls": len(workload),
+        "errors": errors,
+        "throughput_per_s": len(workload) / (sum(timings["total"]) / 1000) if sum(timings["total"]) else 0.0,
+        **{phase: summarize(values) for phase, values in timings.items()},
+    }
+
+
+def run_tool(snapshot, name, args):
+    """
+    One call, split into phases in milliseconds; ok is False if the tool returned an error.
+    """
+    with profiler.tool_call(name) as call:
+        start = time.perf_counter()
+        result, _ = run_function(snapshot, name, dict(args))
+        total = time.perf_counter() - start
+    sql, render = call["sql"], call["render"]
+    phases = {
+        "total": total * 1000,
+        "sql": sql * 1000,
+        "convert": max(0.0, total - sql - render) * 1000,
+        "render": render * 1000,
+    }
+    return phases, not (isinstance(result, dict) and "error" in result)
+
+
+def print_results(label, rows, tools, baseline=None):
+    print(f"\n{label}  ({rows:,} premium rows)")
+    print(f"{'tool':<50} {'calls/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'sql p50':>8} {'conv p50':>8} {'rend p50':>8}")
+    for name, stats in tools.items():
+        line = (f"{name:<50} {stats['throughput_per_s']:8.1f} {stats['total']['p50_ms']:8.2f} "
+                f"{stats['total']['p95_ms']:8.2f} {stats['total']['p99_ms']:8.2f} {stats['sql']['p50_ms']:8.2f} "
+                f"{stats['convert']['p50_ms']:8.2f} {stats['render']['p50_ms']:8.2f}")
+        before = (baseline or {}).get(name)
+        if before and before["total"]["p50_ms"]:
+            line += f"  p50 x{stats['total']['p50_ms'] / before['total']['p50_ms']:.2f} vs baseline"
+        print(line)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="demo,1000000",
+                        help="Comma-separated premium row targets; 'demo' is the default catalogue")
+    parser.add_argument("--compact", action="store_true", help="Benchmark the compact band schema")
+    parser.add_argument("--insurers", type=int, default=20, help="Insurers in the non-demo catalogues")
+    parser.add_argument("--plans-per-insurer", type=int, default=3, help="Plans per insurer in the non-demo catalogues")
+    parser.add_argument("--calls", type=int, default=30, help="Timed calls per tool and size")
+    parser.add_argument("--warmup", type=int, default=3, help="Untimed calls per tool before timing")
+    parser.add_argument("--tools", default=None, help="Comma-separated subset of FUNCTION_MAP to run")
+    parser.add_argument("--seed", type=int, default=7, help="Seed of the databases and of the tool arguments")
+    parser.add_argument("--chart-cache", action="store_true",
+                        help="Keep the chart cache on (by default every chart is rendered, to time rendering)")
+    parser.add_argument("--db-dir", default=None, help="Keep the generated databases here and reuse them")
+    parser.add_argument("--json", default=None, help="Write the results to this file")
+    parser.add_argument("--compare", default=None, help="Results file of a previous run to compare against")
+    args = parser.parse_args()
+
+    tools = args.tools.split(",") if args.tools else list(FUNCTION_MAP)
+    unknown = [name for name in tools if name not in FUNCTION_MAP]
+    if unknown:
+        raise SystemExit(f"❌ Unknown tools: {', '.join(unknown)}")
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["sizes"]
+
+    if not args.chart_cache:
+        chart_cache.max_bytes = 0
+    db_dir = args.db_dir or tempfile.mkdtemp(prefix="tia-bench-")
+    profiler.enable(slow_query_ms=float("inf"), log_path=os.path.join(db_dir, "slow_queries.log"))
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "machine": platform.machine(),
+        "compact": args.compact,
+        "chart_cache": args.chart_cache,
+        "calls": args.calls,
+        "sizes": {},
+    }
+    try:
+        for size in args.sizes.split(","):
+            size = size.strip()
+            size = size if size == "demo" else int(size)
+            out_dir = build_database(size, db_dir, args.compact, args.insurers, args.plans_per_insurer, args.seed)
+            snapshot = Snapshot(os.path.basename(out_dir), out_dir)
+            try:
+                rows = premium_rows(snapshot.db_path)
+                workload = make_workload(snapshot.db_path, args.calls, args.seed)
+                label = str(size)
+                tool_results = {name: bench_tool(snapshot, name, workload[name], args.warmup) for name in tools}
+            finally:
+                snapshot.close()
+            results["sizes"][label] = {"premium_rows": rows, "tools": tool_results}
+            print_results(label, rows, tool_results, ((baseline or {}).get(label) or {}).get("tools"))
+    finally:
+        if not args.db_dir:
+            shutil.rmtree(db_dir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Query-plan and consistency checks for the tools, on both database schemas.
+
+Builds the demo catalogue with data/generate_mock_data.py in the wide and in the
+compact band schema, then runs EXPLAIN QUERY PLAN on the tools' eligibility and
+premium curve queries for a spread of customer profiles. Fails (exit code 1) when
+a plan scans the premium table (`SCAN p`) instead of searching it: the lookups
+must stay index probes, whose cost does not grow with the rate table. SQLite
+picks join orders without statistics here (the generator runs no ANALYZE), so a
+harmless-looking edit to a join can turn a probe into a full scan; run this after
+touching the tools' SQL.
+
+It also builds the premium cube and the recommendation table for the wide
+database and fails when the materialized recommendations differ from the live
+ranker's, including for k = 0 and negative k.
+
+Usage:
+    python benchmarks/check_tools.py
+    python benchmarks/check_tools.py --db-dir /tmp/tia-check
+"""
+import argparse
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, REPO_ROOT)
+from src.tools.functions import (charts_skipped, eligible_premiums_clause, get_recommended_plans_based_on_priority_factors,
+                                 materialized_recommended_plans, premium_curve_query)
+from src.tools.snapshot import Snapshot
+
+# (age, term, coverage_amount, income) covering young/old, short/long and small/large covers
+PROFILES = [
+    (25, 10, 5000000, 800000),
+    (30, 20, 10000000, 1500000),
+    (45, 30, 20000000, 3000000),
+    (60, 10, 2500000, 600000),
+]
+
+# k values the materialized and live recommendations must agree on
+RECOMMENDATION_KS = [-1, 0, 1, 2]
+
+
+def build_database(db_dir, compact):
+    """
+    Path of the demo database in the given schema, generated on first use.
+    """
+    out_dir = os.path.join(db_dir, "compact" if compact else "wide")
+    db_path = os.path.join(out_dir, "term_insurance.db")
+    if not os.path.exists(db_path):
+        command = [sys.executable, os.path.join(REPO_ROOT, "data", "generate_mock_data.py"),
+                   "--out-dir", out_dir, "--no-csv"]
+        if compact:
+            command.append("--compact")
+        os.makedirs(out_dir, exist_ok=True)
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+    return db_path
+
+
+def query_plan(conn, sql, params):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def lookup_plans(conn):
+    """
+    [(profile, query plan)] of the eligible premiums query.
+    """
+    plans = []
+    for age, term, coverage_amount, income in PROFILES:
+        clause = eligible_premiums_clause(conn, age, term, coverage_amount, income)
+        if clause is not None:
+            plans.append(((age, term, coverage_amount, income), query_plan(conn, "SELECT p.annual_premium " + clause[0], clause[1])))
+    return plans
+
+
+def curve_plans(conn):
+    """
+    [(profile, query plan)] of the premium curve query, over a 10 x 10 grid
+    (MAX_PREMIUM_CURVE_POINTS) around each profile.
+    """
+    plans = []
+    for age, term, coverage_amount, income in PROFILES:
+        coverage_amounts = [coverage_amount * n // 4 for n in range(1, 11)]
+        terms = [term + n for n in range(10)]
+        sql, params = premium_curve_query(conn, age, income, coverage_amounts, terms)
+        plans.append(((age, income), query_plan(conn, sql, params)))
+    return plans
+
+
+def build_derived_tables(db_path):
+    """
+    Build the premium cube and the recommendation table next to db_path, on first use.
+    """
+    data_dir = os.path.dirname(db_path)
+    for script, output in (("build_premium_cube.py", "premium_cube.json"),
+                           ("build_recommendation_table.py", "recommendations.db")):
+        if not os.path.exists(os.path.join(data_dir, output)):
+            subprocess.run([sys.executable, os.path.join(REPO_ROOT, "data", script), "--db", db_path],
+                           check=True, stdout=subprocess.DEVNULL)
+
+
+def recommendation_mismatches(db_path):
+    """
+    [(profile, k)] where the materialized recommendations differ from the live ranker's.
+    """
+    build_derived_tables(db_path)
+    snapshot = Snapshot("check", os.path.dirname(db_path))
+    if snapshot.premium_cube() is None or snapshot.recommendation_table() is None:
+        raise RuntimeError("the premium cube or recommendation table does not match the database")
+    mismatches = []
+    try:
+        with charts_skipped():
+            for age, term, coverage_amount, income in PROFILES:
+                args = {"age": age, "income": income, "coverage_amount": coverage_amount, "term": term,
+                        "priority_factors": ["premium", "csr"]}
+                for k in RECOMMENDATION_KS:
+                    materialized = materialized_recommended_plans(snapshot, **args, k=k)
+                    with snapshot.connection() as conn:
+                        live, _ = get_recommended_plans_based_on_priority_factors(conn, **args, k=k)
+                    if materialized is None or materialized[0] != live:
+                        mismatches.append(((age, term, coverage_amount, income), k))
+    finally:
+        snapshot.close()
+    return mismatches
+
+
+CHECKS = [
+    ("eligible premiums", lookup_plans),
+    ("premium curve", curve_plans),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-dir", default=None, help="Keep the generated databases here and reuse them")
+    args = parser.parse_args()
+
+    db_dir = args.db_dir or tempfile.mkdtemp(prefix="tia-check-")
+    failures = []
+    for compact in (False, True):
+        schema = "compact" if compact else "wide"
+        conn = sqlite3.connect(build_database(db_dir, compact))
+        try:
+            for name, check in CHECKS:
+                plans = check(conn)
+                scans = [(profile, plan) for profile, plan in plans if any(step.startswith("SCAN p") for step in plan)]
+                ok = bool(plans) and not scans
+                print(f"{'✅' if ok else '❌'} {schema:<8} {name:<24} {len(plans)} profiles"
+                      + (f"  scans premiums for {scans[0][0]}: {'; '.join(scans[0][1])}" if scans else ""))
+                if not ok:
+                    failures.append((schema, name))
+        finally:
+            conn.close()
+
+    try:
+        mismatches = recommendation_mismatches(build_database(db_dir, compact=False))
+    except RuntimeError as e:
+        mismatches = [(str(e), None)]
+    print(f"{'❌' if mismatches else '✅'} {'wide':<8} {'recommendations':<24} k in {RECOMMENDATION_KS}"
+          + (f"  materialized != live for {mismatches[0][0]}, k={mismatches[0][1]}" if mismatches else ""))
+    if mismatches:
+        failures.append(("wide", "recommendations"))
+
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
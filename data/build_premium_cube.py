@@ -0,0 +1,42 @@
+"""
+Build the dense premium cube from data/term_insurance.db.
+
+The premium grid is a regular lattice, so it is written as dense arrays indexed by
+(age cell, term cell, coverage cell, plan) that src/tools/premium_cube.py maps
+read-only. Every worker process then shares one copy through the page cache, and a
+quote is an index computation instead of a SQL query.
+
+Outputs (next to the database):
+- premium_cube.npy         int32 annual premium per cell and plan
+- premium_cube_income.npy  int32 required_min_income per cell and plan
+- premium_cube_mask.npy    bool, True where the plan is eligible in that cell
+- premium_cube.json        cell edges, plan metadata and the database version the cube was built from
+
+Usage:
+    python data/build_premium_cube.py [--db data/term_insurance.db]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from src.tools.connection_pool import database_version
+from src.tools.premium_cube import build_cube_arrays, write_cube
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="data/term_insurance.db", help="Database built by data/generate_mock_data.py")
+    args = parser.parse_args()
+
+    version = database_version(args.db)
+    conn = sqlite3.connect(args.db)
+    premiums, incomes, eligible, edges, plans = build_cube_arrays(conn)
+    conn.close()
+
+    write_cube(os.path.dirname(os.path.abspath(args.db)), premiums, incomes, eligible, edges, plans, version)
+    size_mb = (premiums.nbytes + incomes.nbytes + eligible.nbytes) / 1e6
+    print(f"✅ Premium cube {premiums.shape} written ({size_mb:.1f} MB, {int(eligible.sum()):,} eligible cells).")
+
+if __name__ == "__main__":
+    main()
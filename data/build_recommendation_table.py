@@ -0,0 +1,38 @@
+"""
+Materialize ranked recommendations for every profile cell.
+
+Recommendations only depend on the customer's cell (age, term and coverage cell of the
+premium cube, plus the highest income threshold they clear) and on the ordered priority
+factors, of which there are 64. This precomputes the lexicographic top-N plans for every
+(cell, ordering) pair into data/recommendations.db, so
+get_recommended_plans_based_on_priority_factors becomes a single keyed read.
+
+Run data/build_premium_cube.py first. After a rate revision for a few plans, pass
+--plans to recompute only the cells those plans can affect.
+
+Usage:
+    python data/build_recommendation_table.py [--top-n 3] [--workers 8] [--plans 3,5]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from src.tools.recommendation_table import build_recommendation_table
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="data/term_insurance.db", help="Database built by data/generate_mock_data.py")
+    parser.add_argument("--top-n", type=int, default=3, help="Plans materialized per cell and ordering")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--plans", default=None, help="Comma-separated plan_ids that changed, for an incremental refresh")
+    args = parser.parse_args()
+
+    changed = [int(plan_id) for plan_id in args.plans.split(",")] if args.plans else None
+    start = time.perf_counter()
+    cells = build_recommendation_table(args.db, top_n=args.top_n, workers=args.workers, changed_plan_ids=changed)
+    print(f"✅ Recommendations for {cells:,} cells written in {time.perf_counter() - start:.1f}s.")
+
+if __name__ == "__main__":
+    main()
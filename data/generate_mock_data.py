@@ -1,11 +1,31 @@
+"""
+Generate the mock term insurance CSVs and SQLite database.
+
+With no options this builds the demo catalogue: 4 insurers with 2 plans each,
+priced over the default age, term and coverage bands. The options scale it up for
+capacity testing, e.g. a catalogue of 50 insurers and ~50M premium rows:
+
+    python data/generate_mock_data.py --insurers 50 --plans-per-insurer 4 --target-rows 50000000 --no-csv
+
+Premiums are computed in NumPy blocks (one plan, a run of coverage bands) on a
+process pool. Every (plan, coverage band) draws from its own RNG seeded with
+(seed, plan_id, cov_band), and blocks are written in plan order, so the output
+only depends on the options and --seed, never on --workers.
+"""
+import argparse
 import csv
-import random
+import os
+import sqlite3
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 
 # -------------------------------------------------------------------
 # 1. INSURERS DATA
 # -------------------------------------------------------------------
-# We'll store them in a list of dicts:
-insurers_data = [
+# The named insurers come first; make_insurers() adds synthetic ones beyond these.
+named_insurers = [
     {
         "insurer_id": 1,
         "name": "Axis Max Life",
@@ -36,16 +56,29 @@ insurers_data = [
     }
 ]
 
+
+def make_insurers(count, seed=42):
+    """
+    The named insurers, followed by synthetic ones with seeded random metrics.
+    """
+    insurers = [dict(insurer) for insurer in named_insurers[:count]]
+    for insurer_id in range(len(insurers) + 1, count + 1):
+        rng = np.random.default_rng([seed, insurer_id])
+        insurers.append({
+            "insurer_id": insurer_id,
+            "name": f"Insurer {insurer_id:03d} Life",
+            "claim_settlement_ratio": round(float(rng.uniform(95.0, 99.8)), 1),
+            "amount_settlement_ratio": round(float(rng.uniform(85.0, 97.0)), 1),
+            "complaints_volume": round(float(rng.uniform(1.0, 20.0)), 1)
+        })
+    return insurers
+
 # -------------------------------------------------------------------
 # 2. TERM PLANS
 # -------------------------------------------------------------------
-# We'll create 2 plans per insurer (some random differences in min/max age & coverage).
-# You can adjust as needed.
-plans_data = []
-plan_id_counter = 1
+# Plans alternate between two templates (min/max age, term & coverage and riders).
+# The named insurers' first plans are the real ones; further plans get synthetic names.
 
-# We'll define possible plan "templates" we can assign randomly to each insurer
-# just to give slight variety in coverage & age/term ranges.
 possible_plans = [
     {
         "min_cover": 500000,   # 5L
@@ -69,58 +102,57 @@ possible_plans = [
     }
 ]
 
-random.seed(42)  # For reproducibility
-
-for insurer in insurers_data:
-    # Fixed plans per insurer instead of random
-    plans_by_insurer = {
-        "ICICI Prudential": ["iProtect Smart", "iProtect Super"],
-        "Bajaj Allianz Life": ["Smart Protect Goal", "Life Guard"], 
-        "HDFC Life": ["Click 2 Protect Life", "HDFC Life Sanchay Plus"],
-        "Axis Max Life": ["Smart Secure Plus", "Online Term Plan Plus"]
-    }
-    
-    plan_links_by_insurer = {
-        "ICICI Prudential": ["https://www.icicipru.com/insurance/term-insurance/iProtect-Smart", "https://www.icicipru.com/insurance/term-insurance/iProtect-Super"],
-        "Bajaj Allianz Life": ["https://www.bajajallianz.com/term-insurance/smart-protect-goal", "https://www.bajajallianz.com/term-insurance/life-guard"], 
-        "HDFC Life": ["https://www.hdfclife.com/click2protectlife", "https://www.hdfclife.com/hdfclifesanchayplus"],
-        "Axis Max Life": ["https://www.axismaxlife.com/smartsecureplus", "https://www.axismaxlife.com/onlinetermplanplus"]
-    }
-    
-    plans = plans_by_insurer[insurer["name"]]
-    plan_links = plan_links_by_insurer[insurer["name"]]
-    # Use both plan templates in order for each insurer's plans
-    for i, plan_name in enumerate(plans):
-        plan_template = possible_plans[i % 2]  # Alternates between 0 and 1
-        plan_row = {
-            "plan_id": plan_id_counter,
-            "insurer_id": insurer["insurer_id"],
-            "plan_name": plan_name,
-            "plan_link": plan_links[i],
-            "min_cover": plan_template["min_cover"],
-            "max_cover": plan_template["max_cover"], 
-            "min_term": plan_template["min_term"],
-            "max_term": plan_template["max_term"],
-            "min_age": plan_template["min_age"],
-            "max_age": plan_template["max_age"],
-            "free_riders": plan_template["free_riders"],
-            "paid_riders": plan_template["paid_riders"]
-        }
-        plans_data.append(plan_row)
-        plan_id_counter += 1
-
+plans_by_insurer = {
+    "ICICI Prudential": ["iProtect Smart", "iProtect Super"],
+    "Bajaj Allianz Life": ["Smart Protect Goal", "Life Guard"],
+    "HDFC Life": ["Click 2 Protect Life", "HDFC Life Sanchay Plus"],
+    "Axis Max Life": ["Smart Secure Plus", "Online Term Plan Plus"]
+}
+
+plan_links_by_insurer = {
+    "ICICI Prudential": ["https://www.icicipru.com/insurance/term-insurance/iProtect-Smart", "https://www.icicipru.com/insurance/term-insurance/iProtect-Super"],
+    "Bajaj Allianz Life": ["https://www.bajajallianz.com/term-insurance/smart-protect-goal", "https://www.bajajallianz.com/term-insurance/life-guard"],
+    "HDFC Life": ["https://www.hdfclife.com/click2protectlife", "https://www.hdfclife.com/hdfclifesanchayplus"],
+    "Axis Max Life": ["https://www.axismaxlife.com/smartsecureplus", "https://www.axismaxlife.com/onlinetermplanplus"]
+}
+
+def make_plans(insurers, plans_per_insurer):
+    plans = []
+    for insurer in insurers:
+        names = plans_by_insurer.get(insurer["name"], [])
+        links = plan_links_by_insurer.get(insurer["name"], [])
+        for i in range(plans_per_insurer):
+            plan_template = possible_plans[i % 2]  # Alternates between 0 and 1
+            if i < len(names):
+                plan_name, plan_link = names[i], links[i]
+            else:
+                plan_name = f"{insurer['name']} Term Plan {i + 1}"
+                plan_link = f"https://example.com/insurer-{insurer['insurer_id']}/term-plan-{i + 1}"
+            plans.append({
+                "plan_id": len(plans) + 1,
+                "insurer_id": insurer["insurer_id"],
+                "plan_name": plan_name,
+                "plan_link": plan_link,
+                "min_cover": plan_template["min_cover"],
+                "max_cover": plan_template["max_cover"],
+                "min_term": plan_template["min_term"],
+                "max_term": plan_template["max_term"],
+                "min_age": plan_template["min_age"],
+                "max_age": plan_template["max_age"],
+                "free_riders": plan_template["free_riders"],
+                "paid_riders": plan_template["paid_riders"]
+            })
+    return plans
 
 # -------------------------------------------------------------------
 # 3. PREMIUMS TABLE
 # -------------------------------------------------------------------
-# We'll produce combos for each plan:
-#   Age from 25 to 40
-#   Terms in [5, 10, 15, 20, 25, 30] (some might exceed plan's max_term though)
-#   Coverage amounts: 10L, 20L, 50L, 1Cr, 2Cr, 3Cr, 4Cr, 5Cr (in rupees)
+# One premium row per plan and (coverage, age, term) band the plan accepts, with the
+# band clamped to the plan's own min/max limits.
 #
 # required_min_income => some simple formula
 # annual_premium => another formula + slight randomization
-# We'll skip combos that exceed plan's max_cover, or age beyond plan's max_age, or term beyond plan's max_term, etc.
+# Bands entirely outside the plan's limits are skipped.
 
 coverage_bands = [
     (0, 1000000),
@@ -157,7 +189,7 @@ age_bands = [(i, i+1) for i in range(20, 75)]
 
 term_bands = [
     (1, 4),
-    (4, 7), 
+    (4, 7),
     (7, 10),
     (10, 13),
     (13, 16),
@@ -175,153 +207,220 @@ term_bands = [
     (55, 60),
 ]
 
-premiums_data = []
-premium_id_counter = 1
+# Column order of the rows yielded by iter_premium_rows(): the premiums.csv columns,
+# followed by the band ids the compact schema stores instead of the boundaries.
+PREMIUM_COLUMNS = [
+    "premium_id","plan_id","age_min","age_max","term_min","term_max","coverage_min","coverage_max",
+    "required_min_income","annual_premium"
+]
+BAND_ID_COLUMNS = ["age_band", "term_band", "cov_band"]
+
+# Upper bound on the rows computed in one block
+BLOCK_ROWS = 250000
+
+def uniform_bands(start, stop, step):
+    return [(low, min(low + step, stop)) for low in range(start, stop, step)]
+
+def make_bands(age_step=None, term_step=None, coverage_step=None):
+    """
+    The age, term and coverage bands. A step replaces the default bands of that
+    dimension with uniform bands of that width over the same range.
+    """
+    bands = {"age": age_bands, "term": term_bands, "coverage": coverage_bands}
+    for name, step in (("age", age_step), ("term", term_step), ("coverage", coverage_step)):
+        if step:
+            bands[name] = uniform_bands(bands[name][0][0], bands[name][-1][1], step)
+    return bands
 
 def compute_required_income(coverage_min, coverage_max):
     # We'll approximate based on coverage_max
     return coverage_max // 20  # e.g. 1Cr => 5L
 
-def compute_annual_premium(age_min, age_max, term_min, term_max, coverage_min, coverage_max):
-    # Simple formula: base = coverage_max / 2000
-    # add (age_min*50 + term_max*40) * some random factor
-    base = coverage_max / 2000
-    add_age = age_min * 50
-    add_term = term_max * 40
-    factor = random.uniform(0.9, 1.1)
-    premium = (base + add_age + add_term) * factor
-    return int(round(premium))
-
-for plan in plans_data:
-        plan_id = plan["plan_id"]
-        # for each plan, we might skip coverage or age/term bands that exceed plan's max_age, max_cover, etc.
-
-        for coverage_range in coverage_bands:
-            cov_min, cov_max = coverage_range
-            # skip if coverage range entirely above plan.max_cover
-            if cov_min > plan["max_cover"]:
-                continue
-            # skip if coverage range entirely below plan.min_cover
-            if cov_max < plan["min_cover"]:
-                continue
-
-            # clamp coverage bands to fit plan's actual min/max
-            cov_min_clamped = max(cov_min, plan["min_cover"])
-            cov_max_clamped = min(cov_max, plan["max_cover"])
-
-            for age_range in age_bands:
-                a_min, a_max = age_range
-                # skip if age range is outside plan's min_age, max_age
-                if a_min > plan["max_age"]:
-                    continue
-                if a_max < plan["min_age"]:
-                    continue
-
-                # clamp
-                a_min_clamped = max(a_min, plan["min_age"])
-                a_max_clamped = min(a_max, plan["max_age"])
-
-                for term_range in term_bands:
-                    t_min, t_max = term_range
-                    # skip if term band outside plan's min_term, max_term
-                    if t_min > plan["max_term"]:
-                        continue
-                    if t_max < plan["min_term"]:
-                        continue
-
-                    # clamp
-                    t_min_clamped = max(t_min, plan["min_term"])
-                    t_max_clamped = min(t_max, plan["max_term"])
-
-                    required_min_inc = compute_required_income(cov_min_clamped, cov_max_clamped)
-                    annual_prem = compute_annual_premium(
-                        a_min_clamped, a_max_clamped,
-                        t_min_clamped, t_max_clamped,
-                        cov_min_clamped, cov_max_clamped
-                    )
-
-                    row = {
-                        "premium_id": premium_id_counter,
-                        "plan_id": plan_id,
-                        "age_min": a_min_clamped,
-                        "age_max": a_max_clamped,
-                        "term_min": t_min_clamped,
-                        "term_max": t_max_clamped,
-                        "coverage_min": cov_min_clamped,
-                        "coverage_max": cov_max_clamped,
-                        "required_min_income": required_min_inc,
-                        "annual_premium": annual_prem
-                    }
-                    premiums_data.append(row)
-                    premium_id_counter += 1
+def clamp_bands(bands, low, high):
+    """
+    (band ids, clamped mins, clamped maxes) of the bands overlapping [low, high].
+    """
+    bands = np.asarray(bands, dtype=np.int64)
+    keep = ~((bands[:, 0] > high) | (bands[:, 1] < low))
+    return np.flatnonzero(keep) + 1, np.maximum(bands[keep, 0], low), np.minimum(bands[keep, 1], high)
+
+def premium_block(task):
+    """
+    Process-pool worker: the rows of one plan over a run of coverage band ids, as an
+    int64 array in PREMIUM_COLUMNS[1:] + BAND_ID_COLUMNS order (premium ids are
+    assigned by the caller). Rows are ordered by coverage, age, then term band.
+    """
+    plan, bands, seed, cov_band_ids = task
+    age_ids, age_min, age_max = clamp_bands(bands["age"], plan["min_age"], plan["max_age"])
+    term_ids, term_min, term_max = clamp_bands(bands["term"], plan["min_term"], plan["max_term"])
+    cov_ids, cov_min, cov_max = clamp_bands(bands["coverage"], plan["min_cover"], plan["max_cover"])
+    cov_index = {cov_band: n for n, cov_band in enumerate(cov_ids.tolist())}
+
+    # Every (age band, term band) pair, age outer
+    a = np.repeat(np.arange(len(age_ids)), len(term_ids))
+    t = np.tile(np.arange(len(term_ids)), len(age_ids))
+    cells = len(a)
+
+    blocks = []
+    for cov_band in cov_band_ids:
+        c = cov_index[cov_band]
+        rng = np.random.default_rng([seed, plan["plan_id"], cov_band])
+        # Simple formula: base = coverage_max / 2000
+        # add (age_min*50 + term_max*40) * some random factor
+        factor = rng.uniform(0.9, 1.1, cells)
+        annual_premium = np.rint((cov_max[c] / 2000 + age_min[a] * 50 + term_max[t] * 40) * factor)
+        blocks.append(np.column_stack([
+            np.full(cells, plan["plan_id"]),
+            age_min[a], age_max[a],
+            term_min[t], term_max[t],
+            np.full(cells, cov_min[c]), np.full(cells, cov_max[c]),
+            np.full(cells, compute_required_income(cov_min[c], cov_max[c])),
+            annual_premium.astype(np.int64),
+            age_ids[a], term_ids[t], np.full(cells, cov_band)
+        ]))
+    return np.concatenate(blocks) if blocks else np.empty((0, len(PREMIUM_COLUMNS) - 1 + len(BAND_ID_COLUMNS)), dtype=np.int64)
+
+def premium_tasks(plans_data, bands, seed):
+    """
+    Split the work into blocks of whole coverage bands of one plan, at most BLOCK_ROWS rows each.
+    """
+    for plan in plans_data:
+        cells = (len(clamp_bands(bands["age"], plan["min_age"], plan["max_age"])[0])
+                 * len(clamp_bands(bands["term"], plan["min_term"], plan["max_term"])[0]))
+        cov_ids = clamp_bands(bands["coverage"], plan["min_cover"], plan["max_cover"])[0].tolist()
+        per_block = max(1, BLOCK_ROWS // max(cells, 1))
+        for start in range(0, len(cov_ids), per_block):
+            yield plan, bands, seed, cov_ids[start:start + per_block]
+
+def count_premium_rows(plans_data, bands):
+    return sum(
+        len(clamp_bands(bands["age"], plan["min_age"], plan["max_age"])[0])
+        * len(clamp_bands(bands["term"], plan["min_term"], plan["max_term"])[0])
+        * len(clamp_bands(bands["coverage"], plan["min_cover"], plan["max_cover"])[0])
+        for plan in plans_data
+    )
+
+def coverage_step_for_target(plans_data, bands, target_rows):
+    """
+    The widest uniform coverage band step that gives at least target_rows premium rows.
+    """
+    low, high = bands["coverage"][0][0], bands["coverage"][-1][1]
+    def rows(step):
+        return count_premium_rows(plans_data, dict(bands, coverage=uniform_bands(low, high, step)))
+    # Rows grow as the step shrinks: bisect on the step
+    narrow, wide = 1, high - low
+    if rows(wide) >= target_rows:
+        return wide
+    while wide - narrow > 1:
+        step = (narrow + wide) // 2
+        if rows(step) >= target_rows:
+            narrow = step
+        else:
+            wide = step
+    return narrow
+
+def ordered_map(func, tasks, workers, window):
+    """
+    Like executor.map(), but with at most window tasks in flight, so finished blocks
+    never pile up faster than the caller consumes them. Results keep the task order.
+    """
+    if workers <= 1:
+        yield from map(func, tasks)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for task in tasks:
+            if len(pending) >= window:
+                yield pending.popleft().result()
+            pending.append(executor.submit(func, task))
+        while pending:
+            yield pending.popleft().result()
+
+def iter_premium_rows(plans_data, bands, seed=42, workers=1):
+    """
+    Yield one premium row per (plan, coverage band, age band, term band) as a list in
+    PREMIUM_COLUMNS + BAND_ID_COLUMNS order. Blocks are computed on up to workers
+    processes and rows produced lazily, so a rate table of any size is generated,
+    written and loaded with flat memory.
+    """
+    premium_id = 1
+    for block in ordered_map(premium_block, premium_tasks(plans_data, bands, seed), workers, window=2 * workers):
+        ids = np.arange(premium_id, premium_id + len(block))
+        premium_id += len(block)
+        yield from np.column_stack([ids, block]).tolist()
 
 # -------------------------------------------------------------------
 # 4. WRITE TO CSV FILES
 # -------------------------------------------------------------------
-with open("data/insurers.csv", "w", newline="", encoding="utf-8") as f:
-    writer = csv.writer(f)
-    writer.writerow(["insurer_id","name","claim_settlement_ratio","amount_settlement_ratio","complaints_volume"])
-    for row in insurers_data:
-        writer.writerow([
-            row["insurer_id"],
-            row["name"],
-            row["claim_settlement_ratio"],
-            row["amount_settlement_ratio"],
-            row["complaints_volume"]
-        ])
-
-with open("data/term_plans.csv", "w", newline="", encoding="utf-8") as f:
-    writer = csv.writer(f)
-    writer.writerow([
-        "plan_id", "insurer_id", "plan_name",
-        "min_cover", "max_cover",
-        "min_term", "max_term",
-        "min_age", "max_age",
-        "free_riders", "paid_riders",
-        "plan_link"
-    ])
-    for row in plans_data:
+def write_catalogue_csv(out_dir, insurers_data, plans_data):
+    with open(os.path.join(out_dir, "insurers.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["insurer_id","name","claim_settlement_ratio","amount_settlement_ratio","complaints_volume"])
+        for row in insurers_data:
+            writer.writerow([
+                row["insurer_id"],
+                row["name"],
+                row["claim_settlement_ratio"],
+                row["amount_settlement_ratio"],
+                row["complaints_volume"]
+            ])
+
+    with open(os.path.join(out_dir, "term_plans.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
         writer.writerow([
-            row["plan_id"],
-            row["insurer_id"],
-            row["plan_name"],
-            row["min_cover"],
-            row["max_cover"],
-            row["min_term"],
-            row["max_term"],
-            row["min_age"],
-            row["max_age"],
-            row["free_riders"],
-            row["paid_riders"],
-            row["plan_link"]
+            "plan_id", "insurer_id", "plan_name",
+            "min_cover", "max_cover",
+            "min_term", "max_term",
+            "min_age", "max_age",
+            "free_riders", "paid_riders",
+            "plan_link"
         ])
+        for row in plans_data:
+            writer.writerow([
+                row["plan_id"],
+                row["insurer_id"],
+                row["plan_name"],
+                row["min_cover"],
+                row["max_cover"],
+                row["min_term"],
+                row["max_term"],
+                row["min_age"],
+                row["max_age"],
+                row["free_riders"],
+                row["paid_riders"],
+                row["plan_link"]
+            ])
+
+def tee_to_csv(rows, writer, width):
+    """
+    Pass rows through unchanged, writing the first width columns of each to the CSV
+    writer on the way. This is how premiums.csv and the database are filled in one pass.
+    """
+    for row in rows:
+        writer.writerow(row[:width])
+        yield row
 
-with open("data/premiums.csv", "w", newline="", encoding="utf-8") as f:
-    writer = csv.writer(f)
-    writer.writerow([
-        "premium_id","plan_id","age_min","age_max","term_min","term_max","coverage_min","coverage_max",
-        "required_min_income","annual_premium"
-    ])
-    for row in premiums_data:
-        writer.writerow([
-            row["premium_id"],
-            row["plan_id"],
-            row["age_min"],
-            row["age_max"],
-            row["term_min"],
-            row["term_max"],
-            row["coverage_min"],
-            row["coverage_max"],
-            row["required_min_income"],
-            row["annual_premium"]
-        ])
-
-import sqlite3
-
-def create_tables(conn):
+# -------------------------------------------------------------------
+# 5. LOAD INTO SQLITE
+# -------------------------------------------------------------------
+def create_tables(conn, compact=False):
+    """
+    Create the insurers, term_plans and rate tables.
+
+    By default the rates go into the wide `premiums` table (every row carries its
+    own band boundaries). With compact=True they go into the band dimension tables
+    and the `premium_rates` fact table instead. The indexes are created by
+    create_indexes() once the data is in.
+    """
     cursor = conn.cursor()
     
     # ---- Drop tables if they already exist (in reverse FK order)
+    cursor.execute("DROP TABLE IF EXISTS plan_features;")
+    cursor.execute("DROP TABLE IF EXISTS premium_rates;")
+    cursor.execute("DROP TABLE IF EXISTS age_bands;")
+    cursor.execute("DROP TABLE IF EXISTS term_bands;")
+    cursor.execute("DROP TABLE IF EXISTS coverage_bands;")
+    cursor.execute("DROP TABLE IF EXISTS premiums_rtree;")
     cursor.execute("DROP TABLE IF EXISTS premiums;")
     cursor.execute("DROP TABLE IF EXISTS term_plans;")
     cursor.execute("DROP TABLE IF EXISTS insurers;")
@@ -356,6 +455,12 @@ def create_tables(conn):
     );
     """)
 
+    if compact:
+        create_band_tables(cursor)
+        conn.commit()
+        print("✅ Tables created successfully (compact band schema).")
+        return
+
     # -- Create premiums table
     cursor.execute("""
     CREATE TABLE premiums (
@@ -376,79 +481,270 @@ def create_tables(conn):
     conn.commit()
     print("✅ Tables created successfully.")
 
-def insert_data_into_db(conn, insurers_data, plans_data, premiums_data):
+def create_band_tables(cursor):
+    # -- Band dimension tables: one row per distinct band, keyed by a small band id.
+    # A band covers [min, max), the same half-open convention as the premiums table.
+    cursor.execute("""
+    CREATE TABLE age_bands (
+        age_band INTEGER PRIMARY KEY,
+        age_min INTEGER NOT NULL,
+        age_max INTEGER NOT NULL
+    );
+    """)
+    cursor.execute("""
+    CREATE TABLE term_bands (
+        term_band INTEGER PRIMARY KEY,
+        term_min INTEGER NOT NULL,
+        term_max INTEGER NOT NULL
+    );
+    """)
+    cursor.execute("""
+    CREATE TABLE coverage_bands (
+        cov_band INTEGER PRIMARY KEY,
+        coverage_min INTEGER NOT NULL,
+        coverage_max INTEGER NOT NULL,
+        required_min_income INTEGER NOT NULL
+    );
+    """)
+
+    # -- Fact table clustered on the band key, so a quote is a primary-key probe.
+    # The plan's own min/max limits still live on term_plans and are checked there.
+    cursor.execute("""
+    CREATE TABLE premium_rates (
+        plan_id INTEGER NOT NULL,
+        age_band INTEGER NOT NULL,
+        term_band INTEGER NOT NULL,
+        cov_band INTEGER NOT NULL,
+        annual_premium INTEGER NOT NULL,
+        PRIMARY KEY (plan_id, age_band, term_band, cov_band),
+        FOREIGN KEY (plan_id) REFERENCES term_plans(plan_id)
+    ) WITHOUT ROWID;
+    """)
+
+# Bulk-load settings: no rollback journal and no fsync while the tables are filled.
+# A crash mid-load leaves a broken file, which is fine for a database rebuilt from scratch.
+BULK_LOAD_PRAGMAS = [
+    ("journal_mode", "OFF"),
+    ("synchronous", "OFF"),
+    ("cache_size", "-262144"),  # 256 MB
+    ("temp_store", "MEMORY"),
+]
+# What the finished database is served with
+SERVING_PRAGMAS = [
+    ("journal_mode", "DELETE"),
+    ("synchronous", "FULL"),
+]
+
+def remove_database(db_path):
+    """
+    Delete a previous build and its journal files, if any. A file that cannot be
+    deleted (e.g. held open by a server on Windows) is rebuilt in place instead, and
+    reclaim_free_pages() shrinks it after the load.
+    """
+    for path in (db_path, db_path + "-journal", db_path + "-wal", db_path + "-shm"):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"❌ Could not delete {path} ({str(e)}); rebuilding it in place")
+
+def reclaim_free_pages(conn):
+    """
+    VACUUM if the load left pages on the freelist (only a database rebuilt in place does).
+    """
+    free_pages = conn.execute("PRAGMA freelist_count;").fetchone()[0]
+    if free_pages:
+        conn.execute("VACUUM;")
+        print(f"✅ Reclaimed {free_pages:,} free pages left by the previous build.")
+
+def set_pragmas(conn, pragmas):
+    for name, value in pragmas:
+        conn.execute(f"PRAGMA {name} = {value};")
+
+def insert_data_into_db(conn, insurers_data, plans_data, premium_rows, bands, compact=False):
+    """
+    Load everything in a single transaction. premium_rows is an iterable of
+    iter_premium_rows() tuples; it is consumed once, as executemany() goes.
+    Returns the number of premium rows inserted.
+    """
     cursor = conn.cursor()
 
     # -- INSERT INTO insurers
-    for row in insurers_data:
-        cursor.execute("""
-            INSERT INTO insurers (
-                insurer_id, name, claim_settlement_ratio, amount_settlement_ratio, complaints_volume
-            ) VALUES (?, ?, ?, ?, ?)
-        """, (
-            row['insurer_id'],
-            row['name'],
-            row['claim_settlement_ratio'],
-            row['amount_settlement_ratio'],
-            row['complaints_volume']
-        ))
+    cursor.executemany("""
+        INSERT INTO insurers (
+            insurer_id, name, claim_settlement_ratio, amount_settlement_ratio, complaints_volume
+        ) VALUES (?, ?, ?, ?, ?)
+    """, (
+        (row['insurer_id'], row['name'], row['claim_settlement_ratio'],
+         row['amount_settlement_ratio'], row['complaints_volume'])
+        for row in insurers_data
+    ))
 
     # -- INSERT INTO term_plans
-    for row in plans_data:
-        cursor.execute("""
-            INSERT INTO term_plans (
-                plan_id, insurer_id, plan_name,
-                min_cover, max_cover,
-                min_term, max_term,
-                min_age, max_age,
-                free_riders, paid_riders,
-                plan_link
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            row['plan_id'],
-            row['insurer_id'],
-            row['plan_name'],
-            row['min_cover'],
-            row['max_cover'],
-            row['min_term'],
-            row['max_term'],
-            row['min_age'],
-            row['max_age'],
-            row['free_riders'],
-            row['paid_riders'],
-            row['plan_link']
-        ))
-
-    # -- INSERT INTO premiums
-    for row in premiums_data:
-        cursor.execute("""
+    cursor.executemany("""
+        INSERT INTO term_plans (
+            plan_id, insurer_id, plan_name,
+            min_cover, max_cover,
+            min_term, max_term,
+            min_age, max_age,
+            free_riders, paid_riders,
+            plan_link
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        (row['plan_id'], row['insurer_id'], row['plan_name'],
+         row['min_cover'], row['max_cover'],
+         row['min_term'], row['max_term'],
+         row['min_age'], row['max_age'],
+         row['free_riders'], row['paid_riders'],
+         row['plan_link'])
+        for row in plans_data
+    ))
+
+    if compact:
+        count = insert_band_data_into_db(cursor, premium_rows, bands)
+    else:
+        # -- INSERT INTO premiums
+        cursor.executemany("""
             INSERT INTO premiums (
                 premium_id, plan_id, age_min, age_max, term_min, term_max, coverage_min, coverage_max, required_min_income, annual_premium
             ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            row['premium_id'],
-            row['plan_id'],
-            row['age_min'],
-            row['age_max'],
-            row['term_min'],
-            row['term_max'],
-            row['coverage_min'],
-            row['coverage_max'],
-            row['required_min_income'],
-            row['annual_premium']
-        ))
+        """, (row[:len(PREMIUM_COLUMNS)] for row in premium_rows))
+        count = cursor.rowcount
 
+    create_indexes(cursor, compact=compact)
     conn.commit()
-    print("✅ All mock data inserted into database successfully.")
-    
-# Step 1: Open or create your SQLite DB
-conn = sqlite3.connect("data/term_insurance.db")
+    print(f"✅ All mock data inserted into database successfully ({count:,} premium rows{', compact band schema' if compact else ''}).")
+    return count
+
+def insert_band_data_into_db(cursor, premium_rows, bands):
+    # -- INSERT INTO the band dimension tables
+    cursor.executemany("INSERT INTO age_bands (age_band, age_min, age_max) VALUES (?, ?, ?)",
+                       ((age_band, a_min, a_max) for age_band, (a_min, a_max) in enumerate(bands["age"], start=1)))
+    cursor.executemany("INSERT INTO term_bands (term_band, term_min, term_max) VALUES (?, ?, ?)",
+                       ((term_band, t_min, t_max) for term_band, (t_min, t_max) in enumerate(bands["term"], start=1)))
+    cursor.executemany(
+        "INSERT INTO coverage_bands (cov_band, coverage_min, coverage_max, required_min_income) VALUES (?, ?, ?, ?)",
+        ((cov_band, cov_min, cov_max, compute_required_income(cov_min, cov_max))
+         for cov_band, (cov_min, cov_max) in enumerate(bands["coverage"], start=1))
+    )
+
+    # -- INSERT INTO premium_rates
+    plan_id, annual_premium = PREMIUM_COLUMNS.index("plan_id"), PREMIUM_COLUMNS.index("annual_premium")
+    cursor.executemany("""
+        INSERT INTO premium_rates (
+            plan_id, age_band, term_band, cov_band, annual_premium
+        ) VALUES (?, ?, ?, ?, ?)
+    """, ((row[plan_id], *row[len(PREMIUM_COLUMNS):], row[annual_premium]) for row in premium_rows))
+    return cursor.rowcount
+
+def create_indexes(cursor, compact=False):
+    """
+    Build the indexes in one pass over the loaded tables, rather than updating them row by row.
+    """
+    # -- Create the FTS5 feature index over plans and riders (rowid = plan_id).
+    # Riders are comma-separated text, so a full-text index is what lets one query
+    # answer "which plans give critical illness free?".
+    cursor.execute("""
+    CREATE VIRTUAL TABLE plan_features USING fts5(
+        plan_name,
+        insurer_name,
+        free_riders,
+        paid_riders,
+        plan_link,
+        tokenize = 'porter unicode61'
+    );
+    """)
+
+    # -- Populate the feature index from the plans
+    cursor.execute("""
+        INSERT INTO plan_features (rowid, plan_name, insurer_name, free_riders, paid_riders, plan_link)
+        SELECT t.plan_id, t.plan_name, i.name, t.free_riders, t.paid_riders, t.plan_link
+        FROM term_plans t
+        JOIN insurers i ON t.insurer_id = i.insurer_id
+    """)
 
-# Step 2: (Optional) Create tables first if not already done
-create_tables(conn)
+    if compact:
+        return
+
+    # -- Create the R*Tree eligibility index over the premium bands.
+    # Each premium row is a 3-D box (age x term x coverage); a lookup is a
+    # point-in-box query, which the R*Tree answers without scanning premiums.
+    # rtree_i32 keeps the coordinates exact (coverage does not fit a float32).
+    cursor.execute("""
+    CREATE VIRTUAL TABLE premiums_rtree USING rtree_i32(
+        premium_id,
+        age_min, age_max,
+        term_min, term_max,
+        coverage_min, coverage_max
+    );
+    """)
 
-# Step 3: Call the insertion function
-insert_data_into_db(conn, insurers_data, plans_data, premiums_data)
+    # -- Populate the R*Tree index from the premiums
+    cursor.execute("""
+        INSERT INTO premiums_rtree (
+            premium_id, age_min, age_max, term_min, term_max, coverage_min, coverage_max
+        )
+        SELECT premium_id, age_min, age_max, term_min, term_max, coverage_min, coverage_max
+        FROM premiums
+    """)
 
-# Step 4: Done
-conn.close()
\ No newline at end of file
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--compact", action="store_true",
+                        help="Store rates in band dimension tables plus a WITHOUT ROWID premium_rates fact table")
+    parser.add_argument("--out-dir", default="data", help="Where the CSVs and term_insurance.db are written")
+    parser.add_argument("--insurers", type=int, default=len(named_insurers), help="Number of insurers")
+    parser.add_argument("--plans-per-insurer", type=int, default=2, help="Number of plans per insurer")
+    parser.add_argument("--age-step", type=int, help="Uniform age band width in years (default: 1-year bands)")
+    parser.add_argument("--term-step", type=int, help="Uniform term band width in years (default: 3 to 5-year bands)")
+    parser.add_argument("--coverage-step", type=int, help="Uniform coverage band width in rupees (default: 10L to 50L bands)")
+    parser.add_argument("--target-rows", type=int,
+                        help="Pick the coverage band width that gives at least this many premium rows (overrides --coverage-step)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed of the per-insurer and per-plan RNGs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes computing premium blocks")
+    parser.add_argument("--no-csv", action="store_true", help="Only write the database")
+    args = parser.parse_args()
+
+    insurers_data = make_insurers(args.insurers, seed=args.seed)
+    plans_data = make_plans(insurers_data, args.plans_per_insurer)
+    bands = make_bands(args.age_step, args.term_step, args.coverage_step)
+    if args.target_rows:
+        bands = make_bands(args.age_step, args.term_step, coverage_step_for_target(plans_data, bands, args.target_rows))
+    print(f"Generating {len(insurers_data)} insurers, {len(plans_data)} plans and "
+          f"{count_premium_rows(plans_data, bands):,} premium rows "
+          f"({len(bands['age'])} age x {len(bands['term'])} term x {len(bands['coverage'])} coverage bands).")
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    if not args.no_csv:
+        write_catalogue_csv(args.out_dir, insurers_data, plans_data)
+
+    # Step 1: Create the SQLite DB in a fresh file: dropping a previous build's tables
+    # would leave its pages on the freelist, and the file (and every mmap, backup and
+    # snapshot copy of it) that much larger
+    db_path = os.path.join(args.out_dir, "term_insurance.db")
+    remove_database(db_path)
+    conn = sqlite3.connect(db_path)
+    set_pragmas(conn, BULK_LOAD_PRAGMAS)
+
+    # Step 2: (Optional) Create tables first if not already done
+    create_tables(conn, compact=args.compact)
+
+    # Step 3: Stream the premium rows into premiums.csv and the database in one pass
+    premium_rows = iter_premium_rows(plans_data, bands, seed=args.seed, workers=args.workers)
+    if args.no_csv:
+        insert_data_into_db(conn, insurers_data, plans_data, premium_rows, bands, compact=args.compact)
+    else:
+        with open(os.path.join(args.out_dir, "premiums.csv"), "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(PREMIUM_COLUMNS)
+            premium_rows = tee_to_csv(premium_rows, writer, len(PREMIUM_COLUMNS))
+            insert_data_into_db(conn, insurers_data, plans_data, premium_rows, bands, compact=args.compact)
+
+    # Step 4: Done
+    reclaim_free_pages(conn)
+    set_pragmas(conn, SERVING_PRAGMAS)
+    conn.close()
+
+if __name__ == "__main__":
+    main()
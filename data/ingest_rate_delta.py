@@ -0,0 +1,54 @@
+"""
+Apply an insurer's rate revision to data/term_insurance.db without rebuilding it.
+
+The revision is a CSV in the premiums.csv layout (premium_id may be left out), with
+rows for one or more plans. Rows are matched to the existing rates by plan and band:
+- a new band is inserted, a known band gets the new premium/income,
+- a row with an empty annual_premium deletes that band,
+- with --replace, the file is each plan's complete rate sheet and bands it does not
+  list are deleted.
+
+The revised rate sheet of every plan is validated (no overlapping bands, no unknown
+bands in the compact schema) before anything is written. The writes then go in one
+short transaction that also bumps PRAGMA user_version, so the tools keep serving
+reads throughout.
+
+Usage:
+    python data/ingest_rate_delta.py revision.csv [--replace] [--dry-run] [--db data/term_insurance.db]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from src.tools.rate_delta import ingest_rate_delta
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("delta", help="CSV with the revised rates")
+    parser.add_argument("--db", default="data/term_insurance.db", help="Database built by data/generate_mock_data.py")
+    parser.add_argument("--replace", action="store_true", help="Treat the file as the full rate sheet of each plan in it")
+    parser.add_argument("--dry-run", action="store_true", help="Validate and report the changes without writing them")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        changes, version = ingest_rate_delta(args.db, args.delta, replace=args.replace, dry_run=args.dry_run)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"❌ {str(e)}")
+        sys.exit(1)
+
+    for plan_id, plan in changes.items():
+        print(f"Plan {plan_id}: {len(plan['insert'])} inserted, {len(plan['update'])} updated, {len(plan['delete'])} deleted")
+    if not changes:
+        print("No rate changes.")
+    elif args.dry_run:
+        print("Dry run, nothing written.")
+    else:
+        plans = ",".join(str(plan_id) for plan_id in changes)
+        print(f"✅ Delta applied in {time.perf_counter() - start:.2f}s, database version {version}.")
+        print(f"Refresh the derived data: python data/build_premium_cube.py && python data/build_recommendation_table.py --plans {plans}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Publish data/term_insurance.db as a new immutable snapshot for the running tools.
+
+A snapshot is a directory data/snapshots/<version>/ holding a consistent copy of
+the database (taken with the SQLite backup API, so it is safe while the database
+is being written) and the indexes derived from it: the premium cube and, unless
+--no-recommendations, the recommendation table. Once everything is built, the
+data/snapshots/CURRENT pointer is replaced atomically. Every process serving the
+tools notices the new pointer on its next request, warms the snapshot in the
+background and swaps it in; in-flight requests finish on the previous one.
+
+Workflow after a rate revision:
+    python data/ingest_rate_delta.py revision.csv
+    python data/publish_snapshot.py --plans 3
+
+Usage:
+    python data/publish_snapshot.py [--db data/term_insurance.db] [--plans 3,5] [--keep 3]
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from src.tools.connection_pool import database_version
+from src.tools.premium_cube import build_cube_arrays, write_cube
+from src.tools.recommendation_table import RECOMMENDATIONS_FILE, build_recommendation_table
+from src.tools.snapshot import CURRENT_FILE, SNAPSHOT_DB
+
+def current_snapshot(snapshots_dir):
+    try:
+        with open(os.path.join(snapshots_dir, CURRENT_FILE), encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def prune_snapshots(snapshots_dir, keep):
+    """
+    Delete all but the newest keep snapshots. Keep at least 2: processes that have
+    not swapped yet still read the previous one.
+    """
+    names = sorted(
+        name for name in os.listdir(snapshots_dir)
+        if os.path.isdir(os.path.join(snapshots_dir, name)) and not name.startswith(".")
+    )
+    for name in names[:-keep]:
+        shutil.rmtree(os.path.join(snapshots_dir, name), ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="data/term_insurance.db", help="Database to publish")
+    parser.add_argument("--snapshots", default=None, help="Snapshot directory (default: snapshots/ next to the database)")
+    parser.add_argument("--plans", default=None,
+                        help="Comma-separated plan_ids changed since the current snapshot: its recommendation table is refreshed incrementally")
+    parser.add_argument("--no-recommendations", action="store_true", help="Skip the recommendation table")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for the recommendation table")
+    parser.add_argument("--keep", type=int, default=3, help="Snapshots to keep on disk (at least 2)")
+    args = parser.parse_args()
+
+    snapshots_dir = args.snapshots or os.path.join(os.path.dirname(os.path.abspath(args.db)), "snapshots")
+    os.makedirs(snapshots_dir, exist_ok=True)
+    start = time.perf_counter()
+
+    source = sqlite3.connect(args.db)
+    user_version = source.execute("PRAGMA user_version").fetchone()[0]
+    name = time.strftime("%Y%m%dT%H%M%S") + f"-v{user_version}"
+    n = 1
+    while os.path.exists(os.path.join(snapshots_dir, name + (f"-{n}" if n > 1 else ""))):
+        n += 1
+    name += f"-{n}" if n > 1 else ""
+    staging = os.path.join(snapshots_dir, f".{name}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    # 1. A consistent copy of the database, even while an ingest is writing
+    db_path = os.path.join(staging, SNAPSHOT_DB)
+    copy = sqlite3.connect(db_path)
+    source.backup(copy)
+    source.close()
+    copy.close()
+
+    # 2. The premium cube
+    version = database_version(db_path)
+    conn = sqlite3.connect(db_path)
+    premiums, incomes, eligible, edges, plans = build_cube_arrays(conn)
+    conn.close()
+    write_cube(staging, premiums, incomes, eligible, edges, plans, version)
+
+    # 3. The recommendation table, refreshed from the current snapshot's when only a few plans changed
+    if not args.no_recommendations:
+        previous = current_snapshot(snapshots_dir)
+        changed = [int(plan_id) for plan_id in args.plans.split(",")] if args.plans else None
+        previous_table = os.path.join(snapshots_dir, previous, RECOMMENDATIONS_FILE) if previous else None
+        if changed is not None and previous_table and os.path.exists(previous_table):
+            shutil.copyfile(previous_table, os.path.join(staging, RECOMMENDATIONS_FILE))
+        else:
+            changed = None
+        build_recommendation_table(db_path, workers=args.workers, changed_plan_ids=changed)
+
+    # 4. Publish: move the finished directory into place, then switch the pointer atomically
+    final = os.path.join(snapshots_dir, name)
+    os.rename(staging, final)
+    pointer = os.path.join(snapshots_dir, CURRENT_FILE)
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(name + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer + ".tmp", pointer)
+
+    prune_snapshots(snapshots_dir, max(2, args.keep))
+    print(f"✅ Snapshot {name} published in {time.perf_counter() - start:.1f}s.")
+
+if __name__ == "__main__":
+    main()
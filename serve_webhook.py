@@ -0,0 +1,170 @@
+"""
+Production launcher for the WhatsApp webhook: preload once, then fork workers.
+
+The master process imports the webhook and the openai SDK, loads the snapshot
+to serve with its premium cube, recommendation table, ranker and name resolvers,
+and warms the chart backend when charts are rendered inline (with render workers,
+each worker starts its own warm pool). It then freezes the garbage collector (so
+collections in the workers do not touch, and copy, the preloaded objects) and
+forks --workers processes that accept requests on one shared socket. Workers
+therefore start serving immediately and share the preloaded state copy-on-write
+instead of each building its own copy.
+
+The master restarts workers that die, and reports per-worker memory: RSS, PSS
+(RSS with shared pages divided among the processes sharing them) and the shared
+and private parts, from /proc/<pid>/smaps_rollup.
+
+Conversation state (the webhook's active_sessions) lives in each worker, so a
+customer's consecutive messages can reach different workers; run one worker per
+host until sessions are kept outside the process.
+
+Usage:
+    python serve_webhook.py --workers 4 --port 5000
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+def preload():
+    """
+    Import and warm everything the workers need. Returns (app, snapshot name).
+    """
+    import openai  # noqa: F401  LLMClient imports the SDK lazily; load it once for every worker
+    import whatsapp_webhook
+    from src.tools.functions import warm_chart_renderer
+    from src.tools.snapshot import snapshot_manager
+
+    snapshot = snapshot_manager.preload()
+    warm_chart_renderer()
+
+    # Objects allocated so far are never collected: the workers' collections skip them
+    gc.collect()
+    gc.freeze()
+    return whatsapp_webhook.app, snapshot
+
+def memory_usage(pid):
+    """
+    {rss, pss, shared, private} in kB for a process, or None if unavailable (non-Linux, exited).
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+    except OSError:
+        return None
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+def report_memory(master_pid, worker_pids):
+    rows = [("master", master_pid)] + [(f"worker {n}", pid) for n, pid in enumerate(worker_pids, start=1)]
+    usage = [(label, pid, memory_usage(pid)) for label, pid in rows]
+    usage = [(label, pid, mem) for label, pid, mem in usage if mem is not None]
+    if not usage:
+        print("Memory report unavailable (needs /proc/<pid>/smaps_rollup)")
+        return
+    print(f"{'process':<10} {'pid':>7} {'RSS MB':>8} {'PSS MB':>8} {'shared MB':>10} {'private MB':>11}")
+    for label, pid, mem in usage:
+        print(f"{label:<10} {pid:>7} {mem['rss'] / 1024:8.1f} {mem['pss'] / 1024:8.1f} "
+              f"{mem['shared'] / 1024:10.1f} {mem['private'] / 1024:11.1f}")
+    total_rss = sum(mem["rss"] for _, _, mem in usage)
+    total_pss = sum(mem["pss"] for _, _, mem in usage)
+    print(f"Sum of RSS {total_rss / 1024:.1f} MB, actually used (sum of PSS) {total_pss / 1024:.1f} MB: "
+          f"{(total_rss - total_pss) / 1024:.1f} MB is shared between the processes")
+
+def serve(sock, app):
+    from werkzeug.serving import make_server
+
+    host, port = sock.getsockname()[:2]
+    make_server(host, port, app, threaded=True, fd=sock.fileno()).serve_forever()
+
+def spawn_worker(sock, app):
+    pid = os.fork()
+    if pid == 0:
+        from src.tools.render_pool import render_pool
+
+        # Stop through the finally block, which shuts the worker's render processes down
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        status = 0
+        try:
+            # Each worker renders charts in its own pool of processes, started (and
+            # warmed) now rather than on its first chart
+            render_pool.start()
+            serve(sock, app)
+        except Exception as e:
+            print(f"Worker {os.getpid()} failed: {str(e)}")
+            status = 1
+        finally:
+            render_pool.close()
+            os._exit(status)
+    return pid
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=5000, help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--report-after", type=float, default=5.0, help="Seconds after startup to print the memory report")
+    parser.add_argument("--report-interval", type=float, default=0.0, help="Repeat the memory report this often (0: once)")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        raise SystemExit("❌ serve_webhook.py needs fork(); use `flask run` on this platform")
+
+    sock = socket.create_server((args.host, args.port), backlog=128)
+    sock.set_inheritable(True)
+
+    start = time.perf_counter()
+    app, snapshot = preload()
+    print(f"✅ Preloaded in {time.perf_counter() - start:.1f}s (serving {'snapshot ' + snapshot if snapshot else 'the live database'})")
+
+    workers = [spawn_worker(sock, app) for _ in range(args.workers)]
+    print(f"✅ {len(workers)} workers listening on {args.host}:{args.port}")
+
+    stopping = False
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    next_report = time.monotonic() + args.report_after
+    while not stopping:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid = 0
+        if pid and pid in workers:
+            print(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}; restarting it")
+            workers[workers.index(pid)] = spawn_worker(sock, app)
+        if next_report is not None and time.monotonic() >= next_report:
+            report_memory(os.getpid(), workers)
+            next_report = time.monotonic() + args.report_interval if args.report_interval > 0 else None
+        time.sleep(0.2)
+
+    for pid in workers:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in workers:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+    sock.close()
+    print("Stopped.")
+
+if __name__ == "__main__":
+    sys.exit(main())
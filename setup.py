@@ -9,9 +9,12 @@ setup(
         "flask",
         "requests",
         "python-dotenv",
-        "openai"
+        "openai",
+        "numpy>=2",
+        "pandas",
+        "pillow"
     ],
     author="Yuvraj",
     description="A term insurance assistant chatbot",
-    python_requires=">=3.8",
+    python_requires=">=3.11",
 ) 
\ No newline at end of file
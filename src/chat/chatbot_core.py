@@ -35,7 +35,9 @@ class ChatbotCore:
             dict: {
                 "responses": list of response strings, 
                 "user_info_state": updated user info state,
-                "debug_info": optional debug information
+                "debug_info": optional debug information,
+                "image": PNG bytes of the chart to show after the responses, or None
+                         (a PendingChart when called inside deferred_charts())
             }
         """
         # Update conversation history
@@ -65,7 +67,7 @@ class ChatbotCore:
             "tool_results": []
         }
         
-        image_path = None
+        image = None
         
         # Handle tool calls if present
         if llm_response.tool_calls:
@@ -83,7 +85,7 @@ class ChatbotCore:
                     })
                     
                     # Execute the function
-                    result, image_path = execute_function(function_name, function_args)
+                    result, image = execute_function(function_name, function_args)
                     debug_info["tool_results"].append(result)
                     
                     # Add the result to the messages
@@ -121,7 +123,7 @@ class ChatbotCore:
                     "responses": assistant_responses,
                     "user_info_state": self.conversation_manager.user_info_state,
                     "debug_info": debug_info,
-                    "image_path": image_path
+                    "image": image
                 }
             else:
                 # If the response is not in our expected JSON format, use it directly
@@ -130,7 +132,7 @@ class ChatbotCore:
                     "responses": [assistant_text_content],
                     "user_info_state": self.conversation_manager.user_info_state,
                     "debug_info": debug_info,
-                    "image_path": image_path
+                    "image": image
                 }
         except Exception as e:
             error_message = f"Error processing response: {str(e)}"
@@ -141,5 +143,5 @@ class ChatbotCore:
                     "error": error_message,
                     "raw_response": assistant_text_content
                 },
-                "image_path": image_path
+                "image": image
             } 
\ No newline at end of file
@@ -1,5 +1,5 @@
 import io
-from openai import AzureOpenAI
+import threading
 
 class LLMClient:
     """
@@ -11,14 +11,32 @@ class LLMClient:
     for function calling.
     """
     def __init__(self, azure_endpoint: str, azure_openai_key: str, model_name: str):
-        # Create a specialized client referencing RabbitHole's endpoint
-        self.client = AzureOpenAI(
-            api_version='2023-09-01-preview',
-            azure_endpoint=azure_endpoint,
-            api_key=azure_openai_key,
-            timeout=60
-        )
+        self.azure_endpoint = azure_endpoint
+        self.azure_openai_key = azure_openai_key
         self.model_name = model_name
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """
+        The AzureOpenAI client, created on the first request: importing the openai
+        SDK takes most of a second, which new sessions and workers should not pay
+        before they have anything to send.
+        """
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from openai import AzureOpenAI
+
+                    # Create a specialized client referencing RabbitHole's endpoint
+                    self._client = AzureOpenAI(
+                        api_version='2023-09-01-preview',
+                        azure_endpoint=self.azure_endpoint,
+                        api_key=self.azure_openai_key,
+                        timeout=60
+                    )
+        return self._client
 
     def call_llm(self, messages, tools) -> str:
         """
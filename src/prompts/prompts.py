@@ -126,6 +126,83 @@ FUNCTION_SCHEMAS = [
             },
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_premium_curve",
+            "description": "Retrieve the annual premiums of every eligible plan across several coverage amounts and terms in a single call, e.g. to answer 'what if I take 1 Cr instead of 2 Cr, or 30 years instead of 25'. Returns one premium matrix per plan (rows = terms, columns = coverage amounts, null where the plan is not available). Prefer this over repeated basic_plan_and_premium_lookup calls when comparing options.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "age": {
+                        "type": "integer",
+                        "description": "Customer's current age in whole years."
+                    },
+                    "income": {
+                        "type": "integer",
+                        "description": "Customer's annual income in rupees."
+                    },
+                    "coverage_amounts": {
+                        "type": "array",
+                        "items": {
+                            "type": "integer"
+                        },
+                        "description": "Coverage amounts in rupees to compare (e.g. [10000000, 15000000, 20000000])."
+                    },
+                    "terms": {
+                        "type": "array",
+                        "items": {
+                            "type": "integer"
+                        },
+                        "description": "Policy terms in years to compare (e.g. [25, 30])."
+                    },
+                    "include_chart": {
+                        "type": "boolean",
+                        "description": "Whether to also send the customer a chart of the premium curves."
+                    }
+                },
+                "required": ["age", "income", "coverage_amounts", "terms"],
+            },
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "search_plan_features",
+            "description": "Search all plans by feature in one call, e.g. 'which plans give critical illness free?'. Matches plan names, insurers, free and paid riders, best match first. Optionally pass the customer's age, term, coverage_amount and income (all four) to return only plans they are eligible for.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "Feature or rider to search for, e.g. 'critical illness' or 'accidental death'."
+                    },
+                    "rider_availability": {
+                        "type": "string",
+                        "enum": ["free", "paid", "any"],
+                        "description": "Only match riders offered for free, only paid riders, or anything (default)."
+                    },
+                    "age": {
+                        "type": "integer",
+                        "description": "Customer's current age in whole years."
+                    },
+                    "term": {
+                        "type": "integer",
+                        "description": "Desired policy term in years."
+                    },
+                    "coverage_amount": {
+                        "type": "integer",
+                        "description": "Desired coverage in rupees (e.g. 10000000 for 1 Cr)."
+                    },
+                    "income": {
+                        "type": "integer",
+                        "description": "Customer's annual income in rupees."
+                    }
+                },
+                "required": ["query"],
+            },
+        }
+    },
     {
         "type": "function",
         "function": {
@@ -167,6 +244,15 @@ FUNCTION_SCHEMAS = [
                             "type": "string"
                         },
                         "description": "List of priority factors to consider for recommendation. Possible values: 'premium' (lowest annual premium), 'csr' (highest claim settlement ratio), 'asr' (highest amount settlement ratio), 'complaints' (lowest complaint volume). The order of factors determines their priority in ranking plans. No need to include all factors, only include the ones you think are most important while keeping in mind the order of importance."
+                    },
+                    "mode": {
+                        "type": "string",
+                        "enum": ["lexicographic", "weighted"],
+                        "description": "How to combine the priority factors. 'lexicographic' (default) ranks by the first factor and uses later ones only to break ties; 'weighted' balances all factors, earlier ones weighing more."
+                    },
+                    "k": {
+                        "type": "integer",
+                        "description": "Number of plans to recommend (default 2)."
                     }
                 },
                 "required": ["age", "income", "coverage_amount", "term", "priority_factors"],
@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Memory budget for rendered charts (0 disables the cache)
+CHART_CACHE_MB = float(os.environ.get("TIA_CHART_CACHE_MB", "64"))
+
+class ChartCache:
+    """
+    A thread-safe LRU cache of rendered charts (PNG bytes), bounded by total size.
+
+    Charts are content-addressed: the key is a hash of the chart kind and everything
+    drawn (the result rows and the title parameters), so every customer whose
+    lookup returns the same rows in the same band cell gets the same image, rendered
+    once. Since the key covers the premiums themselves, a rate change can never
+    serve a stale chart and no versioning is needed.
+    """
+    def __init__(self, max_bytes: int = int(CHART_CACHE_MB * 1024 * 1024)):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(chart: str, *args, **kwargs) -> str:
+        """
+        Hash a chart call. Dict key order is kept (it is the table's row order).
+        """
+        payload = json.dumps([chart, args, kwargs], default=str, separators=(",", ":"))
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=20).hexdigest()
+
+    def get(self, key: str):
+        """
+        Return the cached PNG bytes for key, or None on a miss.
+        """
+        with self._lock:
+            png = self._entries.get(key)
+            if png is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return png
+
+    def put(self, key: str, png: bytes):
+        if len(png) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = png
+            self.size += len(png)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "charts": len(self._entries),
+                "bytes": self.size,
+            }
+
+
+chart_cache = ChartCache()
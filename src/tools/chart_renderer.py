@@ -0,0 +1,382 @@
+import importlib.util
+import io
+import os
+import threading
+
+# Chart backend: "matplotlib" (the original figures) or "pillow" (tables drawn
+# directly onto a raster, several times faster; line charts still use matplotlib)
+CHART_RENDERER = os.environ.get("TIA_CHART_RENDERER", "matplotlib").lower()
+
+# Charts are quantized to a palette of this many colours before encoding, which
+# shrinks the PNGs we upload several-fold (0 keeps full colour)
+CHART_COLORS = int(os.environ.get("TIA_CHART_COLORS", "256"))
+
+# Rows whose cells hold long rider lists and are wrapped
+WRAPPED_ROWS = ('paid_riders', 'free_riders')
+
+# pandas and matplotlib take most of a cold import of the tool layer, and most tool
+# calls never draw a chart: both are imported on first use instead
+_pyplot = None
+
+def import_pyplot():
+    """
+    matplotlib.pyplot on the Agg backend, imported by the first chart.
+    """
+    global _pyplot
+    if _pyplot is None:
+        import matplotlib
+        matplotlib.use('Agg')  # Set the backend to 'Agg' before importing pyplot
+        import matplotlib.pyplot
+        _pyplot = matplotlib.pyplot
+    return _pyplot
+
+def encode_png(image, colors: int = None) -> bytes:
+    """
+    PNG bytes of a PIL image, quantized to a palette of `colors` colours (default
+    CHART_COLORS; 0 keeps full colour).
+    """
+    from PIL import Image
+
+    colors = CHART_COLORS if colors is None else colors
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    if colors:
+        if image.mode == "L":
+            image = image.convert("RGB")
+        image = image.quantize(colors=colors, method=Image.Quantize.FASTOCTREE)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def table_cells(results, first_rows=()):
+    """
+    (row labels, one column of cell strings per result) for a transposed table: a
+    row per result key, in first-seen order, with first_rows moved to the top.
+    """
+    labels = list(dict.fromkeys(key for result in results for key in result))
+    labels = [label for label in first_rows if label in labels] + [label for label in labels if label not in first_rows]
+    columns = [["" if result.get(label) is None else str(result.get(label)) for label in labels] for result in results]
+    return labels, columns
+
+
+class MatplotlibRenderer:
+    """
+    The original charts: matplotlib tables (ax.table) and line plots, at 150 dpi.
+    """
+    name = "matplotlib"
+
+    def _encode(self, fig, colors=None, **savefig_kwargs):
+        plt = import_pyplot()
+        buffer = io.BytesIO()
+        plt.savefig(buffer, format='png', dpi=150, **savefig_kwargs)
+        plt.close(fig)
+        colors = CHART_COLORS if colors is None else colors
+        if not colors:
+            return buffer.getvalue()
+        from PIL import Image
+        buffer.seek(0)
+        return encode_png(Image.open(buffer), colors)
+
+    def plans_table(self, results, title, colors=None):
+        import pandas as pd
+        plt = import_pyplot()
+
+        # Transpose the results so that column names become row labels
+        df_transposed = pd.DataFrame(results).transpose()
+
+        # Create a matplotlib figure sized appropriately based on the transposed table dimensions
+        rows, cols = df_transposed.shape
+        fig, ax = plt.subplots(figsize=(cols * 2, rows * 0.7 + 1))
+
+        # Hide axes and create the table
+        ax.axis('tight')
+        ax.axis('off')
+        table = ax.table(cellText=df_transposed.values,
+                         rowLabels=df_transposed.index,
+                         loc='center',
+                         cellLoc='center')
+
+        # Adjust font size and scale
+        table.auto_set_font_size(False)
+        table.set_fontsize(10)
+        table.scale(1, 1.2)
+
+        # Apply text wrapping to riders rows
+        for (row, col), cell in table._cells.items():
+            if df_transposed.index[row] in WRAPPED_ROWS:
+                cell._text.set_wrap(True)
+                cell.set_height(cell.get_height() * 2)  # Double the height for wrapped text
+
+        # Set a title with parameter details for context
+        plt.title(title)
+        plt.tight_layout()
+        return self._encode(fig, colors)
+
+    def ranked_plans_table(self, results, title, colors=None):
+        import pandas as pd
+        plt = import_pyplot()
+
+        # Transpose the results so that column names become row labels
+        df_transposed = pd.DataFrame(results).transpose()
+
+        # Move rank row to the top by reordering index
+        if 'rank' in df_transposed.index:
+            new_index = ['rank'] + [idx for idx in df_transposed.index if idx != 'rank']
+            df_transposed = df_transposed.reindex(new_index)
+
+        # Create a matplotlib figure with improved width for better horizontal spacing
+        rows, cols = df_transposed.shape
+        fig, ax = plt.subplots(figsize=(10, rows * 0.7 + 1))  # Increased width from 8 to 10
+
+        # Hide axes and create the table
+        ax.axis('tight')
+        ax.axis('off')
+        table = ax.table(cellText=df_transposed.values,
+                         rowLabels=df_transposed.index,
+                         loc='center',
+                         cellLoc='center',
+                         colWidths=[0.4] * cols)  # Set consistent column width
+
+        # Adjust font size and scale
+        table.auto_set_font_size(False)
+        table.set_fontsize(10)
+        table.scale(1.3, 1.2)  # Increased horizontal scale from 1.2 to 1.3
+
+        # Set better horizontal spacing by adjusting column widths and row heights
+        for (row, col), cell in table._cells.items():
+            # Add padding/margin to cells by adjusting width
+            if col >= 0:  # Data cells
+                cell.set_width(0.35)  # Set width for data columns
+
+            if row == -1:  # Row label column
+                cell.set_width(0.3)  # Width for row labels
+
+            # Special handling for rank row and rider rows
+            if row >= 0:
+                if df_transposed.index[row] == 'rank':
+                    cell.set_height(cell.get_height() * 1.5)  # Make rank row 1.5x taller
+                    cell._text.set_fontsize(14)  # Increase font size for rank values
+                elif df_transposed.index[row] in WRAPPED_ROWS:
+                    cell._text.set_wrap(True)
+                    cell.set_height(cell.get_height() * 2)  # Double the height for wrapped text
+
+        # Set a title with parameter details for context
+        plt.title(title)
+
+        # Add more spacing around the plot
+        plt.tight_layout(pad=3.0)  # Increased padding from 2.0 to 3.0
+
+        # Encode with extra margin
+        return self._encode(fig, colors, bbox_inches='tight', pad_inches=0.5)
+
+    def premium_curve(self, result, title, colors=None):
+        plt = import_pyplot()
+
+        # One panel per term, premium against coverage with a line per plan
+        plans = result["plans"]
+        terms = result["terms"]
+        coverage_crores = [amount / 10000000 for amount in result["coverage_amounts"]]
+        fig, axes = plt.subplots(1, len(terms), figsize=(5 * len(terms), 4.5), sharey=True, squeeze=False)
+        for col, (ax, term) in enumerate(zip(axes[0], terms)):
+            for plan in plans:
+                premiums = [premium if premium is not None else float('nan') for premium in plan["annual_premiums"][col]]
+                ax.plot(coverage_crores, premiums, marker='o', label=plan["plan_name"])
+            ax.set_title(f"Term = {term} Yrs")
+            ax.set_xlabel("Coverage (Rs. Cr)")
+            ax.grid(True, alpha=0.3)
+        axes[0][0].set_ylabel("Annual premium (Rs.)")
+        axes[0][-1].legend(fontsize=8)
+
+        fig.suptitle(title)
+        plt.tight_layout()
+        return self._encode(fig, colors)
+
+    def warm(self):
+        """
+        Import pandas and pyplot and draw a throwaway table, so the font cache and
+        glyphs are loaded before the first real chart.
+        """
+        import pandas  # noqa: F401
+        plt = import_pyplot()
+        fig, ax = plt.subplots(figsize=(4, 2))
+        ax.axis('off')
+        ax.table(cellText=[["Rs. 0123456789"]], rowLabels=["annual_premium"], loc='center', cellLoc='center')
+        plt.title("Plans Found For - Age = 30 Yrs")
+        fig.canvas.draw()
+        plt.close(fig)
+
+
+class PillowRenderer:
+    """
+    Tables drawn directly with Pillow: text is measured and wrapped by hand and laid
+    out on a grid, with no figure, axes or layout engine. Matches the matplotlib
+    tables' content and sizes (150 dpi, 10 pt text, 14 pt ranks) in a fraction of
+    the time and memory. Line charts are delegated to matplotlib.
+    """
+    name = "pillow"
+
+    FONT_SIZE = 21       # 10 pt at 150 dpi
+    RANK_FONT_SIZE = 29  # 14 pt
+    TITLE_FONT_SIZE = 25 # 12 pt
+    PADDING = 12
+    MARGIN = 30
+    MAX_COLUMN_WIDTH = 480
+    LABEL_FILL = (240, 240, 240)
+    GRID = (0, 0, 0)
+
+    def __init__(self):
+        self._fonts = None
+        self._lock = threading.Lock()
+        self._line_charts = MatplotlibRenderer()
+
+    @staticmethod
+    def _font_path(bold: bool):
+        """
+        DejaVu Sans (matplotlib's default font, so both backends look alike): from
+        TIA_CHART_FONT(_BOLD), else the copy shipped with matplotlib, found without importing it.
+        """
+        configured = os.environ.get("TIA_CHART_FONT_BOLD" if bold else "TIA_CHART_FONT")
+        if configured:
+            return configured
+        spec = importlib.util.find_spec("matplotlib")
+        if spec is None or not spec.submodule_search_locations:
+            return None
+        path = os.path.join(spec.submodule_search_locations[0], "mpl-data", "fonts", "ttf",
+                            "DejaVuSans-Bold.ttf" if bold else "DejaVuSans.ttf")
+        return path if os.path.exists(path) else None
+
+    def fonts(self):
+        if self._fonts is None:
+            with self._lock:
+                if self._fonts is None:
+                    from PIL import ImageFont
+
+                    def load(size, bold=False):
+                        path = self._font_path(bold)
+                        return ImageFont.truetype(path, size) if path else ImageFont.load_default(size)
+
+                    self._fonts = {
+                        "cell": load(self.FONT_SIZE),
+                        "label": load(self.FONT_SIZE, bold=True),
+                        "rank": load(self.RANK_FONT_SIZE, bold=True),
+                        "title": load(self.TITLE_FONT_SIZE),
+                    }
+        return self._fonts
+
+    @staticmethod
+    def _wrap(text, font, width):
+        """
+        Greedy word wrap of text to lines no wider than width pixels (a single
+        overlong word gets a line of its own).
+        """
+        lines = []
+        for paragraph in str(text).split("\n"):
+            line = ""
+            for word in paragraph.split(" "):
+                candidate = f"{line} {word}" if line else word
+                if line and font.getlength(candidate) > width:
+                    lines.append(line)
+                    line = word
+                else:
+                    line = candidate
+            lines.append(line)
+        return lines
+
+    def _table(self, results, title, first_rows=(), colors=None):
+        from PIL import Image, ImageDraw
+
+        fonts = self.fonts()
+        labels, columns = table_cells(results, first_rows)
+        pad = self.PADDING
+
+        def cell_font(label):
+            return fonts["rank"] if label == "rank" else fonts["cell"]
+
+        label_width = max(fonts["label"].getlength(label) for label in labels) + 2 * pad
+        column_widths = [
+            min(self.MAX_COLUMN_WIDTH, max(cell_font(label).getlength(cell) for label, cell in zip(labels, column)) + 2 * pad)
+            for column in columns
+        ]
+        # Wrapped lines of every cell, and each row's height
+        cells = [
+            [self._wrap(cell, cell_font(label), width - 2 * pad) for label, cell in zip(labels, column)]
+            for column, width in zip(columns, column_widths)
+        ]
+        row_heights = []
+        for i, label in enumerate(labels):
+            ascent, descent = cell_font(label).getmetrics()
+            lines = max(len(column[i]) for column in cells)
+            row_heights.append(int(lines * (ascent + descent + 4) + 2 * pad))
+
+        table_width = int(label_width + sum(column_widths))
+        title_font = fonts["title"]
+        title_lines = self._wrap(title, title_font, max(table_width, 900))
+        title_ascent, title_descent = title_font.getmetrics()
+        title_height = len(title_lines) * (title_ascent + title_descent + 4)
+        width = int(max(table_width, max(title_font.getlength(line) for line in title_lines))) + 2 * self.MARGIN
+        height = self.MARGIN + title_height + pad + sum(row_heights) + self.MARGIN
+
+        image = Image.new("RGB", (width, height), "white")
+        draw = ImageDraw.Draw(image)
+        y = self.MARGIN
+        for line in title_lines:
+            draw.text((width / 2, y), line, font=title_font, fill="black", anchor="mt")
+            y += title_ascent + title_descent + 4
+        y += pad
+
+        left = (width - table_width) // 2
+        for i, label in enumerate(labels):
+            row_height = row_heights[i]
+            x = left
+            draw.rectangle([x, y, x + label_width, y + row_height], fill=self.LABEL_FILL, outline=self.GRID)
+            draw.text((x + label_width / 2, y + row_height / 2), label, font=fonts["label"], fill="black", anchor="mm")
+            x += label_width
+            font = cell_font(label)
+            ascent, descent = font.getmetrics()
+            line_height = ascent + descent + 4
+            for column, column_width in zip(cells, column_widths):
+                draw.rectangle([x, y, x + column_width, y + row_height], fill="white", outline=self.GRID)
+                lines = column[i]
+                top = y + (row_height - len(lines) * line_height) / 2
+                for n, line in enumerate(lines):
+                    draw.text((x + column_width / 2, top + n * line_height), line, font=font, fill="black", anchor="mt")
+                x += column_width
+            y += row_height
+
+        return encode_png(image, colors)
+
+    def plans_table(self, results, title, colors=None):
+        return self._table(results, title, colors=colors)
+
+    def ranked_plans_table(self, results, title, colors=None):
+        return self._table(results, title, first_rows=("rank",), colors=colors)
+
+    def premium_curve(self, result, title, colors=None):
+        return self._line_charts.premium_curve(result, title, colors)
+
+    def warm(self):
+        self._table([{"annual_premium": 1234567890}], "Plans Found For - Age = 30 Yrs")
+
+
+RENDERERS = {
+    "matplotlib": MatplotlibRenderer,
+    "pillow": PillowRenderer,
+}
+
+_renderers = {}
+_renderers_lock = threading.Lock()
+
+def get_chart_renderer(name: str = None):
+    """
+    The renderer for a backend name (default CHART_RENDERER), created once per process.
+    An unknown name falls back to matplotlib.
+    """
+    name = (name or CHART_RENDERER).lower()
+    if name not in RENDERERS:
+        print(f"Unknown chart renderer {name!r}, using matplotlib")
+        name = "matplotlib"
+    renderer = _renderers.get(name)
+    if renderer is None:
+        with _renderers_lock:
+            renderer = _renderers.setdefault(name, RENDERERS[name]())
+    return renderer
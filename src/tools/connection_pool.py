@@ -0,0 +1,298 @@
+import itertools
+import os
+import queue
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from pathlib import Path
+
+from src.tools.profiling import ProfiledConnection, profiler
+
+DB_PATH = 'data/term_insurance.db'
+
+# Opt-in: serve every tool from an in-memory copy of DB_PATH instead of the file
+DB_IN_MEMORY = os.environ.get("TIA_DB_IN_MEMORY", "").lower() in ("1", "true", "yes")
+
+# Read-side tuning applied to every pooled connection
+PRAGMAS = {
+    "mmap_size": 268435456,  # map up to 256 MB of the file instead of read() into the page cache
+    "cache_size": -65536,    # 64 MB page cache per connection (negative => KiB)
+    "query_only": "ON",      # refuse any write, even through a bug in a tool
+}
+
+def database_version(db_path: str = DB_PATH):
+    """
+    A cheap change token for the database: (mtime_ns, size) of the file and of its
+    WAL, if any. Any committed write changes it.
+    """
+    version = []
+    for path in (db_path, db_path + "-wal"):
+        try:
+            st = os.stat(path)
+            version.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            version.append(None)
+    return tuple(version)
+
+def database_file(conn: sqlite3.Connection) -> str:
+    """
+    Path of the file behind conn's main database, or "" for an in-memory database.
+    """
+    return next((row[2] for row in conn.execute("PRAGMA database_list") if row[1] == "main"), "")
+
+# Table every in-memory copy gets, naming the file and the file's mtime it was copied from
+REPLICA_SOURCE_TABLE = "tia_replica_source"
+
+def database_identity(conn: sqlite3.Connection):
+    """
+    (key, version) of the data behind conn, for caches of structures built from it:
+    the file and its database_version(), or for a ConnectionPool's in-memory copy,
+    the file it was copied from and the file's mtime at copy time (so every
+    connection to the same copy shares one entry). (None, None) for any other
+    in-memory database.
+    """
+    db_file = database_file(conn)
+    if db_file:
+        return db_file, database_version(db_file)
+    try:
+        row = conn.execute(f"SELECT source, source_mtime FROM {REPLICA_SOURCE_TABLE}").fetchone()
+    except sqlite3.Error:
+        return None, None
+    if row is None:
+        return None, None
+    return in_memory_key(row[0]), row[1]
+
+def in_memory_key(db_file: str) -> str:
+    """
+    The database_identity() key of the in-memory copies of db_file.
+    """
+    return f"{db_file} (in memory)"
+
+class ConnectionPool:
+    """
+    A thread-safe pool of read-only SQLite connections.
+
+    Each connection is opened once through a `mode=ro` URI, tuned with PRAGMAS and
+    kept with sqlite3's prepared-statement cache, then handed to one thread at a
+    time. At most `max_connections` are opened; further callers wait for one to
+    be released.
+
+    Counters:
+    - hits:  checkouts served by an idle connection
+    - waits: checkouts that had to block because every connection was busy
+    - opens: connections opened
+
+    With immutable=True the file is opened with `immutable=1`: SQLite then takes no
+    locks and never checks for changes, which is only safe for files nothing writes
+    to again, such as a published snapshot (src/tools/snapshot.py).
+
+    While SQL profiling is enabled (src/tools/profiling.py), new connections are
+    opened as ProfiledConnection and their statements are reported on release.
+
+    With in_memory=True the whole file is copied once, through the backup API, into a
+    shared-cache in-memory database, and the pooled connections read that copy
+    instead of the file. The copy is a snapshot: is_stale() reports when the file
+    has changed since, and get_connection_pool() then swaps in a fresh pool.
+    """
+    def __init__(self, db_path: str = DB_PATH, max_connections: int = 8, timeout: float = 30.0, cached_statements: int = 256, in_memory: bool = False, immutable: bool = False):
+        self.db_path = db_path
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.in_memory = in_memory
+        self.immutable = immutable
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self.hits = 0
+        self.waits = 0
+        self.opens = 0
+
+        self._replica = None
+        if in_memory:
+            self._load_replica()
+        _pools.add(self)
+
+    def _disk_uri(self) -> str:
+        return Path(self.db_path).resolve().as_uri() + ("?mode=ro&immutable=1" if self.immutable else "?mode=ro")
+
+    def _load_replica(self):
+        # Record the mtime before copying, so a write racing the backup marks the copy stale
+        self.source_mtime = os.stat(self.db_path).st_mtime_ns
+        self._replica_uri = f"file:tia-replica-{os.getpid()}-{next(_replica_ids)}?mode=memory&cache=shared"
+        # The in-memory database lives as long as at least one connection to it is open,
+        # so the pool keeps this one for its whole lifetime
+        self._replica = sqlite3.connect(self._replica_uri, uri=True, check_same_thread=False)
+        disk = sqlite3.connect(self._disk_uri(), uri=True)
+        try:
+            disk.backup(self._replica)
+        finally:
+            disk.close()
+        with self._replica:
+            self._replica.execute(f"CREATE TABLE {REPLICA_SOURCE_TABLE} (source TEXT, source_mtime INTEGER)")
+            self._replica.execute(f"INSERT INTO {REPLICA_SOURCE_TABLE} VALUES (?, ?)",
+                                  (os.path.realpath(self.db_path), self.source_mtime))
+
+    def _reset_after_fork(self):
+        """
+        In a forked child: forget the connections inherited from the parent and start
+        empty. SQLite connections must not be used across fork(), nor closed in the
+        child, so the inherited ones are only kept referenced.
+        """
+        while True:
+            try:
+                abandon_connection(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        if self._replica is not None:
+            # An in-memory copy cannot be shared between processes: the child takes its own on first use
+            abandon_connection(self._replica)
+            self._replica = None
+
+    def is_stale(self) -> bool:
+        """
+        True if this pool serves an in-memory copy and the file on disk has changed since it was taken.
+        """
+        if not self.in_memory:
+            return False
+        try:
+            return os.stat(self.db_path).st_mtime_ns != self.source_mtime
+        except OSError:
+            return False
+
+    def _open(self) -> sqlite3.Connection:
+        if self.in_memory and self._replica is None:
+            with self._lock:
+                if self._replica is None:
+                    self._load_replica()
+        uri = self._replica_uri if self.in_memory else self._disk_uri()
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=self.cached_statements,
+                               factory=profiler.connection_factory())
+        conn.row_factory = sqlite3.Row
+        for name, value in PRAGMAS.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self.hits += 1
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._opened < self.max_connections
+            if can_open:
+                self._opened += 1
+                self.opens += 1
+            else:
+                self.waits += 1
+
+        if can_open:
+            try:
+                return self._open()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(f"Timed out after {self.timeout}s waiting for a database connection")
+
+    def release(self, conn: sqlite3.Connection):
+        if isinstance(conn, ProfiledConnection):
+            conn.finish_statements()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """
+        Check a connection out for the duration of a `with` block.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "waits": self.waits,
+                "opens": self.opens,
+                "open_connections": self._opened,
+                "idle_connections": self._idle.qsize(),
+            }
+
+    def close(self):
+        """
+        Close every idle connection (e.g. at shutdown).
+        """
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+        if self._replica is not None:
+            self._replica.close()
+            self._replica = None
+
+
+_replica_ids = itertools.count(1)
+_pools = weakref.WeakSet()
+_inherited_connections = []
+
+def abandon_connection(conn: sqlite3.Connection):
+    """
+    Keep a connection inherited across fork() referenced for good, so that it is
+    never used or closed (which would touch the parent's SQLite state) in the child.
+    """
+    _inherited_connections.append(conn)
+
+def _after_fork_in_child():
+    for pool in list(_pools):
+        pool._reset_after_fork()
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_connection_pool() -> ConnectionPool:
+    """
+    Return the process-wide pool over DB_PATH, creating it on first use.
+
+    In DB_IN_MEMORY mode a pool whose copy has gone stale is replaced by a pool over
+    a fresh copy. Requests still holding a connection from the old pool finish on
+    it; the old copy is freed once the last of them lets go.
+    """
+    global _pool
+    pool = _pool
+    if pool is None or pool.is_stale():
+        with _pool_lock:
+            if _pool is None or _pool.is_stale():
+                try:
+                    _pool = ConnectionPool(DB_PATH, in_memory=DB_IN_MEMORY)
+                except (OSError, sqlite3.Error) as e:
+                    if _pool is None:
+                        raise
+                    # Keep serving the previous copy rather than failing every call
+                    print(f"Could not refresh in-memory database copy: {str(e)}")
+                    try:
+                        _pool.source_mtime = os.stat(DB_PATH).st_mtime_ns
+                    except OSError:
+                        pass
+            pool = _pool
+    return pool
@@ -1,9 +1,110 @@
+import re
 import sqlite3
-import pandas as pd
-import matplotlib
-matplotlib.use('Agg')  # Set the backend to 'Agg' before importing pyplot
-import matplotlib.pyplot as plt
-import uuid
+import copy
+import contextlib
+import functools
+import threading
+from src.tools.result_cache import result_cache
+from src.tools.chart_cache import chart_cache
+from src.tools.chart_renderer import CHART_COLORS, get_chart_renderer
+from src.tools.render_pool import PendingChart, render_pool
+from src.tools.premium_cube import PremiumCube
+from src.tools.ranking import get_ranker
+from src.tools.name_resolver import get_name_resolvers
+from src.tools.snapshot import WARM_RESULTS, snapshot_manager
+from src.tools.profiling import profiler
+
+# pandas takes a good part of a cold import of this module and only the batch API
+# needs it: it is imported on first use (as are the chart backends, see chart_renderer)
+def import_pandas():
+    import pandas
+    return pandas
+
+def warm_chart_renderer():
+    """
+    Load the configured chart backend (fonts, glyphs, matplotlib's font cache) before
+    the first real chart, e.g. in a preloading master process. Only useful when charts
+    are rendered inline (TIA_RENDER_WORKERS=0): render workers warm themselves.
+    """
+    if render_pool.workers <= 0:
+        get_chart_renderer().warm()
+
+_charts = threading.local()
+
+@contextlib.contextmanager
+def deferred_charts(enabled: bool = True):
+    """
+    Within this block (in the current thread), the charting tools do not wait for
+    their chart: they return their results with a PendingChart that is already
+    rendering in the render pool, so the caller can reply with the results first and
+    deliver the chart after. Charts found in the chart cache are still returned as bytes.
+    """
+    previous = getattr(_charts, "deferred", False)
+    _charts.deferred = enabled
+    try:
+        yield
+    finally:
+        _charts.deferred = previous
+
+@contextlib.contextmanager
+def charts_skipped():
+    """
+    Within this block (in the current thread), the charting tools draw no chart and
+    return their results with None for the image: for callers that only want the
+    data, such as the result cache warmer.
+    """
+    previous = getattr(_charts, "skipped", False)
+    _charts.skipped = True
+    try:
+        yield
+    finally:
+        _charts.skipped = previous
+
+def render_chart(chart: str, *args):
+    """
+    Render renderer.<chart>(*args) in the render pool: PNG bytes (None if the chart is
+    unavailable), or a PendingChart inside deferred_charts().
+    """
+    if getattr(_charts, "deferred", False):
+        return render_pool.submit(chart, *args)
+    return render_pool.render(chart, *args)
+
+def chart_bytes(image):
+    """
+    PNG bytes (or None) of a tool's image, waiting for it if it is a PendingChart.
+    """
+    return image.result() if isinstance(image, PendingChart) else image
+
+def cached_chart(render):
+    """
+    Decorator for the chart functions: render(...) returns PNG bytes (or None when
+    there is nothing to draw), and identical calls are served from chart_cache
+    without rendering. Charts stay in memory from here to the caller: the bytes are
+    immutable, so the cached image itself is handed out. A deferred chart is cached
+    once it is rendered.
+    """
+    @functools.wraps(render)
+    def wrapper(*args, **kwargs):
+        if getattr(_charts, "skipped", False):
+            return None
+        chart = f"{render.__name__}:{render_pool.backend}:{CHART_COLORS}"
+        key = chart_cache.make_key(chart, *args, **kwargs)
+        png = chart_cache.get(key)
+        if png is None:
+            png = render(*args, **kwargs)
+            if png is None:
+                return None
+            if isinstance(png, PendingChart):
+                return PendingChart(functools.partial(cache_pending_chart, key, png))
+            chart_cache.put(key, png)
+        return png
+    return wrapper
+
+def cache_pending_chart(key: str, pending: PendingChart):
+    png = pending.result()
+    if png is not None:
+        chart_cache.put(key, png)
+    return png
 
 def set_dict_factory(conn: sqlite3.Connection):
     """
@@ -12,116 +113,121 @@ def set_dict_factory(conn: sqlite3.Connection):
     """
     conn.row_factory = sqlite3.Row
     
+@profiler.timed_render
+@cached_chart
 def visualise_basic_plan_and_premium_lookup(results, age, term, coverage_amount, income):
-    # Convert results into a DataFrame
-    df = pd.DataFrame(results)
-    
     # If no results, print a message and exit
-    if df.empty:
+    if not results:
         print("No results found for the given parameters.")
         return
 
-    # Transpose the DataFrame so that column names become row labels
-    df_transposed = df.transpose()
-
-    # Create a matplotlib figure sized appropriately based on the transposed table dimensions
-    rows, cols = df_transposed.shape
-    fig, ax = plt.subplots(figsize=(cols * 2, rows * 0.7 + 1))
-    
-    # Hide axes and create the table
-    ax.axis('tight')
-    ax.axis('off')
-    table = ax.table(cellText=df_transposed.values,
-                     rowLabels=df_transposed.index,
-                     loc='center',
-                     cellLoc='center')
-    
-    # Adjust font size and scale
-    table.auto_set_font_size(False)
-    table.set_fontsize(10)
-    table.scale(1, 1.2)
-    
-    # Apply text wrapping to riders rows
-    for (row, col), cell in table._cells.items():
-        if df_transposed.index[row] in ['paid_riders', 'free_riders']:
-            cell._text.set_wrap(True)
-            cell.set_height(cell.get_height() * 2)  # Double the height for wrapped text
-    
-    # Set a title with parameter details for context
-    plt.title(f"Plans Found For - Age = {age} Yrs, Term = {term} Yrs, Coverage = Rs. {coverage_amount}, Income = Rs. {income}")
-    plt.tight_layout()
-    
-    # Save the figure as an image file
-    file_path = f'output_{uuid.uuid4()}.png'
-    plt.savefig(file_path, format='png', dpi=150)
-    plt.close(fig)
-    return file_path
+    # A table with a row per result field and a column per plan
+    title = f"Plans Found For - Age = {age} Yrs, Term = {term} Yrs, Coverage = Rs. {coverage_amount}, Income = Rs. {income}"
+    return render_chart("plans_table", results, title)
 
+@profiler.timed_render
+@cached_chart
 def visualise_get_recommended_plans_based_on_priority_factors(results, age, term, coverage_amount, income):
-    # Convert results into a DataFrame
-    df = pd.DataFrame(results)
-    
     # If no results, print a message and exit
-    if df.empty:
+    if not results:
         print("No results found for the given parameters.")
         return
 
-    # Transpose the DataFrame so that column names become row labels
-    df_transposed = df.transpose()
-    
-    # Move rank row to the top by reordering index
-    if 'rank' in df_transposed.index:
-        new_index = ['rank'] + [idx for idx in df_transposed.index if idx != 'rank']
-        df_transposed = df_transposed.reindex(new_index)
-
-    # Create a matplotlib figure with improved width for better horizontal spacing
-    rows, cols = df_transposed.shape
-    fig, ax = plt.subplots(figsize=(10, rows * 0.7 + 1))  # Increased width from 8 to 10
-    
-    # Hide axes and create the table
-    ax.axis('tight')
-    ax.axis('off')
-    table = ax.table(cellText=df_transposed.values,
-                     rowLabels=df_transposed.index,
-                     loc='center',
-                     cellLoc='center',
-                     colWidths=[0.4] * cols)  # Set consistent column width
-    
-    # Adjust font size and scale
-    table.auto_set_font_size(False)
-    table.set_fontsize(10)
-    table.scale(1.3, 1.2)  # Increased horizontal scale from 1.2 to 1.3
-    
-    # Set better horizontal spacing by adjusting column widths and row heights
-    for (row, col), cell in table._cells.items():
-        # Add padding/margin to cells by adjusting width
-        if col >= 0:  # Data cells
-            cell.set_width(0.35)  # Set width for data columns
-        
-        if row == -1:  # Row label column
-            cell.set_width(0.3)  # Width for row labels
-            
-        # Special handling for rank row and rider rows
-        if row >= 0:
-            if df_transposed.index[row] == 'rank':
-                cell.set_height(cell.get_height() * 1.5)  # Make rank row 1.5x taller
-                cell._text.set_fontsize(14)  # Increase font size for rank values
-            elif df_transposed.index[row] in ['paid_riders', 'free_riders']:
-                cell._text.set_wrap(True)
-                cell.set_height(cell.get_height() * 2)  # Double the height for wrapped text
-    
-    # Set a title with parameter details for context
-    plt.title(f"Top Recommended Plans Based on Priority Factors - Age = {age} Yrs, Term = {term} Yrs, Coverage = Rs. {coverage_amount}, Income = Rs. {income}")
-    
-    # Add more spacing around the plot
-    plt.tight_layout(pad=3.0)  # Increased padding from 2.0 to 3.0
-    
-    # Save the figure as an image file with extra margin
-    file_path = f'output_{uuid.uuid4()}.png'
-    plt.savefig(file_path, format='png', dpi=150, bbox_inches='tight', pad_inches=0.5)  # Added pad_inches
-    plt.close(fig)
-    return file_path
+    # Like the lookup table, with the rank row on top
+    title = f"Top Recommended Plans Based on Priority Factors - Age = {age} Yrs, Term = {term} Yrs, Coverage = Rs. {coverage_amount}, Income = Rs. {income}"
+    return render_chart("ranked_plans_table", results, title)
+
+
+@profiler.timed_render
+@cached_chart
+def visualise_premium_curve(result):
+    if not result["plans"]:
+        print("No results found for the given parameters.")
+        return
+
+    # One panel per term, premium against coverage with a line per plan
+    title = f"Premium Curve - Age = {result['age']} Yrs, Income = Rs. {result['income']}"
+    return render_chart("premium_curve", result, title)
+
+###############################
+# ELIGIBILITY (shared by the lookup tools)
+###############################
+def uses_band_schema(conn: sqlite3.Connection) -> bool:
+    """
+    True when the database stores rates in the compact band schema
+    (band dimension tables + premium_rates), False for the wide premiums table.
+    """
+    sql = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'premium_rates'"
+    return conn.execute(sql).fetchone() is not None
+
+def resolve_bands(conn: sqlite3.Connection, age: int, term: int, coverage_amount: int):
+    """
+    Resolve a customer's (age, term, coverage_amount) to band ids in the compact schema.
+    Returns a tuple of (age_band, term_band, cov_band, required_min_income),
+    or None if any input falls outside every band.
+    """
+    sql = """
+    SELECT a.age_band, tb.term_band, c.cov_band, c.required_min_income
+    FROM age_bands a, term_bands tb, coverage_bands c
+    WHERE a.age_min <= ? AND a.age_max > ?
+      AND tb.term_min <= ? AND tb.term_max > ?
+      AND c.coverage_min <= ? AND c.coverage_max > ?
+    """
+    row = conn.execute(sql, (age, age, term, term, coverage_amount, coverage_amount)).fetchone()
+    return tuple(row) if row else None
+
+def eligible_premiums_clause(conn: sqlite3.Connection, age: int, term: int, coverage_amount: int, income: int):
+    """
+    Build the FROM/WHERE part of a query over every premium row a customer is eligible for,
+    with `p` (premium), `t` (term_plans) and `i` (insurers) in scope.
+    Returns (sql, params), or None when the customer cannot match any premium row.
+    """
+    plan_params = (age, age, term, term, coverage_amount, coverage_amount)
+    plan_sql = """
+      AND t.min_age <= ?
+      AND t.max_age > ?
+      AND t.min_term <= ?
+      AND t.max_term > ?
+      AND t.min_cover <= ?
+      AND t.max_cover > ?
+    """
+
+    if uses_band_schema(conn):
+        # Compact schema: resolve the bands once, then probe premium_rates by primary key per plan.
+        # CROSS JOIN pins that order: without ANALYZE statistics SQLite would rather scan
+        # premium_rates for the band and look each row's plan up
+        bands = resolve_bands(conn, age, term, coverage_amount)
+        if bands is None:
+            return None
+        age_band, term_band, cov_band, required_min_income = bands
+        if required_min_income > income:
+            return None
+        sql = """
+    FROM term_plans t
+    CROSS JOIN premium_rates p ON p.plan_id = t.plan_id
+    JOIN insurers i ON t.insurer_id = i.insurer_id
+    WHERE p.age_band = ?
+      AND p.term_band = ?
+      AND p.cov_band = ?
+    """ + plan_sql
+        return sql, (age_band, term_band, cov_band) + plan_params
 
+    # Wide schema: the band match goes through the premiums_rtree index, so only the
+    # premium rows whose (age, term, coverage) box contains the customer are visited.
+    sql = """
+    FROM premiums_rtree r
+    JOIN premiums p ON p.premium_id = r.premium_id
+    JOIN term_plans t ON p.plan_id = t.plan_id
+    JOIN insurers i ON t.insurer_id = i.insurer_id
+    WHERE r.age_min <= ?
+      AND r.age_max > ?
+      AND r.term_min <= ?
+      AND r.term_max > ?
+      AND r.coverage_min <= ?
+      AND r.coverage_max > ?
+      AND p.required_min_income <= ?
+    """ + plan_sql
+    return sql, (age, age, term, term, coverage_amount, coverage_amount, income) + plan_params
 
 ###############################
 # 1. BASIC PLAN & PREMIUM LOOKUP
@@ -135,38 +241,231 @@ def basic_plan_and_premium_lookup(conn: sqlite3.Connection, age: int, term: int,
     - required_min_income <= income
     """
     set_dict_factory(conn)
-    sql = """
+    rows = []
+    clause = eligible_premiums_clause(conn, age, term, coverage_amount, income)
+    if clause:
+        eligibility_sql, params = clause
+        sql = """
     SELECT 
         i.name AS insurer_name,
         t.plan_name,
         p.annual_premium,
         t.free_riders,
         t.paid_riders
-    FROM premiums p
+    """ + eligibility_sql
+        cursor = conn.execute(sql, params)
+        rows = cursor.fetchall()
+    
+    results = [dict(row) for row in rows]
+    image = visualise_basic_plan_and_premium_lookup(results, age, term, coverage_amount, income)
+    
+    return results, image
+
+###############################
+# 1b. BATCH PLAN & PREMIUM LOOKUP
+###############################
+BATCH_PROFILE_COLUMNS = ["age", "term", "coverage_amount", "income"]
+
+def batch_plan_and_premium_lookup(conn: sqlite3.Connection, profiles, cube: PremiumCube = None):
+    """
+    Quote many customer profiles at once, with the same eligibility rules as
+    basic_plan_and_premium_lookup but vectorized over the premium cube and without charts.
+
+    profiles: a DataFrame (or a dict of equal-length arrays) with columns
+        age, term, coverage_amount, income; any other columns are carried through.
+    cube: a PremiumCube to reuse across calls; built from conn when omitted.
+
+    Returns a DataFrame with one row per eligible (profile, plan): the profile's
+    columns followed by insurer_name, plan_name, annual_premium, free_riders and
+    paid_riders. The index is the profile's index label, repeated per plan.
+    """
+    pd = import_pandas()
+    df = profiles if isinstance(profiles, pd.DataFrame) else pd.DataFrame(profiles)
+    missing = [column for column in BATCH_PROFILE_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Profiles are missing columns: {', '.join(missing)}")
+
+    if cube is None:
+        cube = PremiumCube.from_connection(conn)
+
+    positions, plan_indices, premiums = cube.batch_lookup(
+        df["age"].to_numpy(), df["term"].to_numpy(), df["coverage_amount"].to_numpy(), df["income"].to_numpy()
+    )
+    plans = pd.DataFrame(cube.plans).iloc[plan_indices]
+
+    quotes = df.iloc[positions].copy()
+    quotes["insurer_name"] = plans["insurer_name"].to_numpy()
+    quotes["plan_name"] = plans["plan_name"].to_numpy()
+    quotes["annual_premium"] = premiums
+    quotes["free_riders"] = plans["free_riders"].to_numpy()
+    quotes["paid_riders"] = plans["paid_riders"].to_numpy()
+    return quotes
+
+###############################
+# 1c. PREMIUM CURVE
+###############################
+MAX_PREMIUM_CURVE_POINTS = 100
+
+def premium_curve_clause(conn: sqlite3.Connection):
+    """
+    FROM/WHERE part of the premium curve query: every eligible premium row for each
+    (term, coverage_amount) point of the `grid` CTE, for the :age and :income parameters.
+    """
+    plan_sql = """
+      AND t.min_age <= :age
+      AND t.max_age > :age
+      AND t.min_term <= g.term
+      AND t.max_term > g.term
+      AND t.min_cover <= g.coverage_amount
+      AND t.max_cover > g.coverage_amount
+    """
+    if uses_band_schema(conn):
+        # grid -> bands -> plans -> premium_rates by primary key; CROSS JOIN keeps that
+        # order (left to itself, SQLite scans premium_rates for every grid point)
+        return """
+    FROM grid g
+    CROSS JOIN age_bands a ON a.age_min <= :age AND a.age_max > :age
+    CROSS JOIN term_bands tb ON tb.term_min <= g.term AND tb.term_max > g.term
+    CROSS JOIN coverage_bands c ON c.coverage_min <= g.coverage_amount AND c.coverage_max > g.coverage_amount
+    CROSS JOIN term_plans t
+    CROSS JOIN premium_rates p ON p.plan_id = t.plan_id
+        AND p.age_band = a.age_band
+        AND p.term_band = tb.term_band
+        AND p.cov_band = c.cov_band
+    JOIN insurers i ON t.insurer_id = i.insurer_id
+    WHERE c.required_min_income <= :income
+    """ + plan_sql
+
+    return """
+    FROM grid g
+    JOIN premiums_rtree r ON r.age_min <= :age
+        AND r.age_max > :age
+        AND r.term_min <= g.term
+        AND r.term_max > g.term
+        AND r.coverage_min <= g.coverage_amount
+        AND r.coverage_max > g.coverage_amount
+    JOIN premiums p ON p.premium_id = r.premium_id
     JOIN term_plans t ON p.plan_id = t.plan_id
     JOIN insurers i ON t.insurer_id = i.insurer_id
-    WHERE p.age_min <= ?
-      AND p.age_max > ?
-      AND p.term_min <= ?
-      AND p.term_max > ?
-      AND p.coverage_min <= ?
-      AND p.coverage_max > ?
-      AND p.required_min_income <= ?
-      AND t.min_age <= ?
-      AND t.max_age > ?
-      AND t.min_term <= ?
-      AND t.max_term > ?
-      AND t.min_cover <= ?
-      AND t.max_cover > ?
+    WHERE p.required_min_income <= :income
+    """ + plan_sql
+
+def premium_curve_query(conn: sqlite3.Connection, age: int, income: int, coverage_amounts: list, terms: list):
+    """
+    (sql, params) of the premium curve query over every (term, coverage_amount) pair.
+    """
+    params = {"age": age, "income": income}
+    grid_values = []
+    for n, (term, coverage_amount) in enumerate((t, c) for t in terms for c in coverage_amounts):
+        grid_values.append(f"(:term{n}, :coverage{n})")
+        params[f"term{n}"] = term
+        params[f"coverage{n}"] = coverage_amount
+
+    sql = "WITH grid(term, coverage_amount) AS (VALUES " + ", ".join(grid_values) + ")" + """
+    SELECT
+        g.term,
+        g.coverage_amount,
+        t.plan_id,
+        i.name AS insurer_name,
+        t.plan_name,
+        p.annual_premium
+    """ + premium_curve_clause(conn) + """
+    ORDER BY i.name, t.plan_name
+    """
+    return sql, params
+
+def get_premium_curve(conn: sqlite3.Connection, age: int, income: int, coverage_amounts: list, terms: list, include_chart: bool = False):
+    """
+    Premiums of every eligible plan across several coverage amounts and terms, in one query.
+    Returns ({"age", "income", "coverage_amounts", "terms", "plans"}, image) where each
+    plan carries an `annual_premiums` matrix with one row per term and one column per
+    coverage amount (None where the plan is not available), and image (PNG bytes) is
+    None unless include_chart is set.
     """
-    params = (age, age, term, term, coverage_amount, coverage_amount, income, age, age, term, term, coverage_amount, coverage_amount)
+    set_dict_factory(conn)
+    coverage_amounts = sorted(set(coverage_amounts))
+    terms = sorted(set(terms))
+    if not coverage_amounts or not terms:
+        return {"error": "At least one coverage amount and one term are required"}, None
+    if len(coverage_amounts) * len(terms) > MAX_PREMIUM_CURVE_POINTS:
+        return {"error": f"At most {MAX_PREMIUM_CURVE_POINTS} (coverage, term) combinations are supported"}, None
+
+    sql, params = premium_curve_query(conn, age, income, coverage_amounts, terms)
     cursor = conn.execute(sql, params)
     rows = cursor.fetchall()
+
+    term_index = {term: n for n, term in enumerate(terms)}
+    coverage_index = {coverage_amount: n for n, coverage_amount in enumerate(coverage_amounts)}
+    plans = {}
+    for row in rows:
+        plan = plans.setdefault(row["plan_id"], {
+            "insurer_name": row["insurer_name"],
+            "plan_name": row["plan_name"],
+            "annual_premiums": [[None] * len(coverage_amounts) for _ in terms],
+        })
+        plan["annual_premiums"][term_index[row["term"]]][coverage_index[row["coverage_amount"]]] = row["annual_premium"]
+
+    result = {
+        "age": age,
+        "income": income,
+        "coverage_amounts": coverage_amounts,
+        "terms": terms,
+        "plans": list(plans.values()),
+    }
+    image = visualise_premium_curve(result) if include_chart else None
+    return result, image
+
+###############################
+# 1d. PLAN FEATURE SEARCH
+###############################
+FEATURE_SEARCH_COLUMNS = {
+    "free": ["free_riders"],
+    "paid": ["paid_riders"],
+    "any": ["plan_name", "insurer_name", "free_riders", "paid_riders", "plan_link"],
+}
+
+def search_plan_features(conn: sqlite3.Connection, query: str, rider_availability: str = "any", age: int = None, term: int = None, coverage_amount: int = None, income: int = None, limit: int = 10):
+    """
+    Full-text search over plan names, insurers, riders and plan links (the plan_features FTS5 index).
+    rider_availability restricts the match to riders offered "free", "paid", or "any" column.
+    If age, term, coverage_amount and income are all given, only plans the customer is eligible for are returned.
+    Returns a list of matching plans, best match first, or an error message.
+    """
+    set_dict_factory(conn)
     
-    results = [dict(row) for row in rows]
-    image_path = visualise_basic_plan_and_premium_lookup(results, age, term, coverage_amount, income)
+    # Quote every word so user text can never be read as FTS5 query syntax
+    words = re.findall(r"\w+", query)
+    if not words:
+        return {"error": "Search query is empty"}
+    columns = FEATURE_SEARCH_COLUMNS.get(rider_availability, FEATURE_SEARCH_COLUMNS["any"])
+    match = "{" + " ".join(columns) + "} : (" + " ".join(f'"{word}"' for word in words) + ")"
     
-    return results, image_path
+    sql = """
+    SELECT 
+        t.plan_name,
+        i.name AS insurer_name,
+        t.free_riders,
+        t.paid_riders,
+        t.plan_link,
+        round(-bm25(plan_features), 3) AS relevance
+    FROM plan_features f
+    JOIN term_plans t ON t.plan_id = f.rowid
+    JOIN insurers i ON t.insurer_id = i.insurer_id
+    WHERE plan_features MATCH ?
+    """
+    params = (match,)
+    
+    if None not in (age, term, coverage_amount, income):
+        clause = eligible_premiums_clause(conn, age, term, coverage_amount, income)
+        if not clause:
+            return []
+        eligibility_sql, eligibility_params = clause
+        sql += " AND t.plan_id IN (SELECT t.plan_id " + eligibility_sql + ")"
+        params += eligibility_params
+    
+    sql += " ORDER BY bm25(plan_features) LIMIT ?"
+    cursor = conn.execute(sql, params + (limit,))
+    return [dict(row) for row in cursor.fetchall()]
 
 ###############################
 # 7. LIST INSURERS AND METRICS
@@ -189,90 +488,55 @@ def list_insurers_and_metrics(conn: sqlite3.Connection):
     return [dict(row) for row in rows]
 
 
-def get_recommended_plans_based_on_priority_factors(conn: sqlite3.Connection, age: int, income: int, coverage_amount: int, term: int, priority_factors: list):
+def get_recommended_plans_based_on_priority_factors(conn: sqlite3.Connection, age: int, income: int, coverage_amount: int, term: int, priority_factors: list, k: int = 2, mode: str = "lexicographic"):
     """
     Find the best recommended plans based on user's age, income, coverage needs and prioritized factors.
     Priority factors can be: "premium" (lowest price), "csr" (claim settlement ratio), 
     "asr" (amount settlement ratio), "complaints" (low complaint ratio)
+    mode is "lexicographic" (order by the factors in turn) or "weighted" (weighted sum,
+    earlier factors weighing more), and k is the number of plans to return.
     Returns a ranked list of recommended plans or empty list if no eligible plans found.
     """
     set_dict_factory(conn)
     
-    # Base query to get eligible plans
-    sql = """
-    WITH eligible_plans AS (
-        SELECT 
-            i.name AS insurer_name,
-            t.plan_name,
-            p.annual_premium,
-            i.claim_settlement_ratio,
-            i.amount_settlement_ratio,
-            i.complaints_volume,
-            t.free_riders,
-            t.paid_riders,
-            ROW_NUMBER() OVER (ORDER BY
-    """
-    
-    # Add ordering based on priority factors
-    order_clauses = []
-    for factor in priority_factors:
-        if factor == "premium":
-            order_clauses.append("p.annual_premium ASC")
-        elif factor == "csr":
-            order_clauses.append("i.claim_settlement_ratio DESC")
-        elif factor == "asr":
-            order_clauses.append("i.amount_settlement_ratio DESC")
-        elif factor == "complaints":
-            order_clauses.append("i.complaints_volume ASC")
-            
-    sql += ", ".join(order_clauses)
-    
-    sql += """) as rank
-        FROM premiums p
-        JOIN term_plans t ON p.plan_id = t.plan_id 
-        JOIN insurers i ON t.insurer_id = i.insurer_id
-        WHERE p.age_min <= ?
-          AND p.age_max > ?
-          AND p.term_min <= ?
-          AND p.term_max > ?
-          AND p.coverage_min <= ?
-          AND p.coverage_max > ?
-          AND p.required_min_income <= ?
-          AND t.min_age <= ?
-          AND t.max_age > ?
-          AND t.min_cover <= ?
-          AND t.max_cover > ?
-          AND t.min_term <= ?
-          AND t.max_term > ?
-        LIMIT 2
-    )
-    SELECT * FROM eligible_plans ORDER BY rank
-    """
-    
-    params = (age, age, term, term, coverage_amount, coverage_amount, income, age, age, coverage_amount, coverage_amount, term, term)
-    cursor = conn.execute(sql, params)
-    rows = cursor.fetchall()
-    
-    results = [dict(row) for row in rows]
-    image_path = visualise_get_recommended_plans_based_on_priority_factors(results, age, term, coverage_amount, income)
-    
-    return results, image_path
+    # Fetch every eligible (plan, premium) row; the ranking itself happens in Python
+    candidates = []
+    clause = eligible_premiums_clause(conn, age, term, coverage_amount, income)
+    if clause:
+        eligibility_sql, params = clause
+        sql = """
+    SELECT
+        t.plan_id,
+        p.annual_premium
+    """ + eligibility_sql
+        cursor = conn.execute(sql, params)
+        candidates = [(row["plan_id"], row["annual_premium"]) for row in cursor.fetchall()]
+    
+    results = get_ranker(conn).top_k(candidates, priority_factors, k=k, mode=mode)
+    image = visualise_get_recommended_plans_based_on_priority_factors(results, age, term, coverage_amount, income)
+    
+    return results, image
 
 def get_insurer_details(insurer_name, conn):
     """
-    Fetch details of a specific insurer using approximate name matching.
+    Fetch details of a specific insurer using fuzzy name matching.
     
     Args:
-        insurer_name (str): Name or partial name of the insurer to look up
+        insurer_name (str): Name, alias or misspelling of the insurer to look up
         conn: Database connection object
         
     Returns:
-        dict: Insurer details if found, otherwise error message
+        dict: Insurer details with a match_confidence in [0, 1] if found, otherwise error message
     """
     # Set up dictionary factory
     set_dict_factory(conn)
     
-    # Use LIKE with wildcards for fuzzy name matching
+    # Resolve the name through the trigram index instead of scanning with LIKE
+    insurer_resolver, _ = get_name_resolvers(conn)
+    insurer_id, confidence = insurer_resolver.resolve(insurer_name)
+    if insurer_id is None:
+        return {"error": f"No insurers found matching '{insurer_name}'"}
+    
     sql = """
     SELECT 
         name,
@@ -280,41 +544,37 @@ def get_insurer_details(insurer_name, conn):
         amount_settlement_ratio,
         complaints_volume
     FROM insurers 
-    WHERE LOWER(name) LIKE LOWER(?)
-    OR LOWER(name) LIKE LOWER(?)
-    OR LOWER(?) LIKE CONCAT('%', LOWER(name), '%')
+    WHERE insurer_id = ?
     """
     
-    # Create search patterns
-    search_patterns = (
-        f"%{insurer_name}%",  # Contains the name
-        f"{insurer_name}%",   # Starts with the name
-        insurer_name          # Full name is contained within
-    )
-    
-    cursor = conn.execute(sql, search_patterns)
+    cursor = conn.execute(sql, (insurer_id,))
     results = cursor.fetchone()
     
     if not results:
         return {"error": f"No insurers found matching '{insurer_name}'"}
     
-    # Row should already be a dict if set_dict_factory is used
-    return dict(results)
+    return {**dict(results), "match_confidence": confidence}
 
 def get_plan_details(plan_name, conn):
     """
-    Fetch details of a specific insurance plan using approximate name matching.
+    Fetch details of a specific insurance plan using fuzzy name matching.
     
     Args:
-        plan_name (str): Name or partial name of the plan to look up
+        plan_name (str): Name, alias or misspelling of the plan to look up
         conn: Database connection object
         
     Returns:
-        dict: Plan details if found, otherwise error message
+        dict: Plan details with a match_confidence in [0, 1] if found, otherwise error message
     """
     # Set up dictionary factory
     set_dict_factory(conn)
     
+    # Resolve the name through the trigram index instead of scanning with LIKE
+    _, plan_resolver = get_name_resolvers(conn)
+    plan_id, confidence = plan_resolver.resolve(plan_name)
+    if plan_id is None:
+        return {"error": f"No plans found matching '{plan_name}'"}
+    
     sql = """
     SELECT 
         p.plan_name,
@@ -327,63 +587,166 @@ def get_plan_details(plan_name, conn):
         p.plan_link
     FROM term_plans p
     JOIN insurers i ON p.insurer_id = i.insurer_id
-    WHERE LOWER(p.plan_name) LIKE LOWER(?)
-    OR LOWER(p.plan_name) LIKE LOWER(?)
-    OR LOWER(?) LIKE CONCAT('%', LOWER(p.plan_name), '%')
+    WHERE p.plan_id = ?
     """
     
-    # Create search patterns
-    search_patterns = (
-        f"%{plan_name}%",  # Contains the name
-        f"{plan_name}%",   # Starts with the name
-        plan_name          # Full name is contained within
-    )
-    
-    cursor = conn.execute(sql, search_patterns)
+    cursor = conn.execute(sql, (plan_id,))
     results = cursor.fetchone()
     
     if not results:
         return {"error": f"No plans found matching '{plan_name}'"}
     
-    # Row should already be a dict if set_dict_factory is used
-    return dict(results)
+    return {**dict(results), "match_confidence": confidence}
+
+
+
+
+
+def cube_plan_and_premium_lookup(snapshot, age: int, term: int, coverage_amount: int, income: int):
+    """
+    basic_plan_and_premium_lookup served from the snapshot's premium cube.
+    Returns None when there is no current cube or it does not cover the customer,
+    in which case the SQL path must be used.
+    """
+    cube = snapshot.premium_cube()
+    if cube is None:
+        return None
+    results = cube.lookup(age, term, coverage_amount, income)
+    if results is None:
+        return None
+    image = visualise_basic_plan_and_premium_lookup(results, age, term, coverage_amount, income)
+    return results, image
 
+def materialized_recommended_plans(snapshot, age: int, income: int, coverage_amount: int, term: int, priority_factors: list, k: int = 2, mode: str = "lexicographic"):
+    """
+    get_recommended_plans_based_on_priority_factors served from the snapshot's
+    materialized recommendation table (data/build_recommendation_table.py).
+    Returns None when the table or the premium cube is missing or stale, the mode is
+    not lexicographic, or k exceeds the materialized top-N; the live path must be used then.
+    """
+    if mode != "lexicographic":
+        return None
+    cube = snapshot.premium_cube()
+    table = snapshot.recommendation_table()
+    if cube is None or table is None:
+        return None
+    ranked = table.lookup(cube, age, term, coverage_amount, income, priority_factors, k)
+    if ranked is None:
+        return None
+
+    with snapshot.connection() as conn:
+        ranker = get_ranker(conn)
+    results = ranker.describe(ranked)
+    image = visualise_get_recommended_plans_based_on_priority_factors(results, age, term, coverage_amount, income)
+    return results, image
+
+# Map of function names to actual functions
+FUNCTION_MAP = {
+    "get_plan_details": get_plan_details,
+    "get_insurer_details": get_insurer_details,
+    "get_recommended_plans_based_on_priority_factors": get_recommended_plans_based_on_priority_factors,
+    "list_insurers_and_metrics": list_insurers_and_metrics,
+    "basic_plan_and_premium_lookup": basic_plan_and_premium_lookup,
+    "get_premium_curve": get_premium_curve,
+    "search_plan_features": search_plan_features
+}
+
+def run_function(snapshot, function_name, function_args, charts: bool = True):
+    """
+    Run a tool against a snapshot, without the result cache.
+    Returns a tuple of (result, image) where image is the chart's PNG bytes or None
+    (always None with charts=False, which skips the chart instead of drawing it).
+    """
+    if not charts:
+        with charts_skipped():
+            return run_function(snapshot, function_name, function_args)
+
+    # Quote from the memory-mapped premium cube when it is current and covers the customer
+    function_result = None
+    if function_name == "basic_plan_and_premium_lookup":
+        function_result = cube_plan_and_premium_lookup(snapshot, **function_args)
+    elif function_name == "get_recommended_plans_based_on_priority_factors":
+        function_result = materialized_recommended_plans(snapshot, **function_args)
+
+    # Otherwise borrow a pooled read-only connection and execute
+    if function_result is None:
+        with snapshot.connection() as conn:
+            args = {**function_args, "conn": conn}
+            function_result = FUNCTION_MAP[function_name](**args)
 
+    # Handle the special case for basic_plan_and_premium_lookup which returns a tuple
+    if function_name in ("basic_plan_and_premium_lookup", "get_recommended_plans_based_on_priority_factors", "get_premium_curve"):
+        return function_result  # This function already returns (result, image)
+    # For all other functions, return the result with None for image
+    return function_result, None
 
+# How to draw the chart of each charting tool's result again, from its arguments
+CHART_FUNCTIONS = {
+    "basic_plan_and_premium_lookup": lambda result, args: visualise_basic_plan_and_premium_lookup(
+        result, args["age"], args["term"], args["coverage_amount"], args["income"]),
+    "get_recommended_plans_based_on_priority_factors": lambda result, args: visualise_get_recommended_plans_based_on_priority_factors(
+        result, args["age"], args["term"], args["coverage_amount"], args["income"]),
+    "get_premium_curve": lambda result, args: visualise_premium_curve(result) if args.get("include_chart") else None,
+}
 
+def cached_result_chart(function_name, function_args, result):
+    """
+    The chart of a result served from the result cache: from the chart cache when it
+    was rendered before, otherwise rendered again (so a chart that was unavailable
+    the first time is not unavailable for as long as the result stays cached).
+    """
+    visualise = CHART_FUNCTIONS.get(function_name)
+    if visualise is None or (isinstance(result, dict) and "error" in result):
+        return None
+    return visualise(result, function_args)
+
+def cache_result(snapshot, function_name, function_args, result):
+    # Only the data: the chart is fetched from chart_cache on a hit (see cached_result_chart)
+    result_cache.put(
+        result_cache.make_key(function_name, function_args),
+        copy.deepcopy(result),
+        snapshot.version,
+        call=(function_name, copy.deepcopy(function_args)),
+    )
+
+def warm_result_cache(snapshot, old_snapshot):
+    """
+    Snapshot warmer: recompute the hottest results of the previous snapshot on the
+    new one before it goes live, so a publish does not start from an empty cache.
+    """
+    if old_snapshot is None:
+        return
+    for function_name, function_args in result_cache.hot_calls(old_snapshot.version, WARM_RESULTS):
+        # Only the data is cached, so no chart is drawn (nor a render slot taken from live requests)
+        result, _ = run_function(snapshot, function_name, function_args, charts=False)
+        if isinstance(result, dict) and "error" in result:
+            continue
+        cache_result(snapshot, function_name, function_args, result)
+
+snapshot_manager.add_warmer(warm_result_cache)
 
 def execute_function(function_name, function_args):
     """
     Execute the specified function with the provided arguments.
-    Returns a tuple of (result, image_path) where image_path may be None.
+    Returns a tuple of (result, image) where image is the chart's PNG bytes or None
+    (or a PendingChart inside deferred_charts()); nothing is written to disk.
     """
-    conn = None
     try:
-        # Try to connect to database and execute real function
-        conn = sqlite3.connect('data/term_insurance.db')
-        
-        # Map of function names to actual functions
-        function_map = {
-            "get_plan_details": get_plan_details,
-            "get_insurer_details": get_insurer_details,
-            "get_recommended_plans_based_on_priority_factors": get_recommended_plans_based_on_priority_factors,
-            "list_insurers_and_metrics": list_insurers_and_metrics,
-            "basic_plan_and_premium_lookup": basic_plan_and_premium_lookup
-        }
-
-        if function_name not in function_map:
+        if function_name not in FUNCTION_MAP:
             return {"error": f"Function {function_name} not implemented"}, None
 
-        # Add conn to function arguments and execute
-        args = {**function_args, "conn": conn}
-        function_result = function_map[function_name](**args)
-        
-        # Handle the special case for basic_plan_and_premium_lookup which returns a tuple
-        if function_name == "basic_plan_and_premium_lookup" or function_name == "get_recommended_plans_based_on_priority_factors":
-            return function_result  # This function already returns (result, image_path)
-        else:
-            # For all other functions, return the result with None for image_path
-            return function_result, None
+        # The whole call runs on one snapshot, even if a new one is published meanwhile
+        # (and, with TIA_SQL_PROFILE, is timed against the tool's histograms)
+        with profiler.tool_call(function_name), snapshot_manager.snapshot() as snapshot:
+            # Serve repeated calls from the result cache while the snapshot is unchanged
+            cached = result_cache.get(result_cache.make_key(function_name, function_args), snapshot.version)
+            if cached is not None:
+                result = copy.deepcopy(cached)
+                return result, cached_result_chart(function_name, function_args, result)
+
+            result, image = run_function(snapshot, function_name, function_args)
+            cache_result(snapshot, function_name, function_args, result)
+            return result, image
 
     except sqlite3.Error as e:
         # Handle database errors
@@ -394,8 +757,3 @@ def execute_function(function_name, function_args):
         # Handle other errors
         print(f"Error executing function: {str(e)}")
         return {"error": "Error executing function"}, None
-        
-    finally:
-        # Always close connection if it exists
-        if conn:
-            conn.close()
\ No newline at end of file
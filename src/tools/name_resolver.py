@@ -0,0 +1,205 @@
+import math
+import re
+import sqlite3
+import threading
+from collections import defaultdict
+
+from src.tools.connection_pool import database_identity, in_memory_key
+
+# Names customers (and speech-to-text) commonly use instead of the catalogue names.
+# Acronyms of every name (e.g. "c2pl" for "Click 2 Protect Life") are added automatically.
+ALIASES = {
+    "ICICI Prudential": ["icici", "ipru", "icici pru"],
+    "Axis Max Life": ["max life", "max", "axis max"],
+    "HDFC Life": ["hdfc"],
+    "Bajaj Allianz Life": ["bajaj", "bajaj allianz"],
+    "Click 2 Protect Life": ["c2p", "click to protect", "click2protect"],
+    "iProtect Smart": ["i protect smart"],
+    "iProtect Super": ["i protect super"],
+}
+
+# Words most insurer and plan names contain. They say nothing about which one is
+# meant ("SBI Life" is not "HDFC Life"), so names are compared without them.
+STOPWORDS = {"life", "term", "plan", "insurance", "insurer"}
+
+# Below this confidence a lookup reports no match rather than guessing
+MIN_CONFIDENCE = 0.6
+
+# A best match within this much of the best match for another id is ambiguous: no match
+AMBIGUITY_MARGIN = 0.1
+
+# Shorter acronyms collide with ordinary words ("is" for "iProtect Smart")
+MIN_ACRONYM_LENGTH = 3
+
+def normalize_name(name: str) -> str:
+    """
+    Lower-case, '&' to 'and', punctuation to spaces, whitespace collapsed.
+    """
+    name = name.lower().replace("&", " and ")
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", name).split())
+
+def significant_words(text: str) -> str:
+    """
+    A normalized name without its STOPWORDS, or the name itself if it is nothing but stopwords.
+    """
+    return " ".join(word for word in text.split() if word not in STOPWORDS) or text
+
+def trigrams(text: str) -> set:
+    """
+    Word trigrams padded like pg_trgm: "life" -> {"  l", " li", "lif", "ife", "fe "}.
+    """
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def acronym(text: str) -> str:
+    words = text.split()
+    return "".join(word if word.isdigit() else word[0] for word in words) if len(words) > 1 else ""
+
+class NameResolver:
+    """
+    Fuzzy resolution of insurer or plan names to ids.
+
+    Every name and alias is indexed, without its STOPWORDS, by its trigrams. A query
+    only scores the entries sharing at least one trigram with it, so the cost grows
+    with the number of similar names, not with the catalogue size. Trigrams are
+    weighted by rarity (inverse document frequency over the ids), so the letters a
+    name shares with many others count for little. The score is the largest of
+    - the weighted Dice similarity of the two trigram sets,
+    - how much of the entry appears in the query (0.9 x its share of the entry's
+      trigram weight), so "my hdfc click 2 protect plan" still resolves to "Click 2 Protect Life",
+    - 0.95 when the query is the start of the entry ("smart secure" -> "Smart Secure Plus"),
+    with exact and whole-word matches scoring 1.0. A query that scores about as well
+    for two ids is ambiguous and matches neither. Acronyms are too short for
+    trigrams and only match exactly, and only when a single name has them.
+    """
+    def __init__(self, names):
+        """
+        names: iterable of (id, name, extra_aliases).
+        """
+        self.names = {}
+        self._entries = []  # (id, normalized text without stopwords, trigrams)
+        self._index = defaultdict(list)
+        acronyms = defaultdict(set)
+        for item_id, name, extra_aliases in names:
+            self.names[item_id] = name
+            acronyms[acronym(normalize_name(name))].add(item_id)
+            texts = {normalize_name(name)}
+            texts.update(normalize_name(alias) for alias in ALIASES.get(name, []) + list(extra_aliases))
+            for text in {significant_words(text) for text in texts if text}:
+                entry = len(self._entries)
+                grams = trigrams(text)
+                self._entries.append((item_id, text, grams))
+                for gram in grams:
+                    self._index[gram].append(entry)
+        self._acronyms = {text: next(iter(ids)) for text, ids in acronyms.items()
+                          if len(text) >= MIN_ACRONYM_LENGTH and len(ids) == 1}
+
+        # Inverse document frequency over ids; a trigram no name has weighs as much as the rarest
+        count = max(1, len(self.names))
+        self._weights = {
+            gram: math.log(1 + count / len({self._entries[entry][0] for entry in entries}))
+            for gram, entries in self._index.items()
+        }
+        self._unseen_weight = math.log(1 + count)
+        self._entry_weights = [self._weight(grams) for _, _, grams in self._entries]
+
+    def _weight(self, grams) -> float:
+        return sum(self._weights.get(gram, self._unseen_weight) for gram in grams)
+
+    def resolve(self, query: str):
+        """
+        Best match for query as (id, confidence in [0, 1]), or (None, confidence of
+        the best guess) when nothing matches well enough or unambiguously.
+        """
+        text = normalize_name(query)
+        if not text:
+            return None, 0.0
+        if text in self._acronyms:
+            return self._acronyms[text], 1.0
+        text = significant_words(text)
+        query_grams = trigrams(text)
+        query_weight = self._weight(query_grams)
+        query_words = f" {text} "
+
+        shared = defaultdict(float)
+        for gram in query_grams:
+            for entry in self._index.get(gram, ()):
+                shared[entry] += self._weights[gram]
+
+        # Best (score, entry length) per id
+        best_by_id = {}
+        for entry, overlap in shared.items():
+            item_id, entry_text, _ = self._entries[entry]
+            if entry_text == text or f" {entry_text} " in query_words:
+                score = 1.0
+            else:
+                entry_weight = self._entry_weights[entry]
+                score = max(2 * overlap / (query_weight + entry_weight), 0.9 * overlap / entry_weight)
+                if entry_text.startswith(text + " "):
+                    score = max(score, 0.95)
+            # Prefer the higher score, then the longer (more specific) entry
+            candidate = (score, len(entry_text))
+            if candidate > best_by_id.get(item_id, (0.0, 0)):
+                best_by_id[item_id] = candidate
+
+        ranked = sorted(((candidate, item_id) for item_id, candidate in best_by_id.items()), reverse=True)
+        if not ranked:
+            return None, 0.0
+        (score, length), item_id = ranked[0]
+        if score < MIN_CONFIDENCE:
+            return None, round(score, 3)
+        if len(ranked) > 1:
+            (runner_up, runner_up_length), _ = ranked[1]
+            if score == 1.0 and runner_up == 1.0:
+                # Two whole names in the query: the longer one is the more specific
+                ambiguous = runner_up_length == length
+            else:
+                ambiguous = runner_up >= score - AMBIGUITY_MARGIN
+            if ambiguous:
+                return None, round(score, 3)
+        return item_id, round(score, 3)
+
+
+_resolvers = {}
+_resolvers_lock = threading.Lock()
+
+def _load(conn: sqlite3.Connection):
+    insurers = conn.execute("SELECT insurer_id, name FROM insurers").fetchall()
+    insurer_names = {insurer_id: name for insurer_id, name in insurers}
+    plans = conn.execute("SELECT plan_id, plan_name, insurer_id FROM term_plans").fetchall()
+    insurer_resolver = NameResolver((insurer_id, name, []) for insurer_id, name in insurers)
+    # A plan can also be named together with its insurer, e.g. "HDFC Click 2 Protect"
+    plan_resolver = NameResolver(
+        (plan_id, plan_name, [f"{insurer_names.get(insurer_id, '')} {plan_name}"])
+        for plan_id, plan_name, insurer_id in plans
+    )
+    return insurer_resolver, plan_resolver
+
+def get_name_resolvers(conn: sqlite3.Connection):
+    """
+    (insurer resolver, plan resolver) for the database behind conn, built once per
+    file version or in-memory copy (see database_identity). Connections to any other
+    in-memory database get fresh resolvers.
+    """
+    key, version = database_identity(conn)
+    if key is None:
+        return _load(conn)
+
+    entry = _resolvers.get(key)
+    if entry is None or entry[0] != version:
+        resolvers = _load(conn)
+        with _resolvers_lock:
+            _resolvers[key] = (version, resolvers)
+        return resolvers
+    return entry[1]
+
+def forget_name_resolvers(db_file: str):
+    """
+    Drop the cached resolvers of a database file that is no longer served.
+    """
+    with _resolvers_lock:
+        _resolvers.pop(db_file, None)
+        _resolvers.pop(in_memory_key(db_file), None)
@@ -0,0 +1,266 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from src.tools.connection_pool import DB_PATH, database_version
+
+CUBE_FILES = {
+    "premiums": "premium_cube.npy",
+    "incomes": "premium_cube_income.npy",
+    "eligible": "premium_cube_mask.npy",
+}
+CUBE_METADATA = "premium_cube.json"
+
+WIDE_RATES_SQL = """
+SELECT plan_id, age_min, age_max, term_min, term_max, coverage_min, coverage_max,
+       required_min_income, annual_premium
+FROM premiums
+"""
+
+BAND_RATES_SQL = """
+SELECT r.plan_id, a.age_min, a.age_max, tb.term_min, tb.term_max, c.coverage_min, c.coverage_max,
+       c.required_min_income, r.annual_premium
+FROM premium_rates r
+JOIN age_bands a ON a.age_band = r.age_band
+JOIN term_bands tb ON tb.term_band = r.term_band
+JOIN coverage_bands c ON c.cov_band = r.cov_band
+"""
+
+PLANS_SQL = """
+SELECT t.plan_id, i.name AS insurer_name, t.plan_name, t.free_riders, t.paid_riders,
+       t.min_age, t.max_age, t.min_term, t.max_term, t.min_cover, t.max_cover
+FROM term_plans t
+JOIN insurers i ON t.insurer_id = i.insurer_id
+ORDER BY t.plan_id
+"""
+
+def _iter_rate_blocks(conn, block_size=500000):
+    has_band_schema = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'premium_rates'"
+    ).fetchone()
+    cursor = conn.execute(BAND_RATES_SQL if has_band_schema else WIDE_RATES_SQL)
+    while True:
+        rows = cursor.fetchmany(block_size)
+        if not rows:
+            break
+        yield np.array([tuple(row) for row in rows], dtype=np.int64)
+
+def _collect_edges(conn, plans):
+    """
+    Every distinct boundary per dimension (age, term, coverage), from the rates and the plan limits.
+    """
+    edges = [set(), set(), set()]
+    for block in _iter_rate_blocks(conn):
+        for dim in range(3):
+            edges[dim].update(np.unique(block[:, 1 + 2 * dim]).tolist())
+            edges[dim].update(np.unique(block[:, 2 + 2 * dim]).tolist())
+    for plan in plans:
+        edges[0].update((plan["min_age"], plan["max_age"]))
+        edges[1].update((plan["min_term"], plan["max_term"]))
+        edges[2].update((plan["min_cover"], plan["max_cover"]))
+    return [np.array(sorted(e), dtype=np.int64) for e in edges]
+
+def build_cube_arrays(conn):
+    """
+    Read the rates (wide or compact schema) into dense arrays.
+
+    Cells are the elementary intervals between every band and plan boundary found
+    in the database, so each premium row and each plan limit covers whole cells.
+    Returns (premiums, incomes, eligible, edges, plans).
+    """
+    plans = [
+        dict(zip(("plan_id", "insurer_name", "plan_name", "free_riders", "paid_riders",
+                  "min_age", "max_age", "min_term", "max_term", "min_cover", "max_cover"), tuple(row)))
+        for row in conn.execute(PLANS_SQL)
+    ]
+    edges = _collect_edges(conn, plans)
+    plan_index = {plan["plan_id"]: n for n, plan in enumerate(plans)}
+    shape = tuple(len(e) - 1 for e in edges) + (len(plans),)
+
+    premiums = np.zeros(shape, dtype=np.int32)
+    incomes = np.zeros(shape, dtype=np.int32)
+    eligible = np.zeros(shape, dtype=bool)
+
+    for block in _iter_rate_blocks(conn):
+        p = np.array([plan_index[plan_id] for plan_id in block[:, 0]])
+        lo = [np.searchsorted(edges[dim], block[:, 1 + 2 * dim]) for dim in range(3)]
+        hi = [np.searchsorted(edges[dim], block[:, 2 + 2 * dim]) for dim in range(3)]
+
+        # Most rows cover exactly one cell: scatter those in one vectorized assignment
+        single = (hi[0] - lo[0] == 1) & (hi[1] - lo[1] == 1) & (hi[2] - lo[2] == 1)
+        idx = (lo[0][single], lo[1][single], lo[2][single], p[single])
+        premiums[idx] = block[single, 8]
+        incomes[idx] = block[single, 7]
+        eligible[idx] = True
+
+        # Rows spanning several cells (or none, for empty clamped boxes) are filled one by one
+        for n in np.flatnonzero(~single):
+            cells = (slice(lo[0][n], hi[0][n]), slice(lo[1][n], hi[1][n]), slice(lo[2][n], hi[2][n]), p[n])
+            premiums[cells] = block[n, 8]
+            incomes[cells] = block[n, 7]
+            eligible[cells] = True
+
+    # Fold the plan limits into the mask, so a lookup needs no further checks than income
+    for n, plan in enumerate(plans):
+        for dim, (low, high) in enumerate([("min_age", "max_age"), ("min_term", "max_term"), ("min_cover", "max_cover")]):
+            cell_min = edges[dim][:-1]
+            index = [slice(None)] * 3 + [n]
+            index[dim] = (cell_min < plan[low]) | (cell_min >= plan[high])
+            eligible[tuple(index)] = False
+
+    return premiums, incomes, eligible, edges, plans
+
+def write_cube(data_dir, premiums, incomes, eligible, edges, plans, version):
+    """
+    Write the arrays and their JSON sidecar into data_dir.
+    """
+    for name, array in (("premiums", premiums), ("incomes", incomes), ("eligible", eligible)):
+        np.save(os.path.join(data_dir, CUBE_FILES[name]), array)
+
+    metadata = {
+        "source_version": [list(v) if v else None for v in version],
+        "shape": list(premiums.shape),
+        "age_edges": edges[0].tolist(),
+        "term_edges": edges[1].tolist(),
+        "coverage_edges": edges[2].tolist(),
+        "plans": [
+            {key: plan[key] for key in ("plan_id", "insurer_name", "plan_name", "free_riders", "paid_riders")}
+            for plan in plans
+        ],
+    }
+    # Write the sidecar last: readers treat it as the marker that the arrays are complete
+    meta_path = os.path.join(data_dir, CUBE_METADATA)
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(metadata, f)
+    os.replace(meta_path + ".tmp", meta_path)
+
+class PremiumCube:
+    """
+    Dense premium cube: premiums, required incomes and an eligibility mask laid out
+    as (age cell, term cell, coverage cell, plan), so one lookup reads the plans of
+    a single cell, which sit next to each other.
+
+    PremiumCube.load() opens the arrays written by data/build_premium_cube.py with
+    np.load(mmap_mode='r'), so every process that loads the cube shares the same
+    physical pages through the OS page cache. PremiumCube.from_connection() builds
+    the arrays in memory instead.
+    """
+    def __init__(self, premiums, incomes, eligible, edges, plans, source_version=None):
+        self.premiums = premiums
+        self.incomes = incomes
+        self.eligible = eligible
+        self.edges = [np.asarray(e, dtype=np.int64) for e in edges]
+        self.plans = plans
+        self.source_version = source_version
+
+    @classmethod
+    def load(cls, data_dir: str):
+        with open(os.path.join(data_dir, CUBE_METADATA), encoding="utf-8") as f:
+            metadata = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(data_dir, file_name), mmap_mode='r')
+            for name, file_name in CUBE_FILES.items()
+        }
+        edges = [metadata["age_edges"], metadata["term_edges"], metadata["coverage_edges"]]
+        return cls(arrays["premiums"], arrays["incomes"], arrays["eligible"], edges, metadata["plans"], metadata["source_version"])
+
+    @classmethod
+    def from_connection(cls, conn):
+        return cls(*build_cube_arrays(conn))
+
+    def matches(self, version) -> bool:
+        """
+        True if the cube was built from the database at the given database_version().
+        """
+        return [list(v) if v else None for v in version] == self.source_version
+
+    def cell(self, age: int, term: int, coverage_amount: int):
+        """
+        Index of the (age, term, coverage) cell containing the customer, or None if outside the cube.
+        """
+        index = []
+        for edges, value in zip(self.edges, (age, term, coverage_amount)):
+            i = int(np.searchsorted(edges, value, side='right')) - 1
+            if i < 0 or i >= len(edges) - 1:
+                return None
+            index.append(i)
+        return tuple(index)
+
+    def lookup(self, age: int, term: int, coverage_amount: int, income: int):
+        """
+        Same rows as basic_plan_and_premium_lookup, or None when the customer falls
+        outside the cube and the caller should fall back to SQL.
+        """
+        cell = self.cell(age, term, coverage_amount)
+        if cell is None:
+            return None
+        eligible = self.eligible[cell] & (self.incomes[cell] <= income)
+        premiums = self.premiums[cell]
+        results = []
+        for n in np.flatnonzero(eligible):
+            plan = self.plans[n]
+            results.append({
+                "insurer_name": plan["insurer_name"],
+                "plan_name": plan["plan_name"],
+                "annual_premium": int(premiums[n]),
+                "free_riders": plan["free_riders"],
+                "paid_riders": plan["paid_riders"],
+            })
+        return results
+
+    def batch_lookup(self, ages, terms, coverage_amounts, incomes):
+        """
+        Vectorized lookup for many profiles at once.
+        Returns (profile_positions, plan_indices, annual_premiums): one entry per
+        eligible (profile, plan) pair, with positions into the input arrays and
+        indices into self.plans. Profiles outside the cube get no entries.
+        """
+        cells = []
+        inside = np.ones(len(ages), dtype=bool)
+        for edges, values in zip(self.edges, (ages, terms, coverage_amounts)):
+            i = np.searchsorted(edges, np.asarray(values, dtype=np.int64), side='right') - 1
+            inside &= (i >= 0) & (i < len(edges) - 1)
+            cells.append(i)
+
+        positions = np.flatnonzero(inside)
+        cell = tuple(c[positions] for c in cells)
+        # (profiles inside, plans) slices of each array
+        eligible = self.eligible[cell] & (self.incomes[cell] <= np.asarray(incomes)[positions, None])
+        rows, plan_indices = np.nonzero(eligible)
+        return positions[rows], plan_indices, self.premiums[cell][rows, plan_indices]
+
+
+_cube = None
+_cube_mtime = None
+_cube_lock = threading.Lock()
+
+def get_premium_cube():
+    """
+    Return the cube built next to DB_PATH if it is current, otherwise None.
+
+    A cube built from an older version of the database is never used: lookups go
+    to SQL until data/build_premium_cube.py has been re-run.
+    """
+    global _cube, _cube_mtime
+    meta_path = os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), CUBE_METADATA)
+    try:
+        mtime = os.stat(meta_path).st_mtime_ns
+    except OSError:
+        return None
+
+    if mtime != _cube_mtime:
+        with _cube_lock:
+            if mtime != _cube_mtime:
+                try:
+                    _cube = PremiumCube.load(os.path.dirname(meta_path))
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Could not load premium cube: {str(e)}")
+                    _cube = None
+                _cube_mtime = mtime
+
+    cube = _cube
+    if cube is None or not cube.matches(database_version(DB_PATH)):
+        return None
+    return cube
@@ -0,0 +1,383 @@
+import bisect
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Opt-in: profile every SQL statement the tools run (see SQLProfiler)
+PROFILE_SQL = os.environ.get("TIA_SQL_PROFILE", "").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.environ.get("TIA_SLOW_QUERY_MS", "50"))
+SLOW_QUERY_LOG = os.environ.get("TIA_SLOW_QUERY_LOG", "logs/slow_queries.log")
+
+# Histogram bucket upper bounds in milliseconds; the last bucket is everything above
+HISTOGRAM_BOUNDS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+# Progress handler period, in SQLite VM instructions
+PROGRESS_PERIOD = 1000
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.total = 0.0
+
+    def add(self, value_ms: float):
+        self.counts[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, value_ms)] += 1
+        self.total += value_ms
+
+    def percentile(self, q: float):
+        """
+        Upper bound of the bucket holding the q-th quantile (None above the last bound).
+        """
+        n = sum(self.counts)
+        if not n:
+            return 0.0
+        seen = 0
+        for bound, count in zip(HISTOGRAM_BOUNDS_MS + [None], self.counts):
+            seen += count
+            if seen >= q * n:
+                return bound
+        return None
+
+    def summary(self) -> dict:
+        n = sum(self.counts)
+        return {
+            "count": n,
+            "mean_ms": self.total / n if n else 0.0,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "buckets": {
+                (f"<={bound}" if bound is not None else f">{HISTOGRAM_BOUNDS_MS[-1]}"): count
+                for bound, count in zip(HISTOGRAM_BOUNDS_MS + [None], self.counts) if count
+            },
+        }
+
+
+class StatementRecord:
+    __slots__ = ("sql", "params", "expanded_sql", "elapsed", "rows", "vm_steps", "finished")
+
+    def __init__(self, sql, params):
+        self.sql = sql
+        self.params = params
+        self.expanded_sql = None
+        self.elapsed = 0.0
+        self.rows = 0
+        self.vm_steps = 0
+        self.finished = False
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """
+    Cursor that times its statement across execute() and every fetch, and counts the
+    rows returned. The statement is finished (and reported) when the cursor is
+    exhausted, closed or re-executed, or when its connection goes back to the pool.
+    """
+    _record = None
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        connection = self.connection
+        record = self._record = StatementRecord(sql, parameters)
+        connection._pending.append(record)
+        steps = connection._vm_steps
+        start = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        finally:
+            record.elapsed += time.perf_counter() - start
+            record.vm_steps += connection._vm_steps - steps
+            record.expanded_sql = connection._last_sql
+        if self.description is None:
+            # No result set (PRAGMA assignments, DML): the statement is already done
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        record = self._record = StatementRecord(sql, None)
+        self.connection._pending.append(record)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record.elapsed += time.perf_counter() - start
+            record.rows = self.rowcount
+
+    def _timed(self, fetch, *args):
+        connection = self.connection
+        steps = connection._vm_steps
+        start = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            if self._record is not None:
+                self._record.elapsed += time.perf_counter() - start
+                self._record.vm_steps += connection._vm_steps - steps
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        elif self._record is not None:
+            self._record.rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, size if size is not None else self.arraysize)
+        if self._record is not None:
+            self._record.rows += len(rows)
+        if len(rows) < (size if size is not None else self.arraysize):
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self._record is not None:
+            self._record.rows += len(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        if self._record is not None:
+            self._record.rows += 1
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def _finish(self):
+        record, self._record = self._record, None
+        if record is not None:
+            self.connection._finish(record)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """
+    Connection whose statements all go through ProfiledCursor. The trace callback
+    captures each statement's SQL with its bound values, and the progress handler
+    counts SQLite VM instructions, a measure of the work behind the wall time.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pending = []
+        self._vm_steps = 0
+        self._last_sql = None
+        self._explaining = False
+        self.set_trace_callback(self._trace)
+        self.set_progress_handler(self._progress, PROGRESS_PERIOD)
+
+    def _trace(self, sql):
+        self._last_sql = sql
+
+    def _progress(self):
+        self._vm_steps += PROGRESS_PERIOD
+        return 0
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def _finish(self, record):
+        if record.finished:
+            return
+        record.finished = True
+        if record in self._pending:
+            self._pending.remove(record)
+        plan = None
+        if (record.elapsed * 1000 >= profiler.slow_query_ms and record.params is not None and not self._explaining
+                and record.sql.lstrip()[:6].upper() in ("SELECT", "WITH")):
+            plan = self._explain(record)
+        profiler.record_statement(record, plan)
+
+    def _explain(self, record):
+        self._explaining = True
+        try:
+            rows = sqlite3.Connection.execute(self, "EXPLAIN QUERY PLAN " + record.sql, record.params).fetchall()
+            return [row[-1] for row in rows]
+        except sqlite3.Error as e:
+            return [f"EXPLAIN QUERY PLAN failed: {str(e)}"]
+        finally:
+            self._explaining = False
+
+    def finish_statements(self):
+        """
+        Report the statements whose cursors were never exhausted (e.g. a single fetchone()).
+        """
+        for record in list(self._pending):
+            self._finish(record)
+
+
+class ToolStats:
+    def __init__(self):
+        self.calls = 0
+        self.total = Histogram()
+        self.sql = Histogram()
+        self.render = Histogram()
+        self.statements = 0
+        self.rows = 0
+        self.slow_statements = 0
+
+    def summary(self) -> dict:
+        return {
+            "calls": self.calls,
+            "statements": self.statements,
+            "rows": self.rows,
+            "slow_statements": self.slow_statements,
+            "total": self.total.summary(),
+            "sql": self.sql.summary(),
+            "render": self.render.summary(),
+        }
+
+
+class SQLProfiler:
+    """
+    Per-tool SQL profiling for execute_function.
+
+    When enabled, pooled connections are opened as ProfiledConnection, so every
+    statement records its wall time, rows returned and VM instructions. Statements
+    at or above slow_query_ms are written, with their EXPLAIN QUERY PLAN, to a
+    rotating JSON-lines log. Each tool call aggregates its statements into per-tool
+    histograms of total, SQL and chart rendering time (report()).
+
+    When disabled, connections are plain sqlite3 connections and the hooks in the
+    tool layer reduce to a single flag check.
+    """
+    def __init__(self, enabled: bool = False, slow_query_ms: float = SLOW_QUERY_MS, log_path: str = SLOW_QUERY_LOG):
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self.log_path = log_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._tools = {}
+        self._logger = None
+
+    def enable(self, slow_query_ms: float = None, log_path: str = None):
+        """
+        Turn profiling on. Only connections opened afterwards are profiled.
+        """
+        if slow_query_ms is not None:
+            self.slow_query_ms = slow_query_ms
+        if log_path is not None and log_path != self.log_path:
+            self.log_path = log_path
+            self._logger = None
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def connection_factory(self):
+        """
+        The factory for sqlite3.connect(): ProfiledConnection while enabled.
+        """
+        return ProfiledConnection if self.enabled else sqlite3.Connection
+
+    def _slow_log(self):
+        if self._logger is None:
+            logger = logging.getLogger("tia.slow_queries")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            for handler in list(logger.handlers):
+                logger.removeHandler(handler)
+            directory = os.path.dirname(self.log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(self.log_path, maxBytes=5 * 1024 * 1024, backupCount=5, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            self._logger = logger
+        return self._logger
+
+    @contextmanager
+    def tool_call(self, tool: str):
+        """
+        Attribute the statements and chart rendering inside the block to tool. Yields
+        the call's running totals (seconds of SQL and rendering, statements, rows), or
+        None while profiling is disabled.
+        """
+        if not self.enabled:
+            yield None
+            return
+        call = self._local.call = {"tool": tool, "sql": 0.0, "render": 0.0, "statements": 0, "rows": 0, "slow": 0}
+        start = time.perf_counter()
+        try:
+            yield call
+        finally:
+            total = time.perf_counter() - start
+            self._local.call = None
+            with self._lock:
+                stats = self._tools.setdefault(tool, ToolStats())
+                stats.calls += 1
+                stats.total.add(total * 1000)
+                stats.sql.add(call["sql"] * 1000)
+                stats.render.add(call["render"] * 1000)
+                stats.statements += call["statements"]
+                stats.rows += call["rows"]
+                stats.slow_statements += call["slow"]
+
+    def timed_render(self, func):
+        """
+        Decorator for chart functions: their time counts as rendering for the current tool call.
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            call = getattr(self._local, "call", None) if self.enabled else None
+            if call is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                call["render"] += time.perf_counter() - start
+        return wrapper
+
+    def record_statement(self, record: StatementRecord, plan=None):
+        call = getattr(self._local, "call", None)
+        if call is not None:
+            call["sql"] += record.elapsed
+            call["statements"] += 1
+            call["rows"] += record.rows
+        elapsed_ms = record.elapsed * 1000
+        if elapsed_ms < self.slow_query_ms:
+            return
+        if call is not None:
+            call["slow"] += 1
+        self._slow_log().info(json.dumps({
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "tool": call["tool"] if call is not None else None,
+            "ms": round(elapsed_ms, 3),
+            "rows": record.rows,
+            "vm_steps": record.vm_steps,
+            "sql": " ".join((record.expanded_sql or record.sql).split()),
+            "query_plan": plan,
+        }, default=str))
+
+    def report(self) -> dict:
+        """
+        Per-tool summaries: calls, statements, rows, slow statements, and histograms of
+        total, SQL and rendering time in milliseconds.
+        """
+        with self._lock:
+            return {tool: stats.summary() for tool, stats in sorted(self._tools.items())}
+
+    def reset(self):
+        with self._lock:
+            self._tools.clear()
+
+
+profiler = SQLProfiler(enabled=PROFILE_SQL)
@@ -0,0 +1,162 @@
+import heapq
+import sqlite3
+import threading
+
+from src.tools.connection_pool import database_identity, in_memory_key
+
+PRIORITY_FACTORS = ("premium", "csr", "asr", "complaints")
+RANKING_MODES = ("lexicographic", "weighted")
+
+PLAN_SCORES_SQL = """
+SELECT
+    t.plan_id,
+    i.name AS insurer_name,
+    t.plan_name,
+    i.claim_settlement_ratio,
+    i.amount_settlement_ratio,
+    i.complaints_volume,
+    t.free_riders,
+    t.paid_riders
+FROM term_plans t
+JOIN insurers i ON t.insurer_id = i.insurer_id
+"""
+
+def normalize_priority_factors(priority_factors):
+    """
+    Known factors in the given order, without repeats; ["premium"] if none are given.
+    """
+    return [factor for factor in dict.fromkeys(priority_factors) if factor in PRIORITY_FACTORS] or ["premium"]
+
+def _normalizer(values, higher_is_better):
+    """
+    Map a metric to a cost in [0, 1], 0 being the best value in the catalogue.
+    """
+    low, high = min(values), max(values)
+    spread = high - low
+    if not spread:
+        return lambda value: 0.0
+    if higher_is_better:
+        return lambda value: (high - value) / spread
+    return lambda value: (value - low) / spread
+
+class RecommendationRanker:
+    """
+    Ranks eligible (plan, premium) rows by the customer's priority factors.
+
+    The insurer metrics do not change between requests, so each plan's details and its
+    normalized CSR, ASR and complaints costs (0 = best in the catalogue, 1 = worst)
+    are computed once per database version. Only the premium cost depends on the
+    request: it is normalized across the eligible rows.
+
+    Modes:
+    - lexicographic: order by the first factor, then the next, ... (the original behaviour)
+    - weighted: order by a weighted sum of the normalized costs, the first factor
+      weighing most (weights n, n-1, ..., 1 for n factors)
+
+    Ties are broken by premium and then plan_id, so results are deterministic.
+    """
+    def __init__(self, conn: sqlite3.Connection):
+        cursor = conn.execute(PLAN_SCORES_SQL)
+        columns = [description[0] for description in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        self.plans = {row["plan_id"]: row for row in rows}
+
+        csr = _normalizer([row["claim_settlement_ratio"] for row in rows] or [0], higher_is_better=True)
+        asr = _normalizer([row["amount_settlement_ratio"] for row in rows] or [0], higher_is_better=True)
+        complaints = _normalizer([row["complaints_volume"] for row in rows] or [0], higher_is_better=False)
+        self.metric_costs = {
+            plan_id: {
+                "csr": csr(row["claim_settlement_ratio"]),
+                "asr": asr(row["amount_settlement_ratio"]),
+                "complaints": complaints(row["complaints_volume"]),
+            }
+            for plan_id, row in self.plans.items()
+        }
+
+    def rank(self, candidates, priority_factors, k: int = 2, mode: str = "lexicographic"):
+        """
+        Pick the k best of candidates, a list of (plan_id, annual_premium) pairs.
+        Returns them best first.
+        """
+        if mode not in RANKING_MODES:
+            raise ValueError(f"Unknown ranking mode '{mode}', expected one of {', '.join(RANKING_MODES)}")
+        factors = normalize_priority_factors(priority_factors)
+        if not candidates or k <= 0:
+            return []
+
+        premium_cost = _normalizer([premium for _, premium in candidates], higher_is_better=False)
+
+        def costs(plan_id, premium):
+            plan_costs = self.metric_costs[plan_id]
+            return [premium_cost(premium) if factor == "premium" else plan_costs[factor] for factor in factors]
+
+        if mode == "lexicographic":
+            def key(candidate):
+                plan_id, premium = candidate
+                return (*costs(plan_id, premium), premium, plan_id)
+        else:
+            weights = [len(factors) - n for n in range(len(factors))]
+            total = sum(weights)
+            def key(candidate):
+                plan_id, premium = candidate
+                score = sum(w * c for w, c in zip(weights, costs(plan_id, premium))) / total
+                return (score, premium, plan_id)
+
+        # Partial selection: O(n log k) over the eligible rows only
+        return heapq.nsmallest(k, candidates, key=key)
+
+    def top_k(self, candidates, priority_factors, k: int = 2, mode: str = "lexicographic"):
+        """
+        Like rank(), but returns plan detail dicts with annual_premium and rank added.
+        """
+        return self.describe(self.rank(candidates, priority_factors, k=k, mode=mode))
+
+    def describe(self, ranked):
+        """
+        Turn ranked (plan_id, annual_premium) pairs into the tool's result dicts.
+        """
+        results = []
+        for rank, (plan_id, premium) in enumerate(ranked, start=1):
+            plan = self.plans[plan_id]
+            results.append({
+                "insurer_name": plan["insurer_name"],
+                "plan_name": plan["plan_name"],
+                "annual_premium": premium,
+                "claim_settlement_ratio": plan["claim_settlement_ratio"],
+                "amount_settlement_ratio": plan["amount_settlement_ratio"],
+                "complaints_volume": plan["complaints_volume"],
+                "free_riders": plan["free_riders"],
+                "paid_riders": plan["paid_riders"],
+                "rank": rank,
+            })
+        return results
+
+
+_rankers = {}
+_rankers_lock = threading.Lock()
+
+def get_ranker(conn: sqlite3.Connection) -> RecommendationRanker:
+    """
+    Return the ranker for the database behind conn, rebuilding it when the data changes:
+    once per file version, or per in-memory copy (see database_identity). Connections
+    to any other in-memory database get a fresh ranker.
+    """
+    key, version = database_identity(conn)
+    if key is None:
+        return RecommendationRanker(conn)
+
+    entry = _rankers.get(key)
+    if entry is None or entry[0] != version:
+        ranker = RecommendationRanker(conn)
+        with _rankers_lock:
+            _rankers[key] = (version, ranker)
+        return ranker
+    return entry[1]
+
+def forget_ranker(db_file: str):
+    """
+    Drop the cached ranker of a database file that is no longer served.
+    """
+    with _rankers_lock:
+        _rankers.pop(db_file, None)
+        _rankers.pop(in_memory_key(db_file), None)
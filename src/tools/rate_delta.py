@@ -0,0 +1,272 @@
+import csv
+import sqlite3
+
+import numpy as np
+
+# A premium row is identified by its plan and its (age x term x coverage) box
+BOX_COLUMNS = ["age_min", "age_max", "term_min", "term_max", "coverage_min", "coverage_max"]
+DELTA_COLUMNS = ["plan_id"] + BOX_COLUMNS + ["required_min_income", "annual_premium"]
+
+# Bands in the compact schema, with the plan limits their rows are clamped to
+BAND_DIMENSIONS = [
+    ("age_bands", "age_band", "age_min", "age_max", "min_age", "max_age"),
+    ("term_bands", "term_band", "term_min", "term_max", "min_term", "max_term"),
+    ("coverage_bands", "cov_band", "coverage_min", "coverage_max", "min_cover", "max_cover"),
+]
+
+WIDE_PLAN_RATES_SQL = """
+SELECT premium_id, age_min, age_max, term_min, term_max, coverage_min, coverage_max,
+       required_min_income, annual_premium
+FROM premiums
+WHERE plan_id = ?
+"""
+
+BAND_PLAN_RATES_SQL = """
+SELECT r.age_band, r.term_band, r.cov_band, r.annual_premium
+FROM premium_rates r
+WHERE r.plan_id = ?
+"""
+
+def read_delta(path: str):
+    """
+    Read a rate revision in the premiums.csv layout (premium_id may be left out).
+    Returns {plan_id: {box: (required_min_income, annual_premium)}}. An empty
+    annual_premium deletes the rate for that box.
+    """
+    delta = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        missing = [column for column in DELTA_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"{path} is missing the columns: {', '.join(missing)}")
+        for line, row in enumerate(reader, start=2):
+            try:
+                plan_id = int(row["plan_id"])
+                box = tuple(int(row[column]) for column in BOX_COLUMNS)
+                premium = int(row["annual_premium"]) if row["annual_premium"].strip() else None
+                income = int(row["required_min_income"]) if row["required_min_income"].strip() else None
+            except ValueError:
+                raise ValueError(f"{path}, line {line}: expected integers")
+            plan = delta.setdefault(plan_id, {})
+            if box in plan:
+                raise ValueError(f"{path}, line {line}: plan {plan_id} has this band more than once")
+            plan[box] = (income, premium)
+    return delta
+
+def find_overlaps(boxes, limit: int = 3):
+    """
+    Pairs of boxes (half-open on every axis) that overlap, at most limit of them.
+
+    The boxes are rasterized onto the elementary cells between their own edges: a
+    cell covered twice is an overlap. Empty boxes (min == max on an axis) cover nothing.
+    """
+    if len(boxes) < 2:
+        return []
+    array = np.asarray(boxes, dtype=np.int64)
+    edges = [np.unique(array[:, 2 * dim:2 * dim + 2]) for dim in range(3)]
+    lo = [np.searchsorted(edges[dim], array[:, 2 * dim]) for dim in range(3)]
+    hi = [np.searchsorted(edges[dim], array[:, 2 * dim + 1]) for dim in range(3)]
+
+    counts = np.zeros(tuple(len(e) - 1 for e in edges), dtype=np.int32)
+    # Most boxes cover exactly one cell: count those in one vectorized call
+    single = (hi[0] - lo[0] == 1) & (hi[1] - lo[1] == 1) & (hi[2] - lo[2] == 1)
+    np.add.at(counts, (lo[0][single], lo[1][single], lo[2][single]), 1)
+    for n in np.flatnonzero(~single):
+        counts[lo[0][n]:hi[0][n], lo[1][n]:hi[1][n], lo[2][n]:hi[2][n]] += 1
+    if counts.max(initial=0) < 2:
+        return []
+
+    overlaps = []
+    for cell in np.argwhere(counts > 1)[:limit]:
+        covering = [
+            boxes[n] for n in range(len(array))
+            if all(lo[dim][n] <= cell[dim] < hi[dim][n] for dim in range(3))
+        ]
+        overlaps.append((covering[0], covering[1]))
+    return overlaps
+
+def uses_band_schema(conn: sqlite3.Connection) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'premium_rates'"
+    ).fetchone() is not None
+
+def _plan_limits(conn, plan_id):
+    row = conn.execute(
+        "SELECT min_age, max_age, min_term, max_term, min_cover, max_cover FROM term_plans WHERE plan_id = ?",
+        (plan_id,)
+    ).fetchone()
+    if row is None:
+        raise ValueError(f"Plan {plan_id} does not exist")
+    return dict(zip(("min_age", "max_age", "min_term", "max_term", "min_cover", "max_cover"), row))
+
+def _band_boxes(conn, limits):
+    """
+    Per dimension, {band id: (min, max) clamped to the plan limits} for the bands the
+    plan accepts, and the reverse map. Clamping is one-to-one over contiguous bands.
+    """
+    dims = []
+    for table, band, low, high, plan_low, plan_high in BAND_DIMENSIONS:
+        clamped = {
+            band_id: (max(band_min, limits[plan_low]), min(band_max, limits[plan_high]))
+            for band_id, band_min, band_max in conn.execute(f"SELECT {band}, {low}, {high} FROM {table}")
+            if not (band_min > limits[plan_high] or band_max < limits[plan_low])
+        }
+        dims.append((clamped, {box: band_id for band_id, box in clamped.items()}))
+    return dims
+
+def _band_incomes(conn):
+    return dict(conn.execute("SELECT cov_band, required_min_income FROM coverage_bands"))
+
+def _current_rates(conn, plan_id, compact, bands=None, incomes=None):
+    """
+    {box: (key, required_min_income, annual_premium)} for one plan, where key is the
+    premium_id (wide schema) or the (age_band, term_band, cov_band) ids (compact schema).
+    """
+    if not compact:
+        return {
+            tuple(row[1:7]): (row[0], row[7], row[8])
+            for row in conn.execute(WIDE_PLAN_RATES_SQL, (plan_id,))
+        }
+    rates = {}
+    for age_band, term_band, cov_band, premium in conn.execute(BAND_PLAN_RATES_SQL, (plan_id,)):
+        box = bands[0][0][age_band] + bands[1][0][term_band] + bands[2][0][cov_band]
+        rates[box] = ((age_band, term_band, cov_band), incomes[cov_band], premium)
+    return rates
+
+def plan_delta(conn: sqlite3.Connection, delta, replace: bool = False):
+    """
+    Work out the writes a delta needs, without writing anything.
+
+    With replace=False the delta is a partial revision: its rows are upserted and
+    rows with an empty annual_premium deleted. With replace=True each plan in the
+    delta gets exactly the delta's rows, and its other rows are deleted.
+
+    Raises ValueError when the revised rate sheet of a plan is invalid: an unknown
+    plan, an inverted or (compact schema) unknown band, a non-positive premium, or
+    overlapping bands. Returns {plan_id: {"insert": [...], "update": [...], "delete": [...]}},
+    each entry a (key, box, required_min_income, annual_premium) tuple.
+    """
+    compact = uses_band_schema(conn)
+    incomes = _band_incomes(conn) if compact else None
+    changes = {}
+    for plan_id, rows in sorted(delta.items()):
+        limits = _plan_limits(conn, plan_id)
+        bands = _band_boxes(conn, limits) if compact else None
+        current = _current_rates(conn, plan_id, compact, bands, incomes)
+
+        revised = {} if replace else {box: (income, premium) for box, (_, income, premium) in current.items()}
+        for box, (income, premium) in rows.items():
+            if premium is None:
+                # Deleting a band that is already gone is a no-op, so a delta can be re-applied
+                revised.pop(box, None)
+                continue
+            if any(box[2 * dim] > box[2 * dim + 1] for dim in range(3)):
+                raise ValueError(f"Plan {plan_id}: band {box} has a minimum above its maximum")
+            if premium <= 0:
+                raise ValueError(f"Plan {plan_id}: annual_premium must be positive for band {box}")
+            if compact:
+                key = tuple(bands[dim][1].get(box[2 * dim:2 * dim + 2]) for dim in range(3))
+                if None in key:
+                    raise ValueError(f"Plan {plan_id}: band {box} is not one of the database's age, term and coverage bands")
+                # The compact schema keeps required_min_income per coverage band
+                if income is not None and income != incomes[key[2]]:
+                    raise ValueError(f"Plan {plan_id}: required_min_income for band {box} must be {incomes[key[2]]} (set per coverage band)")
+                income = incomes[key[2]]
+            elif income is None or income < 0:
+                raise ValueError(f"Plan {plan_id}: band {box} needs a required_min_income")
+            revised[box] = (income, premium)
+
+        overlaps = find_overlaps(list(revised))
+        if overlaps:
+            pairs = "; ".join(f"{a} and {b}" for a, b in overlaps)
+            raise ValueError(f"Plan {plan_id}: overlapping bands {pairs}")
+
+        def key_of(box):
+            if not compact:
+                return current[box][0] if box in current else None
+            return tuple(bands[dim][1][box[2 * dim:2 * dim + 2]] for dim in range(3))
+
+        plan_changes = {
+            "insert": [(key_of(box), box, *revised[box]) for box in revised if box not in current],
+            "update": [(key_of(box), box, *revised[box]) for box in revised
+                       if box in current and current[box][1:] != revised[box]],
+            "delete": [(current[box][0], box, *current[box][1:]) for box in current if box not in revised],
+        }
+        if any(plan_changes.values()):
+            changes[plan_id] = plan_changes
+    return changes
+
+def _apply_wide(conn, changes):
+    has_rtree = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'premiums_rtree'"
+    ).fetchone() is not None
+    deletes = [(key,) for plan in changes.values() for key, *_ in plan["delete"]]
+    updates = [(income, premium, key) for plan in changes.values() for key, _, income, premium in plan["update"]]
+    next_id = conn.execute("SELECT COALESCE(MAX(premium_id), 0) + 1 FROM premiums").fetchone()[0]
+    inserts = []
+    for plan_id, plan in changes.items():
+        for _, box, income, premium in plan["insert"]:
+            inserts.append((next_id, plan_id, *box, income, premium))
+            next_id += 1
+
+    conn.executemany("DELETE FROM premiums WHERE premium_id = ?", deletes)
+    conn.executemany("UPDATE premiums SET required_min_income = ?, annual_premium = ? WHERE premium_id = ?", updates)
+    conn.executemany("""
+        INSERT INTO premiums (
+            premium_id, plan_id, age_min, age_max, term_min, term_max, coverage_min, coverage_max, required_min_income, annual_premium
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, inserts)
+    if has_rtree:
+        conn.executemany("DELETE FROM premiums_rtree WHERE premium_id = ?", deletes)
+        conn.executemany("""
+            INSERT INTO premiums_rtree (premium_id, age_min, age_max, term_min, term_max, coverage_min, coverage_max)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [(row[0], *row[2:8]) for row in inserts])
+
+def _apply_compact(conn, changes):
+    conn.executemany(
+        "DELETE FROM premium_rates WHERE plan_id = ? AND age_band = ? AND term_band = ? AND cov_band = ?",
+        [(plan_id, *key) for plan_id, plan in changes.items() for key, *_ in plan["delete"]]
+    )
+    conn.executemany(
+        "INSERT OR REPLACE INTO premium_rates (plan_id, age_band, term_band, cov_band, annual_premium) VALUES (?, ?, ?, ?, ?)",
+        [(plan_id, *key, premium) for plan_id, plan in changes.items()
+         for key, _, _, premium in plan["insert"] + plan["update"]]
+    )
+
+def ingest_rate_delta(db_path: str, delta_path: str, replace: bool = False, dry_run: bool = False, timeout: float = 30.0):
+    """
+    Apply a rate revision to the plans it names, in one transaction.
+
+    The delta is read, diffed against the database and validated before any lock is
+    taken; the write transaction then only runs the resulting deletes, updates and
+    inserts, and bumps PRAGMA user_version. Readers keep reading during it and only
+    wait for the commit itself. If another ingest committed in between (user_version
+    moved), nothing is written and a RuntimeError asks for a re-run.
+
+    Returns (changes, user_version after the ingest).
+    """
+    delta = read_delta(delta_path)
+    conn = sqlite3.connect(db_path, timeout=timeout, isolation_level=None)
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        changes = plan_delta(conn, delta, replace=replace)
+        if dry_run or not changes:
+            return changes, version
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] != version:
+                raise RuntimeError("The database changed while the delta was being prepared, re-run the ingest")
+            if uses_band_schema(conn):
+                _apply_compact(conn, changes)
+            else:
+                _apply_wide(conn, changes)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return changes, version + 1
+    finally:
+        conn.close()
@@ -0,0 +1,237 @@
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.tools.connection_pool import DB_PATH, abandon_connection, database_version
+from src.tools.premium_cube import PremiumCube
+from src.tools.ranking import PRIORITY_FACTORS, RecommendationRanker, normalize_priority_factors
+
+RECOMMENDATIONS_FILE = "recommendations.db"
+
+# Every ordered choice of 1 to 4 distinct factors: 4 + 12 + 24 + 24 = 64 orderings
+PRIORITY_ORDERINGS = [
+    ordering
+    for length in range(1, len(PRIORITY_FACTORS) + 1)
+    for ordering in itertools.permutations(PRIORITY_FACTORS, length)
+]
+ORDERING_INDEX = {ordering: n for n, ordering in enumerate(PRIORITY_ORDERINGS)}
+
+# Padding for cells with fewer than top_n eligible plans
+NO_PLAN = 0xFFFF
+
+def create_recommendation_tables(conn: sqlite3.Connection):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS recommendations (
+        age_cell INTEGER NOT NULL,
+        term_cell INTEGER NOT NULL,
+        cov_cell INTEGER NOT NULL,
+        min_income INTEGER NOT NULL,
+        ranked_plans BLOB NOT NULL,
+        PRIMARY KEY (age_cell, term_cell, cov_cell, min_income)
+    ) WITHOUT ROWID;
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS recommendations_meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    );
+    """)
+
+def _cell_rows(cube: PremiumCube, ranker: RecommendationRanker, cell, top_n: int):
+    """
+    The recommendation rows for one (age, term, coverage) cell: one per distinct income
+    threshold among its eligible plans. Each row packs the ranked top_n plan indexes
+    (into cube.plans) for every priority ordering as uint16, ordering after ordering.
+    """
+    eligible = np.flatnonzero(cube.eligible[cell])
+    if not len(eligible):
+        return []
+    incomes = cube.incomes[cell]
+    premiums = cube.premiums[cell]
+    plan_index = {cube.plans[n]["plan_id"]: n for n in eligible}
+
+    rows = []
+    for min_income in sorted({int(incomes[n]) for n in eligible}):
+        candidates = [(cube.plans[n]["plan_id"], int(premiums[n])) for n in eligible if incomes[n] <= min_income]
+        packed = np.full((len(PRIORITY_ORDERINGS), top_n), NO_PLAN, dtype=np.uint16)
+        for o, ordering in enumerate(PRIORITY_ORDERINGS):
+            for r, (plan_id, _) in enumerate(ranker.rank(candidates, ordering, k=top_n)):
+                packed[o, r] = plan_index[plan_id]
+        rows.append((*cell, min_income, packed.tobytes()))
+    return rows
+
+def _build_cells(args):
+    """
+    Process-pool worker: compute the rows for a batch of cells.
+    """
+    db_path, cells, top_n = args
+    cube = PremiumCube.load(os.path.dirname(os.path.abspath(db_path)))
+    conn = sqlite3.connect(db_path)
+    ranker = RecommendationRanker(conn)
+    conn.close()
+
+    rows = []
+    for cell in cells:
+        rows.extend(_cell_rows(cube, ranker, tuple(int(i) for i in cell), top_n))
+    return rows
+
+def build_recommendation_table(db_path: str = DB_PATH, top_n: int = 3, workers: int = None, changed_plan_ids=None):
+    """
+    Materialize the lexicographic top_n plans for every (cell, income threshold, priority
+    ordering) into data/recommendations.db, next to the database. Requires a current
+    premium cube (data/build_premium_cube.py), whose cells it uses.
+
+    With changed_plan_ids, only the cells where one of those plans is eligible now, or
+    was recommended before, are recomputed; the rest of the table is kept. This falls
+    back to a full build when the existing table was built on different cells or top_n.
+    Returns the number of cells recomputed.
+    """
+    data_dir = os.path.dirname(os.path.abspath(db_path))
+    cube = PremiumCube.load(data_dir)
+    version = database_version(db_path)
+    if not cube.matches(version):
+        raise RuntimeError("The premium cube is older than the database, re-run data/build_premium_cube.py first")
+
+    edges = [e.tolist() for e in cube.edges]
+    out = sqlite3.connect(os.path.join(data_dir, RECOMMENDATIONS_FILE))
+    create_recommendation_tables(out)
+    meta = dict(out.execute("SELECT key, value FROM recommendations_meta").fetchall())
+
+    incremental = (
+        changed_plan_ids is not None
+        and meta.get("edges") == json.dumps(edges)
+        and meta.get("top_n") == str(top_n)
+        and meta.get("plans") == json.dumps([plan["plan_id"] for plan in cube.plans])
+    )
+    if incremental:
+        changed = [n for n, plan in enumerate(cube.plans) if plan["plan_id"] in set(changed_plan_ids)]
+        # Cells where a changed plan is eligible now...
+        dirty = np.any(cube.eligible[..., changed], axis=-1) if changed else np.zeros(cube.eligible.shape[:3], dtype=bool)
+        # ...or where it was recommended before
+        for age_cell, term_cell, cov_cell, blob in out.execute("SELECT age_cell, term_cell, cov_cell, ranked_plans FROM recommendations"):
+            if np.isin(np.frombuffer(blob, dtype=np.uint16), changed).any():
+                dirty[age_cell, term_cell, cov_cell] = True
+        cells = np.argwhere(dirty)
+    else:
+        cells = np.argwhere(np.any(cube.eligible, axis=-1))
+
+    workers = workers or os.cpu_count() or 1
+    batches = [(db_path, batch, top_n) for batch in np.array_split(cells, max(1, min(len(cells), workers * 8)))]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_build_cells, batches))
+
+    # Swap the rows in one transaction: readers see the old or the new table, never a mix
+    with out:
+        if incremental:
+            out.executemany(
+                "DELETE FROM recommendations WHERE age_cell = ? AND term_cell = ? AND cov_cell = ?",
+                [tuple(int(i) for i in cell) for cell in cells]
+            )
+        else:
+            out.execute("DELETE FROM recommendations")
+        for rows in results:
+            out.executemany("INSERT INTO recommendations VALUES (?, ?, ?, ?, ?)", rows)
+        out.executemany("INSERT OR REPLACE INTO recommendations_meta (key, value) VALUES (?, ?)", [
+            ("source_version", json.dumps([list(v) if v else None for v in version])),
+            ("edges", json.dumps(edges)),
+            ("top_n", str(top_n)),
+            ("plans", json.dumps([plan["plan_id"] for plan in cube.plans])),
+        ])
+    out.close()
+    return len(cells)
+
+
+class RecommendationTable:
+    """
+    Read side of data/recommendations.db: one keyed read per recommendation.
+    """
+    def __init__(self, path: str):
+        self.uri = "file:" + os.path.abspath(path) + "?mode=ro"
+        self.conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        meta = dict(self.conn.execute("SELECT key, value FROM recommendations_meta").fetchall())
+        self.source_version = json.loads(meta["source_version"])
+        self.top_n = int(meta["top_n"])
+        self.plan_ids = json.loads(meta["plans"])
+        self._lock = threading.Lock()
+        _tables.add(self)
+
+    def _reopen_after_fork(self):
+        # The parent's connection must not be used (or closed) in a forked child
+        abandon_connection(self.conn)
+        self.conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def matches(self, version) -> bool:
+        return [list(v) if v else None for v in version] == self.source_version
+
+    def lookup(self, cube: PremiumCube, age: int, term: int, coverage_amount: int, income: int, priority_factors, k: int):
+        """
+        Ranked (plan_id, annual_premium) pairs, or None if k exceeds what was materialized.
+        Like the live ranker, k <= 0 gives no plans.
+        """
+        if k > self.top_n:
+            return None
+        ordering = ORDERING_INDEX[tuple(normalize_priority_factors(priority_factors))]
+        if k <= 0:
+            return []
+        cell = cube.cell(age, term, coverage_amount)
+        if cell is None:
+            return []
+        with self._lock:
+            row = self.conn.execute("""
+                SELECT ranked_plans FROM recommendations
+                WHERE age_cell = ? AND term_cell = ? AND cov_cell = ? AND min_income <= ?
+                ORDER BY min_income DESC
+                LIMIT 1
+            """, (*cell, income)).fetchone()
+        if row is None:
+            return []
+
+        packed = np.frombuffer(row[0], dtype=np.uint16).reshape(len(PRIORITY_ORDERINGS), self.top_n)
+        premiums = cube.premiums[cell]
+        return [(self.plan_ids[n], int(premiums[n])) for n in packed[ordering][:k] if n != NO_PLAN]
+
+
+_tables = weakref.WeakSet()
+
+def _after_fork_in_child():
+    for table in list(_tables):
+        table._reopen_after_fork()
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+_table = None
+_table_mtime = None
+_table_lock = threading.Lock()
+
+def get_recommendation_table():
+    """
+    Return the materialized table next to DB_PATH if it is current, otherwise None.
+    """
+    global _table, _table_mtime
+    path = os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), RECOMMENDATIONS_FILE)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+    if mtime != _table_mtime:
+        with _table_lock:
+            if mtime != _table_mtime:
+                try:
+                    _table = RecommendationTable(path)
+                except (sqlite3.Error, KeyError, ValueError) as e:
+                    print(f"Could not load recommendation table: {str(e)}")
+                    _table = None
+                _table_mtime = mtime
+
+    table = _table
+    if table is None or not table.matches(database_version(DB_PATH)):
+        return None
+    return table
@@ -0,0 +1,273 @@
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import weakref
+from src.tools.chart_renderer import CHART_COLORS, get_chart_renderer
+
+# Worker processes that render charts (0 renders in the calling thread, one chart at a time)
+RENDER_WORKERS = int(os.environ.get("TIA_RENDER_WORKERS", "2"))
+
+# Charts that may wait for a free worker; beyond this a chart is unavailable at once
+RENDER_QUEUE = int(os.environ.get("TIA_RENDER_QUEUE", "8"))
+
+# Seconds from submission (queueing included) after which a chart is given up on
+RENDER_TIMEOUT_S = float(os.environ.get("TIA_RENDER_TIMEOUT_S", "15"))
+
+def _init_worker(backend: str):
+    """
+    Runs once in each worker: the parent handles Ctrl-C, and the backend (and
+    matplotlib, which draws the premium curves for every backend) is warmed before
+    the first job arrives.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        renderer = get_chart_renderer(backend)
+        renderer.warm()
+        if renderer.name != "matplotlib":
+            get_chart_renderer("matplotlib").warm()
+    except Exception as e:
+        # A failing initializer would make the pool respawn workers forever: start
+        # cold, and let the jobs themselves fail (and fall back)
+        print(f"Render worker {os.getpid()} could not warm {backend}: {str(e)}")
+
+def _render(backend: str, chart: str, args: tuple, colors: int) -> bytes:
+    return getattr(get_chart_renderer(backend), chart)(*args, colors=colors)
+
+
+class PendingChart:
+    """
+    A chart that is being rendered. result() waits for it and returns its PNG bytes,
+    or None if it is unavailable; the outcome is kept, so it may be asked for again
+    (and from several threads).
+    """
+    def __init__(self, wait):
+        self._wait = wait
+        self._lock = threading.Lock()
+        self._png = None
+
+    def result(self):
+        with self._lock:
+            if self._wait is not None:
+                self._png = self._wait()
+                self._wait = None
+            return self._png
+
+
+class RenderPool:
+    """
+    Renders charts in a pool of warm worker processes.
+
+    pyplot keeps global figure state and is not thread-safe, and a render holds the
+    GIL for its whole duration: rendered in the request threads, concurrent
+    conversations would serialize on charts (or draw into each other's figures).
+    Each worker renders one chart at a time in its own interpreter, so charts run in
+    parallel while the request threads only wait on a pipe.
+
+    A chart that cannot be rendered is unavailable, not an error: render() returns
+    None (and the tool its results without an image) when the queue is full, the job
+    fails, or it is not done within the timeout. A timed-out job may be stuck in a
+    worker, so new charts go to a fresh pool while the old one is retired: its other
+    jobs (other conversations' charts) still finish, and it is terminated, stuck
+    worker included, once none is left. submit() starts a chart without waiting for it,
+    for callers that have other work (or other replies) to get through first.
+
+    Workers are started with "spawn", never forked from the (threaded) server, so
+    they import the running script without its __main__ block, as usual for
+    multiprocessing. The pool itself starts on first use, or with start().
+    """
+    def __init__(self, workers: int = RENDER_WORKERS, queue_size: int = RENDER_QUEUE,
+                 timeout: float = RENDER_TIMEOUT_S, backend: str = None):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.backend = get_chart_renderer(backend).name
+        self._reset()
+        _render_pools.add(self)
+
+    def _reset(self):
+        self._pool = None
+        self._jobs = {}  # pool (current or retired) -> jobs submitted to it and not yet released
+        self._lock = threading.Lock()
+        self._inline_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, self.workers) + self.queue_size)
+        self.rendered = 0
+        self.rejected = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.restarts = 0
+
+    def start(self):
+        """
+        Start the workers if they are not running (no-op when rendering inline).
+        """
+        if self.workers <= 0:
+            return None
+        with self._lock:
+            return self._current_pool()
+
+    def _current_pool(self):
+        # Called with self._lock held
+        if self._pool is None:
+            context = multiprocessing.get_context("spawn")
+            self._pool = context.Pool(self.workers, initializer=_init_worker, initargs=(self.backend,))
+            self._jobs[self._pool] = 0
+        return self._pool
+
+    def render(self, chart: str, *args):
+        """
+        PNG bytes of renderer.<chart>(*args), or None if the chart is unavailable.
+        """
+        if self.workers <= 0:
+            return self._render_inline(chart, args)
+        return self.submit(chart, *args).result()
+
+    def submit(self, chart: str, *args) -> "PendingChart":
+        """
+        Start rendering renderer.<chart>(*args) and return at once: the PendingChart's
+        result() gives the PNG bytes, or None if the chart is unavailable. Inline, the
+        chart is rendered when result() is first called.
+        """
+        if self.workers <= 0:
+            return PendingChart(lambda: self._render_inline(chart, args))
+        if not self._acquire_slot():
+            return PendingChart(lambda: None)
+
+        try:
+            with self._lock:
+                pool = self._current_pool()
+                self._jobs[pool] += 1
+        except Exception as e:
+            self._slots.release()
+            # `e` is unbound once the except block ends: keep the error for the lambda
+            error = e
+            return PendingChart(lambda: self._unavailable(chart, error))
+
+        released, release_lock = [], threading.Lock()
+        def release(_=None):
+            # Once per job: when it completes, or when its waiter gives up on it
+            with release_lock:
+                if released:
+                    return
+                released.append(True)
+            self._slots.release()
+            self._job_done(pool)
+        try:
+            job = pool.apply_async(_render, (self.backend, chart, args, CHART_COLORS),
+                                   callback=release, error_callback=release)
+        except Exception as e:
+            release()
+            # `e` is unbound once the except block ends: keep the error for the lambda
+            error = e
+            return PendingChart(lambda: self._unavailable(chart, error))
+        deadline = time.monotonic() + self.timeout
+        return PendingChart(lambda: self._wait(pool, job, chart, deadline, release))
+
+    def _acquire_slot(self) -> bool:
+        if self._slots.acquire(blocking=False):
+            return True
+        with self._lock:
+            self.rejected += 1
+        print(f"Chart unavailable: render queue full ({max(1, self.workers) + self.queue_size} charts pending)")
+        return False
+
+    def _render_inline(self, chart: str, args: tuple):
+        if not self._acquire_slot():
+            return None
+        try:
+            with self._inline_lock:
+                png = _render(self.backend, chart, args, CHART_COLORS)
+            with self._lock:
+                self.rendered += 1
+            return png
+        except Exception as e:
+            return self._unavailable(chart, e)
+        finally:
+            self._slots.release()
+
+    def _wait(self, pool, job, chart: str, deadline: float, release):
+        try:
+            png = job.get(max(0.0, deadline - time.monotonic()))
+        except multiprocessing.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            print(f"Chart unavailable: {chart} not rendered within {self.timeout:g}s")
+            self._retire(pool)
+            release()
+            return None
+        except Exception as e:
+            return self._unavailable(chart, e)
+        with self._lock:
+            self.rendered += 1
+        return png
+
+    def _unavailable(self, chart: str, error: Exception):
+        with self._lock:
+            self.failed += 1
+        print(f"Chart unavailable: {chart} failed: {str(error)}")
+        return None
+
+    def _retire(self, pool):
+        """
+        Stop sending charts to a pool whose worker may be stuck; the next chart starts
+        a new one. The old pool is terminated once its last job is released.
+        """
+        with self._lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+            self.restarts += 1
+
+    def _job_done(self, pool):
+        with self._lock:
+            if pool not in self._jobs:
+                return  # closed meanwhile
+            self._jobs[pool] -= 1
+            drained = pool is not self._pool and self._jobs[pool] == 0
+            if drained:
+                del self._jobs[pool]
+        if drained:
+            # May run in the pool's own result thread, which terminate() allows for
+            pool.terminate()
+
+    def close(self):
+        with self._lock:
+            pools = list(self._jobs)
+            self._pool = None
+            self._jobs = {}
+        for pool in pools:
+            pool.terminate()
+            pool.join()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": self._pool is not None,
+                "retired": sum(1 for pool in self._jobs if pool is not self._pool),
+                "rendered": self.rendered,
+                "rejected": self.rejected,
+                "failed": self.failed,
+                "timeouts": self.timeouts,
+                "restarts": self.restarts,
+            }
+
+    def _reset_after_fork(self):
+        # The parent's workers, pipes and handler threads belong to the parent: keep the
+        # inherited pools referenced (their finalizers only act in the process that made them)
+        # and start a fresh one in the child on first use
+        _inherited_pools.extend(self._jobs)
+        self._reset()
+
+
+_render_pools = weakref.WeakSet()
+_inherited_pools = []
+
+def _after_fork_in_child():
+    for pool in list(_render_pools):
+        pool._reset_after_fork()
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+render_pool = RenderPool()
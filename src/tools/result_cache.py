@@ -0,0 +1,114 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from src.tools.name_resolver import normalize_name
+
+# Arguments the tools resolve fuzzily (see name_resolver): only these are normalized in keys
+NAME_ARGS = ("insurer_name", "plan_name")
+
+class ResultCache:
+    """
+    A thread-safe LRU cache with a per-entry TTL for tool results.
+
+    Entries are tagged with the database version they were computed against
+    (see connection_pool.database_version, or a snapshot version) and only served
+    for that version, so a rate update never serves stale results. The entries of
+    the current and the previous version are kept, so requests still finishing on
+    the previous snapshot do not wipe the new one; the first lookup that sees a
+    third version drops the oldest.
+    """
+    def __init__(self, maxsize: int = 1024, ttl: float = 600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._versions = []  # the retained versions, oldest first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(function_name: str, function_args: dict) -> str:
+        """
+        Normalize a tool call into a cache key. Insurer and plan names are normalized
+        the way the name resolvers normalize them (case, punctuation, spacing), so
+        spellings that resolve alike share an entry; every other argument is kept
+        verbatim, and list order is kept because priority_factors is ordered.
+        """
+        args = {name: normalize_name(value) if name in NAME_ARGS and isinstance(value, str) else value
+                for name, value in function_args.items()}
+        return function_name + ":" + json.dumps(args, sort_keys=True, default=str)
+
+    def _check_version(self, version):
+        if version in self._versions:
+            return
+        self._versions.append(version)
+        if len(self._versions) > 2:
+            dropped = self._versions.pop(0)
+            stale = [key for key in self._entries if key[0] == dropped]
+            if stale:
+                self.invalidations += 1
+            for key in stale:
+                del self._entries[key]
+
+    def get(self, key: str, version):
+        """
+        Return the cached value for key, or None on a miss.
+        """
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get((version, key))
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[(version, key)]
+                self.misses += 1
+                return None
+            self._entries.move_to_end((version, key))
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value, version, call=None):
+        """
+        Store value for key. call, the (function_name, function_args) that produced
+        it, lets hot_calls() replay the entry against a new version.
+        """
+        with self._lock:
+            self._check_version(version)
+            self._entries[(version, key)] = (time.monotonic() + self.ttl, value, call)
+            self._entries.move_to_end((version, key))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def hot_calls(self, version, n: int):
+        """
+        The calls behind the n most recently used live entries of a version, most recent first.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [
+                call for (entry_version, _), (expires, _, call) in reversed(self._entries.items())
+                if entry_version == version and call is not None and expires >= now
+            ][:n]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+            }
+
+
+result_cache = ResultCache()
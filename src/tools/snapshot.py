@@ -0,0 +1,260 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from src.tools.connection_pool import DB_IN_MEMORY, DB_PATH, ConnectionPool, database_version, get_connection_pool
+from src.tools.name_resolver import forget_name_resolvers, get_name_resolvers
+from src.tools.premium_cube import CUBE_METADATA, PremiumCube, get_premium_cube
+from src.tools.ranking import forget_ranker, get_ranker
+from src.tools.recommendation_table import RECOMMENDATIONS_FILE, RecommendationTable, get_recommendation_table
+
+# Published snapshots live in data/snapshots/<version>/, and data/snapshots/CURRENT
+# names the one to serve (see data/publish_snapshot.py)
+SNAPSHOTS_DIR = os.path.join(os.path.dirname(DB_PATH), "snapshots")
+CURRENT_FILE = "CURRENT"
+SNAPSHOT_DB = "term_insurance.db"
+
+# Result cache entries replayed on a new snapshot before it goes live (data only, no charts)
+WARM_RESULTS = int(os.environ.get("TIA_SNAPSHOT_WARM_RESULTS", "16"))
+
+class LiveSnapshot:
+    """
+    The database as it is now, when no snapshot has been published: DB_PATH through
+    the shared pool, with the premium cube and recommendation table used while they
+    are current. Its version is database_version(), so it changes with every write.
+    """
+    name = None
+
+    @property
+    def version(self):
+        return database_version()
+
+    def connection(self):
+        return get_connection_pool().connection()
+
+    def premium_cube(self):
+        return get_premium_cube()
+
+    def recommendation_table(self):
+        return get_recommendation_table()
+
+    def warm(self):
+        """
+        Load the current cube and recommendation table and build the ranker and name resolvers.
+        """
+        self.premium_cube()
+        self.recommendation_table()
+        with self.connection() as conn:
+            get_ranker(conn)
+            get_name_resolvers(conn)
+
+
+class Snapshot:
+    """
+    One published, immutable snapshot: its database and the indexes derived from it.
+
+    Nothing writes to a published snapshot, so its connections are opened immutable
+    (no locking, no change checks) and its cube and recommendation table need no
+    staleness checks beyond the one made when it is opened.
+    """
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.path = path
+        self.version = name
+        self.db_path = os.path.join(path, SNAPSHOT_DB)
+        if not os.path.exists(self.db_path):
+            raise FileNotFoundError(f"Snapshot {name} has no {SNAPSHOT_DB}")
+        self.pool = ConnectionPool(self.db_path, in_memory=DB_IN_MEMORY, immutable=True)
+        built_from = database_version(self.db_path)
+
+        self._cube = None
+        if os.path.exists(os.path.join(path, CUBE_METADATA)):
+            cube = PremiumCube.load(path)
+            self._cube = cube if cube.matches(built_from) else None
+
+        self._table = None
+        if os.path.exists(os.path.join(path, RECOMMENDATIONS_FILE)):
+            table = RecommendationTable(os.path.join(path, RECOMMENDATIONS_FILE))
+            self._table = table if table.matches(built_from) else None
+
+        # Requests currently using the snapshot; it is closed once retired and unused
+        self.refs = 0
+        self.retired = False
+
+    def connection(self):
+        return self.pool.connection()
+
+    def premium_cube(self):
+        return self._cube
+
+    def recommendation_table(self):
+        return self._table
+
+    def warm(self):
+        """
+        Bring the snapshot up to speed before it serves: read its files into the OS
+        page cache and build the per-database ranker and name resolvers.
+        """
+        for file_name in sorted(os.listdir(self.path)):
+            with open(os.path.join(self.path, file_name), "rb") as f:
+                while f.read(1 << 20):
+                    pass
+        with self.connection() as conn:
+            get_ranker(conn)
+            get_name_resolvers(conn)
+
+    def close(self):
+        self.pool.close()
+        if self._table is not None:
+            self._table.conn.close()
+        self._cube = None
+        self._table = None
+        db_file = os.path.realpath(self.db_path)
+        forget_ranker(db_file)
+        forget_name_resolvers(db_file)
+
+
+class SnapshotManager:
+    """
+    Serves the current snapshot and swaps in newly published ones without a restart.
+
+    Every request checks the CURRENT pointer (one stat). When it names a new
+    snapshot, a background thread opens and warms it, runs the registered warmers
+    (e.g. replaying hot result-cache entries), then swaps it in atomically; requests
+    keep being served by the previous snapshot meanwhile, so a publish causes no
+    downtime and no cold caches. Requests hold a reference to the snapshot they
+    started on and finish on it; a retired snapshot is closed when the last one
+    lets go.
+    """
+    def __init__(self, snapshots_dir: str = SNAPSHOTS_DIR):
+        self.snapshots_dir = snapshots_dir
+        self._lock = threading.Lock()
+        self._active = None
+        self._pointer_mtime = None
+        self._loading = None
+        self._live = LiveSnapshot()
+        self._warmers = []
+        self.swaps = 0
+
+    def add_warmer(self, warmer):
+        """
+        warmer(new_snapshot, old_snapshot) runs after a new snapshot is warmed and before it goes live.
+        """
+        self._warmers.append(warmer)
+
+    def _read_pointer(self):
+        """
+        (mtime, name) of the CURRENT pointer, or (None, None) if nothing was published.
+        """
+        path = os.path.join(self.snapshots_dir, CURRENT_FILE)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            if mtime == self._pointer_mtime:
+                return mtime, None
+            with open(path, encoding="utf-8") as f:
+                return mtime, f.read().strip()
+        except OSError:
+            return None, None
+
+    def _load(self, name: str, old):
+        snapshot = Snapshot(name, os.path.join(self.snapshots_dir, name))
+        snapshot.warm()
+        for warmer in self._warmers:
+            try:
+                warmer(snapshot, old)
+            except Exception as e:
+                print(f"Snapshot warmer failed: {str(e)}")
+        return snapshot
+
+    def _swap(self, snapshot):
+        with self._lock:
+            old, self._active = self._active, snapshot
+            self._loading = None
+            self.swaps += 1
+            if old is not None:
+                old.retired = True
+                if old.refs == 0:
+                    old.close()
+
+    def _load_in_background(self, name: str, old):
+        try:
+            self._swap(self._load(name, old))
+        except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+            print(f"Could not load snapshot {name}: {str(e)}")
+            with self._lock:
+                self._loading = None
+
+    def _check_pointer(self):
+        mtime, name = self._read_pointer()
+        if mtime is None or name is None:
+            return
+        with self._lock:
+            self._pointer_mtime = mtime
+            active = self._active
+            if (active is not None and active.name == name) or self._loading == name:
+                return
+            self._loading = name
+        if active is None:
+            # Nothing to serve meanwhile: load in the foreground (first use in this process)
+            try:
+                self._swap(self._load(name, None))
+            except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+                print(f"Could not load snapshot {name}: {str(e)}")
+                with self._lock:
+                    self._loading = None
+                    self._pointer_mtime = None
+        else:
+            threading.Thread(target=self._load_in_background, args=(name, active), daemon=True).start()
+
+    def acquire(self):
+        self._check_pointer()
+        with self._lock:
+            snapshot = self._active
+            if snapshot is None:
+                return self._live
+            snapshot.refs += 1
+            return snapshot
+
+    def release(self, snapshot):
+        if snapshot is self._live:
+            return
+        with self._lock:
+            snapshot.refs -= 1
+            reclaim = snapshot.retired and snapshot.refs == 0
+        if reclaim:
+            snapshot.close()
+
+    def preload(self):
+        """
+        Load and warm the snapshot to serve now, in the foreground (e.g. in a master
+        process before it forks its workers). Returns its name, or None when serving
+        the live database.
+        """
+        with self.snapshot() as snapshot:
+            if snapshot is self._live:
+                snapshot.warm()
+            return snapshot.name
+
+    @contextmanager
+    def snapshot(self):
+        """
+        The snapshot to serve one request from, held for the duration of a `with` block.
+        """
+        snapshot = self.acquire()
+        try:
+            yield snapshot
+        finally:
+            self.release(snapshot)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "active": self._active.name if self._active is not None else None,
+                "loading": self._loading,
+                "swaps": self.swaps,
+                "refs": self._active.refs if self._active is not None else 0,
+            }
+
+
+snapshot_manager = SnapshotManager()
@@ -34,7 +34,10 @@ def main():
     # ---------------------------
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
-            st.write(message["content"])
+            if message.get("image"):
+                st.image(message["image"])
+            else:
+                st.write(message["content"])
 
     # ---------------------------
     # 3) Chat input
@@ -71,13 +74,11 @@ def main():
             with st.chat_message("assistant"):
                 st.write(response)
                 
-        if result.get("image_path"):
-            st.session_state.messages.append({"role": "assistant", "content": result["image_path"]})
+        if result.get("image"):
+            # The chart stays in memory (PNG bytes) from the tool to the page
+            st.session_state.messages.append({"role": "assistant", "content": "", "image": result["image"]})
             with st.chat_message("assistant"):
-                st.image(result["image_path"])
-                # Delete the image file after displaying it
-                if os.path.exists(result["image_path"]):
-                    os.remove(result["image_path"])
+                st.image(result["image"])
 
     # ---------------------------
     # 6) Show user info in the sidebar
@@ -5,7 +5,9 @@ import logging
 from src.chat.chatbot_core import ChatbotCore
 from dotenv import load_dotenv
 import sys
+import threading
 from src.llm.llm_client import LLMClient
+from src.tools.functions import chart_bytes, deferred_charts
 import traceback
 
 # ---------- CONFIGURATION ----------
@@ -28,12 +30,21 @@ LLM_AZURE_ENDPOINT = os.environ["LLM_AZURE_ENDPOINT"]
 LLM_AZURE_OPENAI_KEY = os.environ["LLM_AZURE_OPENAI_KEY"]
 LLM_AZURE_MODEL_NAME = os.environ["LLM_AZURE_MODEL_NAME"]
 STT_AZURE_MODEL_NAME = os.environ["STT_AZURE_MODEL_NAME"]
+
+# Send the text replies without waiting for the chart, which is rendered meanwhile
+# and sent right after them (0: render the chart before replying, as before)
+DEFER_CHARTS = os.environ.get("TIA_DEFER_CHARTS", "1") == "1"
 # Initialize Flask app
 app = Flask(__name__)
 
 # Initialize the chatbot core - each session will have its own instance
 active_sessions = {}
 
+# Charts still being rendered or sent, per phone number; messages are processed in
+# concurrent request threads, so the lists are only touched under the lock
+chart_deliveries = {}
+chart_deliveries_lock = threading.Lock()
+
 # Initialize STT client globally
 stt_client = LLMClient(
     azure_endpoint=LLM_AZURE_ENDPOINT,
@@ -93,20 +104,20 @@ def send_whatsapp_message(phone_number, message):
         logger.error(f"Error sending WhatsApp message: {str(e)}")
         return {"error": str(e)}
 
-def send_whatsapp_image(phone_number, image_path):
+def send_whatsapp_image(phone_number, image):
     """
     Send an image message to WhatsApp using the WhatsApp Business API
     
     Args:
         phone_number (str): Recipient's phone number
-        image_path (str): Path to the image file
+        image (bytes): PNG image, uploaded straight from memory
         
     Returns:
         dict: API response
     """
-    if not image_path:
-        logger.error("Image path must be provided")
-        return {"error": "Image path must be provided"}
+    if not image:
+        logger.error("Image must be provided")
+        return {"error": "Image must be provided"}
     
     try:
         # First upload the image to get an ID
@@ -116,19 +127,17 @@ def send_whatsapp_image(phone_number, image_path):
             "Authorization": f"Bearer {WHATSAPP_TOKEN}"
         }
         
-        # Open the image file for upload
-        with open(image_path, 'rb') as image_file:
-            upload_data = {
-                'messaging_product': (None, 'whatsapp'),
-                'file': (os.path.basename(image_path), image_file, 'image/jpeg')
-            }
-            # Upload the image
-            upload_response = requests.post(
-                upload_url,
-                headers=upload_headers,
-                files=upload_data
-            )
-            print(upload_response.text)
+        upload_data = {
+            'messaging_product': (None, 'whatsapp'),
+            'file': ('chart.png', image, 'image/png')
+        }
+        # Upload the image
+        upload_response = requests.post(
+            upload_url,
+            headers=upload_headers,
+            files=upload_data
+        )
+        print(upload_response.text)
         upload_response.raise_for_status()
         image_id = upload_response.json().get('id')
         
@@ -157,19 +166,58 @@ def send_whatsapp_image(phone_number, image_path):
         response = requests.post(url, headers=headers, json=payload)
         logger.info(f"Image sent to {phone_number}: {response.status_code}")
         
-        # Delete the image file after sending
-        try:
-            os.remove(image_path)
-            logger.info(f"Successfully deleted image file: {image_path}")
-        except Exception as e:
-            logger.error(f"Error deleting image file {image_path}: {str(e)}")
-        
         return response.json()
         
     except Exception as e:
         logger.error(f"Error sending WhatsApp image: {str(e)}")
         return {"error": str(e)}
 
+def send_whatsapp_chart(phone_number, image):
+    """
+    Send a tool's chart after the text replies that came with it. A deferred chart
+    is waited for and sent in the background; the customer's next replies wait for
+    it (see wait_for_chart), so their messages always arrive in order.
+    
+    Args:
+        phone_number (str): Recipient's phone number
+        image (bytes or PendingChart): The chart, or None
+    """
+    if not image:
+        return
+    if not DEFER_CHARTS:
+        send_whatsapp_image(phone_number, chart_bytes(image))
+        return
+    
+    def deliver():
+        try:
+            png = chart_bytes(image)
+            if png:
+                send_whatsapp_image(phone_number, png)
+            else:
+                logger.warning(f"Chart for {phone_number} unavailable, not sent")
+        finally:
+            # Sent: nothing needs to wait for it any more
+            with chart_deliveries_lock:
+                deliveries = chart_deliveries.get(phone_number, [])
+                if delivery in deliveries:
+                    deliveries.remove(delivery)
+                if not deliveries:
+                    chart_deliveries.pop(phone_number, None)
+    
+    delivery = threading.Thread(target=deliver, name=f"chart-{phone_number}", daemon=True)
+    with chart_deliveries_lock:
+        chart_deliveries.setdefault(phone_number, []).append(delivery)
+    delivery.start()
+
+def wait_for_chart(phone_number):
+    """
+    Wait until the charts of the customer's previous messages (if any) have been sent
+    """
+    with chart_deliveries_lock:
+        deliveries = chart_deliveries.pop(phone_number, [])
+    for delivery in deliveries:
+        delivery.join()
+
 def mark_message_as_read(message_id):
     """
     Mark a WhatsApp message as read (blue tick)
@@ -264,15 +312,16 @@ def process_text_message(phone_number, message_text):
         # Get or create a session for this user
         chatbot = get_or_create_session(phone_number)
         
-        # Process the message
-        result = chatbot.process_message(message_text)
+        # Process the message (charts render meanwhile, see DEFER_CHARTS)
+        with deferred_charts(DEFER_CHARTS):
+            result = chatbot.process_message(message_text)
         
-        # Send each response to WhatsApp
+        # Send each response to WhatsApp, after the previous message's chart
+        wait_for_chart(phone_number)
         for response in result["responses"]:
             send_whatsapp_message(phone_number, response)
             
-        if result.get("image_path"):
-            send_whatsapp_image(phone_number, result["image_path"])
+        send_whatsapp_chart(phone_number, result.get("image"))
         
         return True
     except Exception as e:
@@ -324,15 +373,16 @@ def process_voice_message(phone_number, media_id):
         
         # Process like a regular text message
         chatbot = get_or_create_session(phone_number)
-        result = chatbot.process_message(text)
+        with deferred_charts(DEFER_CHARTS):
+            result = chatbot.process_message(text)
         
-        # Send each response to WhatsApp
+        # Send each response to WhatsApp, after the previous message's chart
         print(result)
+        wait_for_chart(phone_number)
         for response in result["responses"]:
             send_whatsapp_message(phone_number, response)
             
-        if result.get("image_path"):
-            send_whatsapp_image(phone_number, result["image_path"])
+        send_whatsapp_chart(phone_number, result.get("image"))
         
         return True
     except Exception as e: